@@ -5,6 +5,7 @@ import dayjs from 'dayjs';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 import type { Message as MessageType } from '@/types';
+import { resolveApiUrl } from '@/services/api';
 import './Message.css';
 
 interface MessageProps {
@@ -28,6 +29,8 @@ export const Message: React.FC<MessageProps> = ({ message }) => {
           let src = '';
           if (att.preview) {
             src = att.preview;
+          } else if (att.url) {
+            src = resolveApiUrl(att.url);
           } else if (att.serialized_image) {
             src = `data:${att.mime_type || 'image/jpeg'};base64,${att.serialized_image}`;
           }
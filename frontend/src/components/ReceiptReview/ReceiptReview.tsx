@@ -7,6 +7,7 @@ import { ReceiptInfo } from './ReceiptInfo';
 import { ItemList } from './ItemList';
 import { apiService } from '@/services/api';
 import { useReceiptStore } from '@/store/useReceiptStore';
+import { useAppStore } from '@/store/useAppStore';
 import './ReceiptReview.css';
 
 const { Title, Text } = Typography;
@@ -32,6 +33,7 @@ export const ReceiptReview: React.FC<ReceiptReviewProps> = ({
 }) => {
   const navigate = useNavigate();
   const { addApprovedReceipt, setAllItems } = useReceiptStore();
+  const { userId } = useAppStore();
   const [editedData, setEditedData] = useState<ReceiptData>({
     ...receiptData,
     date: receiptData.date ? new Date(receiptData.date) : new Date(),
@@ -177,6 +179,7 @@ export const ReceiptReview: React.FC<ReceiptReviewProps> = ({
         payment_card: editedData.payment_card,
         card_last_four_digit: editedData.card_last_four_digit,
         total_cost: editedData.total_cost,
+        user_id: userId,
       });
 
       // ⚠️ Important: Replace with the latest complete item information returned from backend (ItemFull[])
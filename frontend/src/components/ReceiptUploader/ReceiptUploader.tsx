@@ -8,6 +8,7 @@ import { useAppStore } from '@/store/useAppStore';
 import { useReceiptStore } from '@/store/useReceiptStore';
 import { useChatStore } from '@/store/useChatStore';
 import { parseLocalDate } from '@/utils/format';
+import { resolveApiUrl } from '@/services/api';
 import type { Message } from '@/types';
 import './ReceiptUploader.css';
 
@@ -146,7 +147,9 @@ export const ReceiptUploader: React.FC<ReceiptUploaderProps> = ({
         let receiptImage: string | undefined;
         if (response.attachments && response.attachments.length > 0) {
           const attachment = response.attachments[0]; // Use first attachment
-          receiptImage = `data:${attachment.mime_type};base64,${attachment.serialized_image}`;
+          receiptImage = attachment.url
+            ? resolveApiUrl(attachment.url)
+            : `data:${attachment.mime_type};base64,${attachment.serialized_image}`;
         }
 
         // Convert ReceiptReviewRequest to ReceiptData format
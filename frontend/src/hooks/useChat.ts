@@ -53,7 +53,8 @@ export const useChat = (sessionId: string, userId: string) => {
           timestamp: new Date(),
           attachments: response.attachments?.map(att => ({
             serialized_image: att.serialized_image,
-            mime_type: att.mime_type
+            mime_type: att.mime_type,
+            url: att.url,
           })),
         };
         addMessage(assistantMessage);
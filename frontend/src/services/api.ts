@@ -38,6 +38,12 @@ const apiClient = axios.create({
   },
 });
 
+/**
+ * Resolve a backend-relative path (e.g. an attachment url) against the API base URL
+ */
+export const resolveApiUrl = (path: string): string =>
+  `${(apiClient.defaults.baseURL || '').replace(/\/$/, '')}${path}`;
+
 /**
  * Request interceptor
  */
@@ -142,6 +148,15 @@ const requestWithRetry = async <T>(
   throw lastError;
 };
 
+/**
+ * Generate an Idempotency-Key shared by all retries of one logical request,
+ * so the backend answers a retry with the original response
+ */
+const newIdempotencyKey = (): string =>
+  typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function'
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 /**
  * API service layer
  * Encapsulate all communication with the backend
@@ -171,9 +186,10 @@ export const apiService = {
       };
   
       const url = '/chat';
+      const headers = { 'Idempotency-Key': newIdempotencyKey() };
   
       const response = await requestWithRetry(
-        () => apiClient.post<ChatResponse>(url, requestData),
+        () => apiClient.post<ChatResponse>(url, requestData, { headers }),
         2 // Maximum 2 retries
       );
       return response.data;
@@ -190,8 +206,9 @@ export const apiService = {
     request: ApproveRequest
   ): Promise<ApproveResponse> => {
     try {
+      const headers = { 'Idempotency-Key': newIdempotencyKey() };
       const response = await requestWithRetry(
-        () => apiClient.post<ApproveResponse>('/review', request),
+        () => apiClient.post<ApproveResponse>('/review', request, { headers }),
         2
       );
       return response.data;
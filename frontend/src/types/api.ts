@@ -53,6 +53,9 @@ export interface ReceiptReviewRequest {
 export interface Attachment {
   serialized_image: string;
   mime_type: string;
+  image_hash_id?: string;
+  url?: string; // Backend-relative path of the image (/images/...); serialized_image is then empty
+  error?: string | null; // Set when the image could not be resolved; url and serialized_image are then empty
 }
 
 /**
@@ -61,6 +64,7 @@ export interface Attachment {
  */
 export interface ReceiptResponse {
   review_request?: ReceiptReviewRequest; // Optional, only present when receipt is detected
+  review_requests?: ReceiptReviewRequest[]; // Every review of the turn, one per receipt; review_request is the first
   response: string; // Always present, should be displayed in chatbox
   thinking_process: string;
   attachments: Attachment[];
@@ -95,6 +99,7 @@ export interface ApproveRequest {
   payment_card: string;
   card_last_four_digit: string;
   total_cost: number;
+  user_id: string;
 }
 
 /**
@@ -16,6 +16,7 @@ export interface MessageAttachment {
   // From backend response
   serialized_image?: string;
   mime_type?: string;
+  url?: string;
 }
 
 /**
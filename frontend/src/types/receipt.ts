@@ -17,7 +17,7 @@ export interface ReceiptData {
   total_cost: number; // Changed from total_hsa_cost
   total_hsa_cost: number; // HSA eligible total cost
   image_url?: string; // Receipt image URL (from backend, if available)
-  receipt_image?: string; // Base64 data URL from attachments (data:image/jpeg;base64,...)
+  receipt_image?: string; // Image URL from attachments (backend /images URL, or base64 data URL)
 }
 
 /**
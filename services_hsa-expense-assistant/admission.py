@@ -0,0 +1,191 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+import logger
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; the client should retry later."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RequestTooLarge(Exception):
+    """Raised when a request needs more memory than the whole budget allows."""
+
+
+class AdmissionTicket:
+    """An admitted request's share of the in-flight slots and memory budget."""
+
+    def __init__(self, controller: "AdmissionController", cost_bytes: int):
+        self._controller = controller
+        self.cost_bytes = cost_bytes
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        """Return the slot and bytes to the controller; safe to call more than once."""
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """Global backpressure for agent requests: in-flight slots plus a decoded-bytes budget.
+
+    A request is admitted when a slot is free and its estimated decoded
+    image bytes fit in the remaining budget. Otherwise it waits in a bounded
+    FIFO queue for at most `queue_timeout` seconds; when the queue is full or
+    the wait times out it is rejected with a Retry-After hint derived from
+    how long admitted requests recently took.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 0,
+        max_queue: int = 0,
+        queue_timeout: float = 30.0,
+        max_bytes: int = 0,
+    ):
+        """
+        Create the controller.
+
+        Args:
+            max_in_flight: Maximum number of admitted requests; 0 means unlimited
+            max_queue: Maximum number of requests waiting for admission
+            queue_timeout: Longest time a request waits for admission, in seconds
+            max_bytes: Budget of decoded request bytes held at once; 0 means unlimited
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_bytes = max_bytes
+        self._in_flight = 0
+        self._bytes_in_flight = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        # Exponential moving average of how long admitted requests are held
+        self._avg_hold_seconds = 1.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _fits(self, cost_bytes: int) -> bool:
+        if self.max_in_flight and self._in_flight >= self.max_in_flight:
+            return False
+        return not self.max_bytes or self._bytes_in_flight + cost_bytes <= self.max_bytes
+
+    def _take(self, cost_bytes: int) -> AdmissionTicket:
+        self._in_flight += 1
+        self._bytes_in_flight += cost_bytes
+        self.admitted += 1
+        return AdmissionTicket(self, cost_bytes)
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        self._in_flight -= 1
+        self._bytes_in_flight -= ticket.cost_bytes
+        held = time.monotonic() - ticket.admitted_at
+        self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * held
+        self._admit_waiters()
+
+    def _admit_waiters(self) -> None:
+        # Admit waiters strictly in arrival order, so large uploads are not starved
+        while self._waiters:
+            cost_bytes, waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(cost_bytes):
+                break
+            self._waiters.popleft()
+            waiter.set_result(self._take(cost_bytes))
+
+    def retry_after(self) -> int:
+        """Return the suggested Retry-After in whole seconds."""
+        slots = self.max_in_flight or 1
+        backlog = (len(self._waiters) + 1) / slots
+        return max(1, math.ceil(self._avg_hold_seconds * backlog))
+
+    async def acquire(self, cost_bytes: int = 0) -> AdmissionTicket:
+        """
+        Wait for admission.
+
+        Args:
+            cost_bytes: Estimated decoded size of the request's images
+
+        Returns:
+            AdmissionTicket: The admission, to be released when the request is done
+
+        Raises:
+            RequestTooLarge: If `cost_bytes` exceeds the whole budget
+            AdmissionRejected: If the wait queue is full or the wait timed out
+        """
+        if self.max_bytes and cost_bytes > self.max_bytes:
+            raise RequestTooLarge(
+                f"Request needs {cost_bytes} bytes, more than the {self.max_bytes} byte budget"
+            )
+        if not self._waiters and self._fits(cost_bytes):
+            return self._take(cost_bytes)
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            logger.warning("Request rejected, admission queue full", **self.stats())
+            raise AdmissionRejected("Server is busy, admission queue is full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (cost_bytes, waiter)
+        self._waiters.append(entry)
+        self.queued += 1
+        try:
+            return await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning("Request rejected, admission wait timed out", **self.stats())
+            raise AdmissionRejected("Server is busy, timed out waiting for admission", self.retry_after())
+        except asyncio.CancelledError:
+            # Admitted just as the caller went away: hand the slot back
+            if waiter.done() and not waiter.cancelled():
+                waiter.result().release()
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                # A blocked head of the queue may have left; let the next ones in
+                self._admit_waiters()
+
+    def stats(self) -> Dict[str, float | int]:
+        """Return current load and admission counters."""
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "bytes_in_flight": self._bytes_in_flight,
+            "max_bytes": self.max_bytes,
+            "waiting": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted_total": self.admitted,
+            "queued_total": self.queued,
+            "rejected_total": self.rejected,
+            "timed_out_total": self.timed_out,
+            "avg_hold_seconds": round(self._avg_hold_seconds, 3),
+        }
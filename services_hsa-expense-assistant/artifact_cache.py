@@ -0,0 +1,365 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.artifacts.base_artifact_service import (
+    ArtifactVersion,
+    BaseArtifactService,
+)
+from google.genai import types
+import logger
+
+# (app_name, user_id, session_id) an artifact is visible in
+Scope = Tuple[str, str, Optional[str]]
+
+# Only content-digest filenames are cached; they double as safe path components
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{12,64}$")
+
+# Scope version recorded by a latest-version load, which does not reveal the number
+UNKNOWN_VERSION = -1
+
+
+class _CacheEntry:
+    """In-memory index record for one cached artifact file."""
+
+    def __init__(self, size: int, mime_type: str, scopes: Dict[Scope, int]):
+        self.size = size
+        self.mime_type = mime_type
+        # Latest known version per scope the artifact was saved to or loaded from;
+        # UNKNOWN_VERSION if it was only loaded as "latest"
+        self.scopes = scopes
+
+
+class CachedArtifactService(BaseArtifactService):
+    """Size-bounded, content-addressed disk LRU cache in front of an artifact service.
+
+    Image artifacts are stored under their content digest (see
+    `utils.compute_image_hash_id`), so every version of a filename holds the
+    same bytes and the bytes can be cached once per digest. Each entry also
+    records the (app, user, session) scopes it is known to exist in, and a
+    lookup is only served locally for those scopes; anything else falls
+    through to the wrapped service.
+    """
+
+    def __init__(
+        self,
+        inner: BaseArtifactService,
+        cache_dir: str,
+        max_bytes: int,
+    ):
+        """
+        Initialize the cache and index any files left by a previous run.
+
+        Args:
+            inner: The artifact service to wrap (e.g. GcsArtifactService)
+            cache_dir: Directory holding cached artifact files
+            max_bytes: Upper bound on the total size of cached files
+        """
+        self.inner = inner
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and current cache usage."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    # ----- Disk layout -----
+
+    def _data_path(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / digest
+
+    def _meta_path(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}.json"
+
+    def _load_index(self) -> None:
+        """Rebuild the in-memory index from files on disk, oldest first."""
+        found = []
+        for meta_path in self.cache_dir.glob("*/*.json"):
+            digest = meta_path.stem
+            if not DIGEST_PATTERN.match(digest):
+                continue
+            data_path = self._data_path(digest)
+            try:
+                meta = json.loads(meta_path.read_text())
+                stat = data_path.stat()
+            except (OSError, ValueError):
+                continue
+            scopes = {tuple(scope[:3]): scope[3] for scope in meta.get("scopes", [])}
+            found.append((stat.st_mtime, digest, _CacheEntry(stat.st_size, meta["mime_type"], scopes)))
+
+        for _, digest, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[digest] = entry
+            self._total_bytes += entry.size
+        self._evict()
+        logger.info(
+            "Artifact cache index loaded",
+            cache_dir=str(self.cache_dir),
+            entries=len(self._entries),
+            total_bytes=self._total_bytes,
+        )
+
+    def _write_meta(self, digest: str, entry: _CacheEntry) -> None:
+        meta = {
+            "mime_type": entry.mime_type,
+            "scopes": [[*scope, version] for scope, version in entry.scopes.items()],
+        }
+        atomic_write(self._meta_path(digest), json.dumps(meta).encode("utf-8"))
+
+    def _write_entry(self, digest: str, data: bytes, entry: _CacheEntry) -> None:
+        atomic_write(self._data_path(digest), data)
+        self._write_meta(digest, entry)
+
+    def _remove_files(self, digest: str) -> None:
+        for path in (self._data_path(digest), self._meta_path(digest)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits `max_bytes`."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            digest, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            self._remove_files(digest)
+            self.evictions += 1
+            logger.debug("Evicted artifact from cache", digest=digest, size=entry.size)
+
+    async def _put(self, scope: Scope, digest: str, part: types.Part, version: int) -> None:
+        """Add or refresh a cached artifact for `scope`."""
+        if not DIGEST_PATTERN.match(digest):
+            return
+        if not part.inline_data or part.inline_data.data is None:
+            return
+        data = part.inline_data.data
+        if len(data) > self.max_bytes:
+            return
+
+        entry = self._entries.get(digest)
+        if entry is None:
+            new_entry = _CacheEntry(len(data), part.inline_data.mime_type, {scope: version})
+            await asyncio.to_thread(self._write_entry, digest, data, new_entry)
+            # Another request may have cached the same digest while we were writing
+            entry = self._entries.get(digest)
+            if entry is None:
+                self._entries[digest] = new_entry
+                self._total_bytes += new_entry.size
+                self._evict()
+                return
+
+        self._entries.move_to_end(digest)
+        if scope not in entry.scopes or entry.scopes[scope] < version:
+            entry.scopes[scope] = version
+            await asyncio.to_thread(self._write_meta, digest, entry)
+
+    def _lookup(self, scope: Scope, digest: str) -> Optional[_CacheEntry]:
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        entry = self._entries.get(digest)
+        if entry is None or scope not in entry.scopes:
+            return None
+        self._entries.move_to_end(digest)
+        return entry
+
+    # ----- BaseArtifactService -----
+
+    async def save_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        artifact: types.Part,
+        session_id: Optional[str] = None,
+        custom_metadata: Optional[dict[str, Any]] = None,
+    ) -> int:
+        version = await self.inner.save_artifact(
+            app_name=app_name,
+            user_id=user_id,
+            filename=filename,
+            artifact=artifact,
+            session_id=session_id,
+            custom_metadata=custom_metadata,
+        )
+        await self._put((app_name, user_id, session_id), filename, artifact, version)
+        return version
+
+    async def load_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+        version: Optional[int] = None,
+    ) -> Optional[types.Part]:
+        scope = (app_name, user_id, session_id)
+        entry = self._lookup(scope, filename)
+        if entry is not None and (version is None or version <= entry.scopes[scope]):
+            try:
+                data = await asyncio.to_thread(self._data_path(filename).read_bytes)
+            except OSError:
+                # File vanished underneath us; forget it and fall through
+                self._entries.pop(filename, None)
+                self._total_bytes -= entry.size
+            else:
+                self.hits += 1
+                return types.Part(
+                    inline_data=types.Blob(mime_type=entry.mime_type, data=data)
+                )
+
+        self.misses += 1
+        artifact = await self.inner.load_artifact(
+            app_name=app_name,
+            user_id=user_id,
+            filename=filename,
+            session_id=session_id,
+            version=version,
+        )
+        if artifact is None:
+            return None
+        if version is None:
+            # Serves later latest loads; the version number is learned by list_versions
+            await self._put(scope, filename, artifact, UNKNOWN_VERSION)
+        else:
+            # Loading version k does not tell whether newer versions exist
+            versions = await self.inner.list_versions(
+                app_name=app_name,
+                user_id=user_id,
+                filename=filename,
+                session_id=session_id,
+            )
+            if versions:
+                await self._put(scope, filename, artifact, max(versions))
+        return artifact
+
+    async def list_versions(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+    ) -> list[int]:
+        scope = (app_name, user_id, session_id)
+        entry = self._lookup(scope, filename)
+        if entry is not None and entry.scopes[scope] != UNKNOWN_VERSION:
+            self.hits += 1
+            return list(range(entry.scopes[scope] + 1))
+
+        self.misses += 1
+        versions = await self.inner.list_versions(
+            app_name=app_name,
+            user_id=user_id,
+            filename=filename,
+            session_id=session_id,
+        )
+        if entry is not None and versions and entry.scopes[scope] < max(versions):
+            entry.scopes[scope] = max(versions)
+            await asyncio.to_thread(self._write_meta, filename, entry)
+        return versions
+
+    async def delete_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+    ) -> None:
+        await self.inner.delete_artifact(
+            app_name=app_name,
+            user_id=user_id,
+            filename=filename,
+            session_id=session_id,
+        )
+        entry = self._entries.get(filename)
+        if entry and entry.scopes.pop((app_name, user_id, session_id), None) is not None:
+            if entry.scopes:
+                await asyncio.to_thread(self._write_meta, filename, entry)
+            else:
+                self._entries.pop(filename)
+                self._total_bytes -= entry.size
+                await asyncio.to_thread(self._remove_files, filename)
+
+    async def list_artifact_keys(
+        self, *, app_name: str, user_id: str, session_id: Optional[str] = None
+    ) -> list[str]:
+        return await self.inner.list_artifact_keys(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    async def list_artifact_versions(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+    ) -> list[ArtifactVersion]:
+        return await self.inner.list_artifact_versions(
+            app_name=app_name,
+            user_id=user_id,
+            filename=filename,
+            session_id=session_id,
+        )
+
+    async def get_artifact_version(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+        version: Optional[int] = None,
+    ) -> Optional[ArtifactVersion]:
+        return await self.inner.get_artifact_version(
+            app_name=app_name,
+            user_id=user_id,
+            filename=filename,
+            session_id=session_id,
+            version=version,
+        )
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write `data` to `path` via a temporary file and rename."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
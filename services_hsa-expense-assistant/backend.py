@@ -1,28 +1,61 @@
 from expense_manager_agent.agent import root_agent as expense_manager_agent
-from google.adk.sessions import InMemorySessionService
+from expense_manager_agent.tools import REVIEW_REQUEST_STATE_KEY_PREFIX
+from google.adk.sessions import BaseSessionService, InMemorySessionService
 from google.adk.runners import Runner
 from google.adk.events import Event
-from fastapi import FastAPI, Body, Depends, Request
-from typing import AsyncIterator, Dict
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from fastapi import FastAPI, Body, Depends, File, Form, Header, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 from types import SimpleNamespace
 import uvicorn
 from contextlib import asynccontextmanager
+import weakref
+import shutil
+import tempfile
+import uuid
 from utils import (
-    extract_attachment_ids_and_sanitize_response,
+    format_sse_event,
     download_image_from_gcs,
-    extract_thinking_process,
     format_user_request_to_adk_content_and_store_artifacts,
-    get_gcs_image_url,
+    get_artifact_image_url,
+    ingest_uploaded_file,
+    ingest_uploaded_images,
+    make_thumbnail,
+    build_review_request,
+    parse_agent_response,
+    parse_byte_range,
+    resolve_attachments,
+    sanitize_image_id,
+)
+from schema import (
+    BatchReceiptResult,
+    ChatRequest,
+    ChatResponse,
+    IngestedImage,
+    Job,
+    PendingReviewsResponse,
+    ReceiptReviewResponse,
 )
-from schema import ImageData, ChatRequest, ChatResponse, ReceiptReviewRequest, ReceiptReviewResponse, ReviewItem
 import logger
-from google.adk.artifacts import GcsArtifactService
+from google.adk.artifacts import BaseArtifactService, GcsArtifactService
+from artifact_cache import CachedArtifactService
+from local_artifact_service import LocalArtifactService, iter_file_range
+from sqlite_session_service import SqliteSessionService
+from image_registry import ImageRegistry
+from review_queue import ReviewQueue
+from session_locks import SessionLockRegistry
+from admission import AdmissionController, AdmissionRejected, AdmissionTicket, RequestTooLarge
+from idempotency import IdempotencyKeyMismatch, IdempotencyStore
+from job_store import FINAL_JOB_STATUSES, JobStore
+from google.genai import types
 from settings import get_settings
-from database import Database
-import json
-import re
+from database import AsyncDatabase, Database
+import asyncio
+import hashlib
 from fastapi.middleware.cors import CORSMiddleware
 import time
+from starlette.datastructures import Headers
 from starlette.middleware.base import BaseHTTPMiddleware
 
 SETTINGS = get_settings()
@@ -33,12 +66,23 @@ APP_NAME = "expense_manager_app"
 class AppContexts(SimpleNamespace):
     """A class to hold application contexts with attribute access"""
 
-    session_service: InMemorySessionService = None
-    artifact_service: GcsArtifactService = None
+    session_service: BaseSessionService = None
+    artifact_service: BaseArtifactService = None
     expense_manager_agent_runner: Runner = None
-    database: Database = None
-    # Track image URLs by receipt_id (image_hash_id)
-    image_urls: Dict[str, str] = {}
+    database: AsyncDatabase = None
+    # Image URL (and upload session) by user_id and receipt_id (image_hash_id)
+    image_registry: ImageRegistry = None
+    # Receipt reviews awaiting approval, per user
+    review_queue: ReviewQueue = None
+    # Serializes agent turns per session and caps concurrent agent runs
+    session_locks: SessionLockRegistry = None
+    # Bounds in-flight agent requests and the image bytes they hold
+    admission: AdmissionController = None
+    # Responses by Idempotency-Key, shared with in-flight duplicates
+    idempotency: IdempotencyStore = None
+    # Background chat jobs and the worker tasks running them
+    job_store: JobStore = None
+    job_workers: List[asyncio.Task] = None
 
 
 # Initialize application state
@@ -46,12 +90,33 @@ app_contexts = AppContexts()
 
 
 @asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Initialize service contexts during application startup
-    app_contexts.session_service = InMemorySessionService()
-    app_contexts.artifact_service = GcsArtifactService(
-        bucket_name=SETTINGS.STORAGE_BUCKET_NAME
-    )
+async def lifespan(app: FastAPI, job_workers: Optional[int] = None):
+    # Initialize service contexts during application startup; job_workers
+    # overrides SETTINGS.JOB_WORKERS for in-process tools such as bulk_import.py
+    if SETTINGS.SESSION_BACKEND == "sqlite":
+        app_contexts.session_service = SqliteSessionService(
+            db_path=SETTINGS.SESSION_DB_PATH,
+            cache_max_sessions=SETTINGS.SESSION_CACHE_MAX_SESSIONS,
+            ttl_seconds=SETTINGS.SESSION_TTL_SECONDS,
+            max_events=SETTINGS.SESSION_MAX_EVENTS,
+        )
+    else:
+        app_contexts.session_service = InMemorySessionService()
+    if SETTINGS.ARTIFACT_BACKEND == "local":
+        app_contexts.artifact_service = LocalArtifactService(
+            root_dir=SETTINGS.LOCAL_ARTIFACT_DIR
+        )
+    else:
+        app_contexts.artifact_service = GcsArtifactService(
+            bucket_name=SETTINGS.STORAGE_BUCKET_NAME
+        )
+    if SETTINGS.ARTIFACT_CACHE_DIR and SETTINGS.ARTIFACT_BACKEND == "gcs":
+        # Serve repeated existence checks and downloads from local disk
+        app_contexts.artifact_service = CachedArtifactService(
+            inner=app_contexts.artifact_service,
+            cache_dir=SETTINGS.ARTIFACT_CACHE_DIR,
+            max_bytes=SETTINGS.ARTIFACT_CACHE_MAX_BYTES,
+        )
     app_contexts.expense_manager_agent_runner = Runner(
         agent=expense_manager_agent,  # The agent we want to run
         app_name=APP_NAME,  # Associates runs with our app
@@ -59,12 +124,59 @@ async def lifespan(app: FastAPI):
         artifact_service=app_contexts.artifact_service,  # Uses our artifact manager
     )
     # Initialize SQL database
-    app_contexts.database = Database()
-    app_contexts.image_urls = {}
+    app_contexts.database = AsyncDatabase(
+        Database(),
+        reader_threads=SETTINGS.DATABASE_READER_THREADS,
+        max_group_commit=SETTINGS.DATABASE_MAX_GROUP_COMMIT,
+    )
+    app_contexts.image_registry = ImageRegistry(
+        db_path=SETTINGS.IMAGE_REGISTRY_DB_PATH,
+        cache_size=SETTINGS.IMAGE_REGISTRY_CACHE_SIZE,
+    )
+    app_contexts.admission = AdmissionController(
+        max_in_flight=SETTINGS.MAX_IN_FLIGHT_REQUESTS,
+        max_queue=SETTINGS.ADMISSION_QUEUE_SIZE,
+        queue_timeout=SETTINGS.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        max_bytes=SETTINGS.ADMISSION_MAX_DECODED_BYTES,
+    )
+    app_contexts.idempotency = IdempotencyStore(
+        max_entries=SETTINGS.IDEMPOTENCY_MAX_ENTRIES,
+        ttl_seconds=SETTINGS.IDEMPOTENCY_TTL_SECONDS,
+    )
+    app_contexts.session_locks = SessionLockRegistry(
+        max_concurrent_runs=SETTINGS.MAX_CONCURRENT_AGENT_RUNS
+    )
+    app_contexts.review_queue = ReviewQueue(
+        db_path=SETTINGS.REVIEW_QUEUE_DB_PATH,
+        poll_interval=SETTINGS.REVIEW_POLL_INTERVAL_SECONDS,
+    )
+
+    app_contexts.job_store = JobStore(
+        db_path=SETTINGS.JOB_DB_PATH,
+        lease_seconds=SETTINGS.JOB_LEASE_SECONDS,
+        poll_interval=SETTINGS.JOB_POLL_INTERVAL_SECONDS,
+    )
+    app_contexts.job_workers = [
+        asyncio.create_task(job_worker(app_contexts))
+        for _ in range(SETTINGS.JOB_WORKERS if job_workers is None else job_workers)
+    ]
 
     logger.info("Application started successfully")
     yield
     logger.info("Application shutting down")
+    # Jobs cut short here are marked failed once their heartbeat expires
+    for worker in app_contexts.job_workers:
+        worker.cancel()
+    await asyncio.gather(*app_contexts.job_workers, return_exceptions=True)
+    app_contexts.job_store.close()
+    if isinstance(app_contexts.artifact_service, CachedArtifactService):
+        logger.info("Artifact cache stats", **app_contexts.artifact_service.stats())
+    if isinstance(app_contexts.session_service, SqliteSessionService):
+        logger.info("Session cache stats", **app_contexts.session_service.stats())
+        app_contexts.session_service.close()
+    app_contexts.image_registry.close()
+    app_contexts.review_queue.close()
+    app_contexts.database.close()
     # Perform cleanup during application shutdown if necessary
 
 
@@ -73,129 +185,6 @@ async def get_app_contexts() -> AppContexts:
     return app_contexts
 
 
-def extract_review_request_from_response(response_text: str) -> tuple[str, ReceiptReviewRequest | None]:
-    """
-    Extract review request data from agent response.
-    The agent should return structured data in a JSON code block.
-    
-    Returns:
-        tuple[str, ReceiptReviewRequest | None]: Sanitized response and review request if found.
-    """
-    review_request = None
-    sanitized_text = response_text
-    
-    # Try multiple patterns to find JSON code blocks
-    # Pattern 1: Standard JSON code block with ```json - extract everything between markers
-    json_block_pattern = r"```json\s*(.*?)\s*```"
-    json_match = re.search(json_block_pattern, response_text, re.DOTALL)
-    
-    # Pattern 2: JSON code block without language specifier
-    if not json_match:
-        json_block_pattern = r"```\s*(.*?)\s*```"
-        json_match = re.search(json_block_pattern, response_text, re.DOTALL)
-    
-    if json_match:
-        json_str = json_match.group(1).strip()
-        
-        try:
-            json_data = json.loads(json_str)
-            
-            # Check if this is a review request
-            if isinstance(json_data, dict) and "review_request" in json_data:
-                review_data = json_data["review_request"]
-                
-                # Validate required fields
-                required_fields = ["receipt_id", "store_name", "date", "total_cost", "payment_card", "card_last_four_digit"]
-                if not all(key in review_data for key in required_fields):
-                    logger.warning("Review request missing required fields", review_data_keys=list(review_data.keys()), required_fields=required_fields)
-                    return sanitized_text, None
-                
-                # Convert to ReviewItem objects
-                hsa_eligible_items = []
-                non_hsa_eligible_items = []
-                unsure_hsa_items = []
-                
-                try:
-                    hsa_eligible_items = [
-                        ReviewItem(**item) for item in review_data.get("hsa_eligible_items", [])
-                    ]
-                    non_hsa_eligible_items = [
-                        ReviewItem(**item) for item in review_data.get("non_hsa_eligible_items", [])
-                    ]
-                    unsure_hsa_items = [
-                        ReviewItem(**item) for item in review_data.get("unsure_hsa_items", [])
-                    ]
-                except Exception as e:
-                    logger.error(f"Error creating ReviewItem objects: {e}")
-                    return sanitized_text, None
-                
-                review_request = ReceiptReviewRequest(
-                    receipt_id=review_data.get("receipt_id", ""),
-                    store_name=review_data.get("store_name", ""),
-                    date=review_data.get("date", ""),
-                    total_cost=review_data.get("total_cost", 0.0),
-                    payment_card=review_data.get("payment_card", ""),
-                    card_last_four_digit=review_data.get("card_last_four_digit", ""),
-                    hsa_eligible_items=hsa_eligible_items,
-                    non_hsa_eligible_items=non_hsa_eligible_items,
-                    unsure_hsa_items=unsure_hsa_items,
-                )
-                
-                # Remove the JSON block from the response
-                sanitized_text = response_text.replace(json_match.group(0), "").strip()
-                logger.info("Successfully extracted review request from JSON")
-        
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing review request JSON: {e}", json_snippet=json_str[:200] if json_str else "No JSON string")
-        except Exception as e:
-            logger.error(f"Unexpected error parsing review request: {e}", exc_info=True)
-    else:
-        # Log that we couldn't find a JSON block - try to find JSON in the raw text
-        logger.debug("No JSON code block found in response for review request extraction")
-        # Try to find JSON object directly in the text as a fallback
-        try:
-            # Look for a JSON object starting with { and containing "review_request"
-            start_idx = response_text.find('{"review_request"')
-            if start_idx != -1:
-                # Find the matching closing brace
-                brace_count = 0
-                end_idx = start_idx
-                for i in range(start_idx, len(response_text)):
-                    if response_text[i] == '{':
-                        brace_count += 1
-                    elif response_text[i] == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            end_idx = i + 1
-                            break
-                
-                if end_idx > start_idx:
-                    json_str = response_text[start_idx:end_idx]
-                    json_data = json.loads(json_str)
-                    if isinstance(json_data, dict) and "review_request" in json_data:
-                        review_data = json_data["review_request"]
-                        hsa_eligible_items = [ReviewItem(**item) for item in review_data.get("hsa_eligible_items", [])]
-                        non_hsa_eligible_items = [ReviewItem(**item) for item in review_data.get("non_hsa_eligible_items", [])]
-                        unsure_hsa_items = [ReviewItem(**item) for item in review_data.get("unsure_hsa_items", [])]
-                        review_request = ReceiptReviewRequest(
-                            receipt_id=review_data.get("receipt_id", ""),
-                            store_name=review_data.get("store_name", ""),
-                            date=review_data.get("date", ""),
-                            total_cost=review_data.get("total_cost", 0.0),
-                            payment_card=review_data.get("payment_card", ""),
-                            card_last_four_digit=review_data.get("card_last_four_digit", ""),
-                            hsa_eligible_items=hsa_eligible_items,
-                            non_hsa_eligible_items=non_hsa_eligible_items,
-                            unsure_hsa_items=unsure_hsa_items,
-                        )
-                        sanitized_text = response_text[:start_idx] + response_text[end_idx:].strip()
-                        logger.info("Successfully extracted review request from raw JSON text")
-        except Exception as e:
-            logger.debug(f"Fallback JSON extraction also failed: {e}")
-    
-    return sanitized_text, review_request
-
-
 # Request logging middleware
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -204,14 +193,17 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         # Log incoming request
         request_body = None
         try:
-            if request.method in ["POST", "PUT", "PATCH"]:
+            # Multipart uploads are streamed to the endpoint untouched; buffering
+            # them here would hold every image in memory a second time
+            content_type = request.headers.get("content-type", "")
+            if request.method in ["POST", "PUT", "PATCH"] and not content_type.startswith("multipart/"):
                 body = await request.body()
                 if body:
                     request_body = body.decode('utf-8')[:1000]  # Log first 1000 chars
-                    # Re-create request body for endpoint processing
-                    async def receive():
-                        return {"type": "http.request", "body": body}
-                    request._receive = receive
+                    # BaseHTTPMiddleware caches the body and replays it to the endpoint;
+                    # overriding request._receive here breaks streaming responses,
+                    # which keep listening for http.disconnect
+
         except Exception as e:
             logger.warning(f"Could not read request body: {e}")
         
@@ -274,61 +266,123 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(
-    request: ChatRequest = Body(...),
-    app_context: AppContexts = Depends(get_app_contexts),
-) -> ChatResponse:
-    """Process chat request and get response from the agent"""
+def estimate_decoded_image_bytes(request: ChatRequest) -> int:
+    """Estimate the decoded size of a chat request's base64 images without decoding them."""
+    return sum(len(image.serialized_image) * 3 // 4 for image in request.files)
 
-    final_response_text = "Agent did not produce a final response."  # Default
 
-    # Use the session ID from the request or default if not provided
+async def admit_request(app_context: AppContexts, cost_bytes: int) -> AdmissionTicket:
+    """
+    Wait for admission of an agent request, translating overload into HTTP errors.
+
+    Args:
+        app_context: The application contexts.
+        cost_bytes: Estimated decoded size of the request's images.
+
+    Returns:
+        AdmissionTicket: The admission, to be released when the request is done.
+
+    Raises:
+        HTTPException: 429 with Retry-After when overloaded, 413 when the images
+            alone exceed the memory budget.
+    """
+    try:
+        return await app_context.admission.acquire(cost_bytes)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)}
+        )
+    except RequestTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+async def run_idempotent(
+    app_context: AppContexts,
+    response: Response,
+    scope: str,
+    idempotency_key: str | None,
+    payload: str,
+    handler: Callable[[], Awaitable[Any]],
+    cacheable: Callable[[Any], bool],
+) -> Any:
+    """
+    Run an endpoint handler at most once per Idempotency-Key.
+
+    Without a key the handler simply runs. With one, a retry gets the stored
+    (or still running) original's response, marked with an
+    `Idempotent-Replayed: true` header.
+
+    Args:
+        app_context: The application contexts.
+        response: The endpoint's response, to add the replay header to.
+        scope: Namespace of the key, e.g. the endpoint and user.
+        idempotency_key: The Idempotency-Key header, if sent.
+        payload: Serialized request, compared to detect a key reused for another request.
+        handler: Produces the response.
+        cacheable: Whether a response may be replayed; error responses are not.
+
+    Raises:
+        HTTPException: 422 when the key was already used for a different request.
+    """
+    if not idempotency_key:
+        return await handler()
+    fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    try:
+        result, replayed = await app_context.idempotency.run(
+            scope, idempotency_key, fingerprint, handler, cacheable
+        )
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def prepare_agent_message(
+    request: ChatRequest,
+    app_context: AppContexts,
+    images: list[IngestedImage] | None = None,
+) -> types.Content:
+    """
+    Track uploaded image URLs, store image artifacts and make sure the session exists.
+
+    Args:
+        request: The chat request.
+        app_context: The application contexts.
+        images: Already ingested uploads; decoded from `request.files` when omitted.
+
+    Returns:
+        types.Content: The user message in ADK format, ready to be sent to the agent.
+    """
     session_id = request.session_id
     user_id = request.user_id
-    
-    logger.info(
-        "Chat request received",
-        endpoint="/chat",
-        user_id=user_id,
-        session_id=session_id,
-        text_length=len(request.text) if request.text else 0,
-        files_count=len(request.files) if request.files else 0,
-        text_preview=request.text[:200] if request.text else None,
-    )
-    
-    # Track image URLs for uploaded images before processing
-    # Calculate hash IDs from uploaded images and store their URLs
-    import base64
-    import hashlib
-    
+
+    # Decode and hash uploaded images once, then track their URLs before processing
+    if images is None:
+        images = ingest_uploaded_images(request, APP_NAME)
     logger.info(
         "Processing uploaded images",
-        images_count=len(request.files),
+        images_count=len(images),
         user_id=user_id,
         session_id=session_id,
     )
-    
-    for idx, image_data in enumerate(request.files):
-        image_byte = base64.b64decode(image_data.serialized_image)
-        hasher = hashlib.sha256(image_byte)
-        image_hash_id = hasher.hexdigest()[:12]
-        
-        # Construct and store the image URL
-        image_url = get_gcs_image_url(
-            app_name=APP_NAME,
+
+    for idx, image in enumerate(images):
+        # SQLite calls run in a thread to keep the event loop free
+        await asyncio.to_thread(
+            app_context.image_registry.record,
+            receipt_id=image.image_hash_id,
             user_id=user_id,
             session_id=session_id,
-            image_hash_id=image_hash_id,
+            url=image.image_url,
         )
-        app_context.image_urls[image_hash_id] = image_url
         logger.info(
             "Image processed and URL tracked",
             image_index=idx + 1,
-            image_hash_id=image_hash_id,
-            image_url=image_url,
-            mime_type=image_data.mime_type,
-            image_size_bytes=len(image_byte),
+            image_hash_id=image.image_hash_id,
+            image_url=image.image_url,
+            mime_type=image.mime_type,
+            image_size_bytes=len(image.image_bytes),
         )
     
     # Prepare the user's message in ADK format and store image artifacts
@@ -341,6 +395,7 @@ async def chat(
         request=request,
         app_name=APP_NAME,
         artifact_service=app_context.artifact_service,
+        images=images,
     )
     logger.info(
         "User request formatted and artifacts stored",
@@ -379,6 +434,167 @@ async def chat(
             session_id=session_id,
         )
 
+    return content
+
+
+def extract_final_response_text(event: Event) -> str | None:
+    """
+    Get the user-facing text of a final response event.
+
+    Returns:
+        str | None: The response text, an escalation message, or None if the event carries neither.
+    """
+    if event.content and event.content.parts:
+        # Join the text parts, skipping model thoughts (only present when a planner is enabled)
+        texts = [part.text for part in event.content.parts if part.text and not part.thought]
+        if texts:
+            return "".join(texts)
+    if event.actions and event.actions.escalate:
+        # Handle potential errors/escalations
+        return f"Agent escalated: {event.error_message or 'No specific message.'}"
+    return None
+
+
+def extract_review_data(event: Event) -> List[dict]:
+    """Return the review requests the review tool published in this event's state delta."""
+    if not (event.actions and event.actions.state_delta):
+        return []
+    return [
+        value
+        for key, value in event.actions.state_delta.items()
+        if key.startswith(REVIEW_REQUEST_STATE_KEY_PREFIX)
+    ]
+
+
+async def build_chat_response(
+    final_response_text: str,
+    user_id: str,
+    session_id: str,
+    app_context: AppContexts,
+    review_data: List[dict] | None = None,
+) -> ChatResponse:
+    """
+    Turn the agent's final response text into a ChatResponse.
+
+    Extracts the thinking process and attachments from the markdown response
+    and resolves the attachment images. The review requests come from
+    `review_data` (published by the review tool, in order) when given, and a
+    single one is only parsed out of the response text as a fallback; each is
+    queued as pending for the user until approved.
+    """
+    logger.info(
+        "Received final response from agent",
+        raw_final_response_preview=final_response_text[:500],  # Log first 500 chars
+        full_response_length=len(final_response_text),
+        user_id=user_id,
+        session_id=session_id,
+    )
+
+    # Split the response into its sections and structured blocks
+    parsed = parse_agent_response(final_response_text)
+    sanitized_text = parsed.response
+    thinking_process = parsed.thinking_process
+    attachment_ids = parsed.attachment_ids
+    # A receipt reviewed twice in one turn keeps its latest review
+    review_requests = {}
+    for data in review_data or []:
+        review_request = build_review_request(data)
+        if review_request:
+            review_requests[review_request.receipt_id] = review_request
+    if not review_requests and parsed.review_request:
+        review_requests[parsed.review_request.receipt_id] = parsed.review_request
+    logger.info(
+        "Agent response parsed",
+        attachment_count=len(attachment_ids),
+        attachment_ids=attachment_ids,
+        has_thinking_process=bool(thinking_process),
+        thinking_process_length=len(thinking_process),
+        user_id=user_id,
+        session_id=session_id,
+    )
+
+    # Log if review requests were found or not
+    for review_request in review_requests.values():
+        logger.info(
+            "Review request extracted successfully",
+            receipt_id=review_request.receipt_id,
+            hsa_eligible_items_count=len(review_request.hsa_eligible_items),
+            non_hsa_eligible_items_count=len(review_request.non_hsa_eligible_items),
+            unsure_hsa_items_count=len(review_request.unsure_hsa_items),
+        )
+        await asyncio.to_thread(app_context.review_queue.add, user_id, session_id, review_request)
+    if not review_requests:
+        logger.warning(
+            "No review request found in response",
+            response_preview=final_response_text[:200],
+            has_json_block="```json" in final_response_text or '{"review_request"' in final_response_text or '"hsa_eligible_items"' in final_response_text,
+        )
+
+    # Replace hash IDs with references to the /images endpoint
+    logger.info(
+        "Resolving attachment images",
+        attachment_ids=attachment_ids,
+        user_id=user_id,
+        session_id=session_id,
+    )
+    attachments = await resolve_attachments(
+        artifact_service=app_context.artifact_service,
+        app_name=APP_NAME,
+        user_id=user_id,
+        session_id=session_id,
+        image_hashes=attachment_ids,
+    )
+    failed_attachment_ids = [
+        attachment.image_hash_id for attachment in attachments if attachment.error
+    ]
+    if failed_attachment_ids:
+        logger.warning(
+            "Some attachment images could not be resolved",
+            failed_attachment_ids=failed_attachment_ids,
+            user_id=user_id,
+            session_id=session_id,
+        )
+
+    logger.info(
+        "Chat request processing completed",
+        sanitized_response_length=len(sanitized_text),
+        thinking_process_length=len(thinking_process) if thinking_process else 0,
+        attachments_count=len(attachments) - len(failed_attachment_ids),
+        attachment_ids=attachment_ids,
+        review_requests_count=len(review_requests),
+        user_id=user_id,
+        session_id=session_id,
+    )
+
+    return ChatResponse(
+        response=sanitized_text,
+        thinking_process=thinking_process,
+        attachments=attachments,
+        review_request=next(iter(review_requests.values()), None),
+        review_requests=list(review_requests.values()),
+    )
+
+
+async def run_chat_turn(
+    request: ChatRequest,
+    app_context: AppContexts,
+    images: list[IngestedImage] | None = None,
+) -> ChatResponse:
+    """
+    Run one agent turn for a chat request and build the ChatResponse.
+
+    Args:
+        request: The chat request (text, session and user identifiers).
+        app_context: The application contexts.
+        images: Already ingested uploads; decoded from `request.files` when omitted.
+    """
+    final_response_text = "Agent did not produce a final response."  # Default
+
+    session_id = request.session_id
+    user_id = request.user_id
+
+    content = await prepare_agent_message(request, app_context, images)
+
     try:
         # Process the message with the agent
         logger.info(
@@ -395,8 +611,10 @@ async def chat(
         )
         
         event_count = 0
+        review_data: List[dict] = []
         async for event in events_iterator:  # event has type Event
             event_count += 1
+            review_data.extend(extract_review_data(event))
             logger.debug(
                 "Agent event received",
                 event_number=event_count,
@@ -416,29 +634,13 @@ async def chat(
                     session_id=session_id,
                 )
                 logger.info(f"Final response event details: {event.model_dump_json()}")
-                logger.info("Before extracting final response",
-                    event=event.content.parts[0].text,
+                final_response_text = extract_final_response_text(event) or final_response_text
+                logger.info(
+                    "Extracted final response from content",
+                    response_length=len(final_response_text),
                     user_id=user_id,
                     session_id=session_id,
                 )
-                if event.content and event.content.parts:
-                    # Extract text from the first part
-                    final_response_text = event.content.parts[0].text
-                    logger.info(
-                        "Extracted final response from content",
-                        response_length=len(final_response_text),
-                        user_id=user_id,
-                        session_id=session_id,
-                    )
-                elif event.actions and event.actions.escalate:
-                    # Handle potential errors/escalations
-                    final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
-                    logger.warning(
-                        "Agent escalated",
-                        error_message=event.error_message,
-                        user_id=user_id,
-                        session_id=session_id,
-                    )
                 break  # Stop processing events once the final response is found
         
         logger.info(
@@ -448,150 +650,785 @@ async def chat(
             session_id=session_id,
         )
 
-        logger.info(
-            "Received final response from agent",
-            raw_final_response_preview=final_response_text[:500],  # Log first 500 chars
-            full_response_length=len(final_response_text),
+        return await build_chat_response(
+            final_response_text=final_response_text,
             user_id=user_id,
             session_id=session_id,
+            app_context=app_context,
+            review_data=review_data,
         )
 
-        # Extract and process any attachments and thinking process in the response
-        logger.info(
-            "Extracting attachments and thinking process",
-            user_id=user_id,
-            session_id=session_id,
-        )
-        base64_attachments = []
-        sanitized_text, attachment_ids = extract_attachment_ids_and_sanitize_response(
-            final_response_text
-        )
-        logger.info(
-            "Attachments extracted",
-            attachment_count=len(attachment_ids),
-            attachment_ids=attachment_ids,
-            user_id=user_id,
-            session_id=session_id,
+    except Exception as e:
+        logger.error("Error processing chat request", error_message=str(e))
+        return ChatResponse(
+            response="", error=f"Error in generating response: {str(e)}"
         )
-        
-        sanitized_text, thinking_process = extract_thinking_process(sanitized_text)
-        logger.info(
-            "Thinking process extracted",
-            has_thinking_process=bool(thinking_process),
-            thinking_process_length=len(thinking_process) if thinking_process else 0,
-            user_id=user_id,
-            session_id=session_id,
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(
+    response: Response,
+    request: ChatRequest = Body(...),
+    idempotency_key: str | None = Header(None),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> ChatResponse:
+    """
+    Process chat request and get response from the agent.
+
+    With an `Idempotency-Key` header, a retried request is answered with the
+    original run's response instead of running the agent again.
+    """
+
+    logger.info(
+        "Chat request received",
+        endpoint="/chat",
+        user_id=request.user_id,
+        session_id=request.session_id,
+        text_length=len(request.text) if request.text else 0,
+        files_count=len(request.files) if request.files else 0,
+        text_preview=request.text[:200] if request.text else None,
+    )
+
+    async def handle() -> ChatResponse:
+        ticket = await admit_request(app_context, estimate_decoded_image_bytes(request))
+        try:
+            async with app_context.session_locks.hold(request.user_id, request.session_id):
+                return await run_chat_turn(request, app_context)
+        finally:
+            ticket.release()
+
+    return await run_idempotent(
+        app_context,
+        response,
+        scope=f"/chat:{request.user_id}",
+        idempotency_key=idempotency_key,
+        payload=request.model_dump_json(),
+        handler=handle,
+        cacheable=lambda chat_response: chat_response.error is None,
+    )
+
+
+@app.post("/chat/upload", response_model=ChatResponse)
+async def chat_upload(
+    text: str = Form(""),
+    session_id: str = Form("default_session"),
+    user_id: str = Form("default_user"),
+    files: List[UploadFile] = File([]),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> ChatResponse:
+    """
+    Process a multipart/form-data chat request with binary image uploads.
+
+    Same behaviour as /chat, but images arrive as raw file parts instead of
+    base64 strings inside JSON. Each part is read from its spooled temporary
+    file in chunks and hashed incrementally; no base64 text is ever built.
+    """
+    request = ChatRequest(text=text, session_id=session_id, user_id=user_id)
+
+    logger.info(
+        "Chat request received",
+        endpoint="/chat/upload",
+        user_id=user_id,
+        session_id=session_id,
+        text_length=len(text),
+        files_count=len(files),
+        text_preview=text[:200] if text else None,
+    )
+
+    # Admit before reading the spooled parts into memory
+    ticket = await admit_request(app_context, sum(upload.size or 0 for upload in files))
+    try:
+        images = [
+            await ingest_uploaded_file(upload, APP_NAME, user_id, session_id)
+            for upload in files
+        ]
+        async with app_context.session_locks.hold(user_id, session_id):
+            return await run_chat_turn(request, app_context, images)
+    finally:
+        ticket.release()
+
+
+def agent_event_to_sse(event: Event) -> list[str]:
+    """
+    Translate an intermediate agent event into zero or more SSE messages.
+
+    Streamed text chunks become `delta` (or `thinking` for model thoughts),
+    function calls become `tool_call` and function responses become `tool_result`.
+    """
+    messages = []
+    if event.partial and event.content and event.content.parts:
+        for part in event.content.parts:
+            if part.text:
+                messages.append(
+                    format_sse_event(
+                        "thinking" if part.thought else "delta",
+                        {"author": event.author, "text": part.text},
+                    )
+                )
+    for function_call in event.get_function_calls():
+        messages.append(
+            format_sse_event(
+                "tool_call",
+                {"author": event.author, "id": function_call.id, "name": function_call.name},
+            )
         )
-        
-        # Extract review request if present - use the original response text before sanitization
-        # to ensure we capture the JSON even if it's in the thinking process or attachments section
-        sanitized_text, review_request = extract_review_request_from_response(final_response_text)
-        
-        # If not found in final response, try the sanitized text as fallback
-        if not review_request:
-            sanitized_text, review_request = extract_review_request_from_response(sanitized_text)
-        
-        # Log if review request was found or not
-        if review_request:
-            logger.info(
-                "Review request extracted successfully",
-                receipt_id=review_request.receipt_id,
-                hsa_eligible_items_count=len(review_request.hsa_eligible_items),
-                non_hsa_eligible_items_count=len(review_request.non_hsa_eligible_items),
-                unsure_hsa_items_count=len(review_request.unsure_hsa_items),
+    for function_response in event.get_function_responses():
+        messages.append(
+            format_sse_event(
+                "tool_result",
+                {"author": event.author, "id": function_response.id, "name": function_response.name},
             )
-        else:
-            logger.warning(
-                "No review request found in response",
-                response_preview=final_response_text[:200],
-                has_json_block="```json" in final_response_text or '{"review_request"' in final_response_text or '"hsa_eligible_items"' in final_response_text,
+        )
+    return messages
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest = Body(...),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> StreamingResponse:
+    """
+    Process chat request and stream agent progress as Server-Sent Events.
+
+    Emits `delta`/`thinking` text chunks, `tool_call`/`tool_result` events while
+    the agent works, a `review_request` event when human review is needed, and a
+    closing `final` event carrying the full ChatResponse (or an `error` event).
+    """
+    session_id = request.session_id
+    user_id = request.user_id
+
+    logger.info(
+        "Chat stream request received",
+        endpoint="/chat/stream",
+        user_id=user_id,
+        session_id=session_id,
+        text_length=len(request.text) if request.text else 0,
+        files_count=len(request.files) if request.files else 0,
+        text_preview=request.text[:200] if request.text else None,
+    )
+
+    # Admit before responding, so overload is reported as a 429 rather than a stream error
+    ticket = await admit_request(app_context, estimate_decoded_image_bytes(request))
+
+    async def event_stream() -> AsyncIterator[str]:
+        # Held until the stream ends or the client disconnects
+        try:
+            async with app_context.session_locks.hold(user_id, session_id):
+                async for message in agent_event_stream():
+                    yield message
+        finally:
+            ticket.release()
+
+    async def agent_event_stream() -> AsyncIterator[str]:
+        final_response_text = "Agent did not produce a final response."  # Default
+        try:
+            content = await prepare_agent_message(request, app_context)
+
+            events_iterator: AsyncIterator[Event] = (
+                app_context.expense_manager_agent_runner.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=content,
+                    run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+                )
             )
 
-        # Download images from GCS and replace hash IDs with base64 data
-        logger.info(
-            "Downloading attachment images from GCS",
-            attachment_ids=attachment_ids,
-            user_id=user_id,
-            session_id=session_id,
-        )
-        for idx, image_hash_id in enumerate(attachment_ids):
+            event_count = 0
+            review_data: List[dict] = []
+            # Receipts whose review form was already sent, with the review sent
+            sent_reviews = {}
+            async for event in events_iterator:
+                event_count += 1
+                event_review_data = extract_review_data(event)
+                review_data.extend(event_review_data)
+                if event.is_final_response():
+                    final_response_text = extract_final_response_text(event) or final_response_text
+                    break
+                for message in agent_event_to_sse(event):
+                    yield message
+                for data in event_review_data:
+                    # Show the review form while the agent is still writing its reply
+                    review_request = build_review_request(data)
+                    if review_request:
+                        await asyncio.to_thread(app_context.review_queue.add, user_id, session_id, review_request)
+                        yield format_sse_event("review_request", review_request.model_dump())
+                        sent_reviews[review_request.receipt_id] = review_request
+
             logger.info(
-                "Downloading attachment image",
-                image_index=idx + 1,
-                total_attachments=len(attachment_ids),
-                image_hash_id=image_hash_id,
+                "Agent streaming completed",
+                total_events=event_count,
                 user_id=user_id,
                 session_id=session_id,
             )
-            # Download image data and get MIME type
-            result = await download_image_from_gcs(
-                artifact_service=app_context.artifact_service,
-                image_hash=image_hash_id,
-                app_name=APP_NAME,
+
+            chat_response = await build_chat_response(
+                final_response_text=final_response_text,
                 user_id=user_id,
                 session_id=session_id,
+                app_context=app_context,
+                review_data=review_data,
             )
-            if result:
-                base64_data, mime_type = result
-                base64_attachments.append(
-                    ImageData(serialized_image=base64_data, mime_type=mime_type)
-                )
-                logger.info(
-                    "Attachment image downloaded successfully",
-                    image_index=idx + 1,
-                    image_hash_id=image_hash_id,
-                    mime_type=mime_type,
-                    base64_length=len(base64_data),
-                    user_id=user_id,
-                    session_id=session_id,
-                )
-            else:
-                logger.warning(
-                    "Failed to download attachment image",
-                    image_index=idx + 1,
-                    image_hash_id=image_hash_id,
-                    user_id=user_id,
-                    session_id=session_id,
-                )
+            for review_request in chat_response.review_requests:
+                if sent_reviews.get(review_request.receipt_id) != review_request:
+                    yield format_sse_event("review_request", review_request.model_dump())
+            yield format_sse_event("final", chat_response.model_dump())
 
-        logger.info(
-            "Chat request processing completed",
-            sanitized_response_length=len(sanitized_text),
-            thinking_process_length=len(thinking_process) if thinking_process else 0,
-            attachments_count=len(base64_attachments),
-            attachment_ids=attachment_ids,
-            has_review_request=review_request is not None,
-            user_id=user_id,
+        except Exception as e:
+            logger.error("Error processing chat stream request", error_message=str(e))
+            yield format_sse_event(
+                "error", {"error": f"Error in generating response: {str(e)}"}
+            )
+
+    stream = event_stream()
+    # A stream dropped before it started never runs its finally block
+    weakref.finalize(stream, ticket.release)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def metrics(app_context: AppContexts = Depends(get_app_contexts)) -> dict:
+    """Report agent turn queueing and cache statistics of this worker."""
+    result = {
+        "admission": app_context.admission.stats(),
+        "database": app_context.database.stats(),
+        "idempotency": app_context.idempotency.stats(),
+        "jobs": {
+            "queued": await asyncio.to_thread(app_context.job_store.count_queued),
+            "workers": len(app_context.job_workers),
+        },
+        "session_locks": app_context.session_locks.stats(),
+    }
+    if isinstance(app_context.session_service, SqliteSessionService):
+        result["session_cache"] = app_context.session_service.stats()
+    if isinstance(app_context.artifact_service, CachedArtifactService):
+        result["artifact_cache"] = app_context.artifact_service.stats()
+    return result
+
+
+async def run_job(job_id: str, request: ChatRequest, app_context: AppContexts) -> None:
+    """Run a claimed chat job and record its outcome, heartbeating while it runs."""
+    store = app_context.job_store
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(store.lease_seconds / 3)
+            await asyncio.to_thread(store.heartbeat, job_id)
+
+    logger.info("Job started", job_id=job_id, user_id=request.user_id, session_id=request.session_id)
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        async with app_context.session_locks.hold(request.user_id, request.session_id):
+            chat_response = await run_chat_turn(request, app_context)
+        await asyncio.to_thread(store.finish, job_id, chat_response)
+        logger.info("Job finished", job_id=job_id, error=chat_response.error)
+    except Exception as e:
+        logger.error("Job failed", job_id=job_id, error_message=str(e), exc_info=True)
+        await asyncio.to_thread(store.finish, job_id, None, error=f"Error in generating response: {str(e)}")
+    finally:
+        heartbeat_task.cancel()
+
+
+async def job_worker(app_context: AppContexts) -> None:
+    """Claim and run queued jobs until cancelled at shutdown."""
+    store = app_context.job_store
+    while True:
+        try:
+            await asyncio.to_thread(store.fail_interrupted)
+            claimed = await asyncio.to_thread(store.claim)
+        except Exception as e:
+            logger.error("Job queue unavailable", error_message=str(e))
+            claimed = None
+        if claimed is None:
+            await store.wait_for_work()
+            continue
+        await run_job(*claimed, app_context)
+
+
+# Message sent with each receipt of a batch upload unless the client provides one
+BATCH_RECEIPT_PROMPT = "Please analyze this receipt and categorize its items for my review."
+
+
+async def run_isolated_receipt_turn(
+    image: IngestedImage,
+    user_id: str,
+    session_id: str,
+    text: str,
+    app_context: AppContexts,
+) -> ChatResponse:
+    """
+    Analyze one receipt image in its own short-lived session.
+
+    The session only ever holds this receipt's turn, so the prompt stays the
+    same size however many receipts are processed; it is deleted afterwards.
+    The review request is queued like any other, and the image stays
+    available from the /images endpoint.
+    """
+    request = ChatRequest(text=text, session_id=session_id, user_id=user_id)
+    try:
+        async with app_context.session_locks.hold(user_id, session_id):
+            return await run_chat_turn(request, app_context, [image])
+    finally:
+        await app_context.session_service.delete_session(
+            app_name=APP_NAME, user_id=user_id, session_id=session_id
+        )
+
+
+async def process_batch_receipt(
+    index: int,
+    upload_path: str,
+    filename: str,
+    headers: Dict[str, str],
+    batch_id: str,
+    user_id: str,
+    text: str,
+    app_context: AppContexts,
+) -> BatchReceiptResult:
+    """Analyze one receipt of a batch in its own short-lived session."""
+    session_id = f"batch-{batch_id}-{index}"
+    try:
+        with open(upload_path, "rb") as file:
+            image = await ingest_uploaded_file(
+                UploadFile(file=file, filename=filename, headers=Headers(headers=headers)),
+                APP_NAME,
+                user_id,
+                session_id,
+            )
+        chat_response = await run_isolated_receipt_turn(
+            image, user_id, session_id, text, app_context
+        )
+        return BatchReceiptResult(
+            index=index,
+            filename=filename,
             session_id=session_id,
+            image_hash_id=image.image_hash_id,
+            response=chat_response.response,
+            review_request=chat_response.review_request,
+            error=chat_response.error,
+        )
+    except Exception as e:
+        logger.error(
+            "Batch receipt failed",
+            batch_id=batch_id,
+            index=index,
+            filename=filename,
+            error_message=str(e),
+            exc_info=True,
+        )
+        return BatchReceiptResult(
+            index=index,
+            filename=filename,
+            session_id=session_id,
+            error=f"Error processing receipt: {str(e)}",
         )
 
-        return ChatResponse(
-            response=sanitized_text,
-            thinking_process=thinking_process,
-            attachments=base64_attachments,
-            review_request=review_request,
+
+@app.post("/receipts/batch")
+async def receipts_batch(
+    files: List[UploadFile] = File(...),
+    user_id: str = Form("default_user"),
+    text: str = Form(BATCH_RECEIPT_PROMPT),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> StreamingResponse:
+    """
+    Analyze many receipt images, streaming each receipt's result as it completes.
+
+    Every receipt runs in its own short-lived agent session, at most
+    RECEIPT_BATCH_CONCURRENCY at a time. Emits a `batch` event, a `receipt`
+    event (BatchReceiptResult) per receipt in completion order, and a closing
+    `final` event with the counts. Review requests are also queued under
+    GET /reviews/pending.
+    """
+    if len(files) > SETTINGS.RECEIPT_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may hold at most {SETTINGS.RECEIPT_BATCH_MAX_FILES} files",
         )
+    batch_id = uuid.uuid4().hex[:12]
+    logger.info(
+        "Receipt batch received",
+        endpoint="/receipts/batch",
+        batch_id=batch_id,
+        user_id=user_id,
+        files_count=len(files),
+    )
 
-    except Exception as e:
-        logger.error("Error processing chat request", error_message=str(e))
-        return ChatResponse(
-            response="", error=f"Error in generating response: {str(e)}"
+    # Only the receipts being analyzed are read into memory at any time
+    sizes = sorted((upload.size or 0 for upload in files), reverse=True)
+    ticket = await admit_request(app_context, sum(sizes[: SETTINGS.RECEIPT_BATCH_CONCURRENCY]))
+
+    # Copy the parts out of the request's spooled files, which may be closed
+    # as soon as this function returns, before the stream has used them
+    batch_dir = tempfile.mkdtemp(prefix=f"receipt-batch-{batch_id}-")
+
+    def cleanup() -> None:
+        ticket.release()
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+    try:
+        receipts = []
+        for index, upload in enumerate(files):
+            upload_path = f"{batch_dir}/{index}"
+            with open(upload_path, "wb") as file:
+                await asyncio.to_thread(shutil.copyfileobj, upload.file, file)
+            receipts.append((index, upload_path, upload.filename or "", dict(upload.headers)))
+    except Exception:
+        cleanup()
+        raise
+
+    async def event_stream() -> AsyncIterator[str]:
+        semaphore = asyncio.Semaphore(SETTINGS.RECEIPT_BATCH_CONCURRENCY)
+
+        async def bounded(receipt) -> BatchReceiptResult:
+            async with semaphore:
+                return await process_batch_receipt(
+                    *receipt, batch_id=batch_id, user_id=user_id, text=text, app_context=app_context
+                )
+
+        tasks = [asyncio.create_task(bounded(receipt)) for receipt in receipts]
+        try:
+            yield format_sse_event("batch", {"batch_id": batch_id, "receipts_count": len(tasks)})
+            failed = reviews = 0
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += result.error is not None
+                reviews += result.review_request is not None
+                yield format_sse_event("receipt", result.model_dump())
+            logger.info(
+                "Receipt batch completed",
+                batch_id=batch_id,
+                receipts_count=len(tasks),
+                failed_count=failed,
+                review_requests_count=reviews,
+            )
+            yield format_sse_event(
+                "final",
+                {
+                    "batch_id": batch_id,
+                    "receipts_count": len(tasks),
+                    "failed_count": failed,
+                    "review_requests_count": reviews,
+                },
+            )
+        finally:
+            # Client went away or the batch finished: stop whatever is still running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            cleanup()
+
+    stream = event_stream()
+    # A stream dropped before it started never runs its finally block
+    weakref.finalize(stream, cleanup)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/jobs/chat", response_model=Job, status_code=202)
+async def create_chat_job(
+    response: Response,
+    request: ChatRequest = Body(...),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> Job:
+    """
+    Queue a chat request to run in the background and return its job right away.
+
+    The job is stored in SQLite, so its result can be fetched from
+    GET /jobs/{job_id} even after the client disconnects or the backend restarts.
+    """
+    if await asyncio.to_thread(app_context.job_store.count_queued) >= SETTINGS.JOB_MAX_QUEUED:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many queued jobs",
+            headers={"Retry-After": str(max(1, round(SETTINGS.JOB_POLL_MAX_WAIT_SECONDS)))},
+        )
+    job = await asyncio.to_thread(app_context.job_store.create, request)
+    logger.info(
+        "Chat job queued",
+        endpoint="/jobs/chat",
+        job_id=job.job_id,
+        user_id=request.user_id,
+        session_id=request.session_id,
+        files_count=len(request.files),
+    )
+    response.headers["Location"] = f"/jobs/{job.job_id}"
+    return job
+
+
+@app.get("/jobs/{job_id}", response_model=Job)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=SETTINGS.JOB_POLL_MAX_WAIT_SECONDS),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> Job:
+    """
+    Get a job's status, and its ChatResponse once finished.
+
+    With `wait` (seconds), an unfinished job is held open until its status
+    changes or the wait expires (long-poll).
+    """
+    job = await asyncio.to_thread(app_context.job_store.get, job_id)
+    if job and wait and job.status not in FINAL_JOB_STATUSES:
+        job = await app_context.job_store.wait_for_update(job_id, job.status, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(
+    job_id: str,
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> StreamingResponse:
+    """
+    Stream a job's progress as Server-Sent Events.
+
+    Emits a `status` event for the current status and each change, then a
+    closing `final` event carrying the finished job with its ChatResponse.
+    """
+    store = app_context.job_store
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def event_stream() -> AsyncIterator[str]:
+        current = job
+        yield format_sse_event("status", {"job_id": job_id, "status": current.status})
+        while current.status not in FINAL_JOB_STATUSES:
+            updated = await store.wait_for_update(job_id, current.status, SETTINGS.JOB_POLL_MAX_WAIT_SECONDS)
+            if updated is None:
+                return
+            if updated.status == current.status:
+                # Keep idle connections from being closed by proxies
+                yield ": keepalive\n\n"
+                continue
+            current = updated
+            yield format_sse_event("status", {"job_id": job_id, "status": current.status})
+        yield format_sse_event("final", current.model_dump())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Image artifacts are content-addressed, so a given URL never changes content
+IMAGE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+async def serve_local_image(
+    image_hash_id: str,
+    user_id: str,
+    session_id: str,
+    request: Request,
+    app_context: AppContexts,
+    cache_headers: Dict[str, str],
+) -> Response:
+    """
+    Serve an image straight from the local artifact store's blob file.
+
+    Full responses go through FileResponse (sendfile on servers supporting
+    the ASGI pathsend extension); ranges are streamed from a memory map.
+    """
+    resolved = await asyncio.to_thread(
+        app_context.artifact_service.get_artifact_path,
+        app_name=APP_NAME,
+        user_id=user_id,
+        filename=image_hash_id,
+        session_id=session_id,
+    )
+    if not resolved:
+        raise HTTPException(status_code=404, detail=f"Image {image_hash_id} not found")
+    blob_path, mime_type = resolved
+
+    headers = {**cache_headers, "Accept-Ranges": "bytes"}
+    size = (await asyncio.to_thread(blob_path.stat)).st_size
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            return StreamingResponse(
+                iter_file_range(blob_path, start, end),
+                status_code=206,
+                media_type=mime_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+
+    return FileResponse(blob_path, media_type=mime_type, headers=headers)
+
+
+@app.get("/images/{image_hash_id}")
+async def get_image(
+    image_hash_id: str,
+    request: Request,
+    user_id: str = "default_user",
+    session_id: str = "default_session",
+    thumbnail: int | None = Query(None, ge=16, le=2048),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> Response:
+    """
+    Serve a stored receipt image by its hash ID.
+
+    Supports conditional GETs (ETag / If-None-Match), single byte ranges and
+    an optional `thumbnail` size (longest side in pixels, served as JPEG).
+    Responses are marked immutable since the hash ID identifies the content.
+    """
+    etag = f'"{image_hash_id}-t{thumbnail}"' if thumbnail else f'"{image_hash_id}"'
+    cache_headers = {"ETag": etag, "Cache-Control": IMAGE_CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=cache_headers)
+
+    if not thumbnail and isinstance(app_context.artifact_service, LocalArtifactService):
+        return await serve_local_image(image_hash_id, user_id, session_id, request, app_context, cache_headers)
+
+    result = await download_image_from_gcs(
+        artifact_service=app_context.artifact_service,
+        app_name=APP_NAME,
+        user_id=user_id,
+        session_id=session_id,
+        image_hash=image_hash_id,
+    )
+    if not result:
+        raise HTTPException(status_code=404, detail=f"Image {image_hash_id} not found")
+    image_bytes, mime_type = result
+
+    if thumbnail:
+        try:
+            image_bytes, mime_type = await asyncio.to_thread(make_thumbnail, image_bytes, thumbnail)
+        except Exception as e:
+            logger.warning("Thumbnail generation failed", image_hash_id=image_hash_id, error_message=str(e))
+            raise HTTPException(status_code=415, detail="Image cannot be thumbnailed")
+
+    headers = {**cache_headers, "Accept-Ranges": "bytes"}
+    size = len(image_bytes)
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            return Response(
+                content=image_bytes[start:end + 1],
+                status_code=206,
+                media_type=mime_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+            )
+
+    return Response(content=image_bytes, media_type=mime_type, headers=headers)
+
+
+@app.get("/reviews/pending", response_model=PendingReviewsResponse)
+async def get_pending_reviews(
+    request: Request,
+    user_id: str = "default_user",
+    wait: float = Query(0, ge=0, le=SETTINGS.REVIEW_POLL_MAX_WAIT_SECONDS),
+    app_context: AppContexts = Depends(get_app_contexts),
+) -> Response:
+    """
+    List the user's receipt reviews awaiting approval.
+
+    The ETag is the version of the user's queue. A request whose
+    If-None-Match matches it gets 304 Not Modified; with `wait` (seconds),
+    it is held open until the queue changes or the wait expires (long-poll).
+    """
+    queue = app_context.review_queue
+    version = await asyncio.to_thread(queue.version, user_id)
+    if_none_match = request.headers.get("if-none-match")
+    client_tags = [tag.strip() for tag in if_none_match.split(",")] if if_none_match else []
+    if f'"{version}"' in client_tags and wait:
+        version = await queue.wait_for_change(user_id, version, wait)
+    if f'"{version}"' in client_tags:
+        return Response(
+            status_code=304, headers={"ETag": f'"{version}"', "Cache-Control": "no-cache"}
         )
 
+    version, reviews = await asyncio.to_thread(queue.list_pending, user_id)
+    return Response(
+        content=PendingReviewsResponse(version=version, reviews=reviews).model_dump_json(),
+        media_type="application/json",
+        headers={"ETag": f'"{version}"', "Cache-Control": "no-cache"},
+    )
+
+
+@app.delete("/reviews/pending/{receipt_id}")
+async def dismiss_pending_review(
+    receipt_id: str,
+    user_id: str = "default_user",
+    app_context: AppContexts = Depends(get_app_contexts),
+):
+    """Drop a receipt from the user's pending reviews without storing it."""
+    removed = await asyncio.to_thread(
+        app_context.review_queue.remove, sanitize_image_id(receipt_id), user_id=user_id
+    )
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"No pending review for receipt {receipt_id}")
+    logger.info("Pending review dismissed", receipt_id=receipt_id, user_id=user_id)
+    return {"receipt_id": receipt_id, "dismissed": True}
+
 
 @app.post("/review")
 async def review(
+    response: Response,
     review_response: ReceiptReviewResponse = Body(...),
+    idempotency_key: str | None = Header(None),
     app_context: AppContexts = Depends(get_app_contexts),
 ):
     """
     Process receipt review approval and store approved HSA eligible items in SQL database.
     Returns all rows from the database in JSON format.
+
+    With an `Idempotency-Key` header, a retried approval is answered with the
+    original response instead of storing the receipt again.
+    """
+    return await run_idempotent(
+        app_context,
+        response,
+        scope=f"/review:{review_response.user_id}",
+        idempotency_key=idempotency_key,
+        payload=review_response.model_dump_json(),
+        handler=lambda: store_reviewed_receipt(review_response, app_context),
+        cacheable=lambda result: "error" not in result,
+    )
+
+
+async def store_reviewed_receipt(
+    review_response: ReceiptReviewResponse,
+    app_context: AppContexts,
+) -> dict:
+    """
+    Store an approved receipt in Firestore and its HSA eligible items in the SQL database.
+
+    Returns:
+        dict: All rows of the SQL database under "items", or an "error" message.
     """
     logger.info(
         "Review request received",
         endpoint="/review",
         receipt_id=review_response.receipt_id,
+        user_id=review_response.user_id,
         store_name=review_response.store_name,
         date=review_response.date,
         total_cost=review_response.total_cost,
@@ -707,34 +1544,35 @@ async def review(
             result=str(result)[:200] if result else None,
         )
         
-        # Get the image URL for the receipt
-        # Try to get from tracked URLs first, otherwise construct it
-        logger.info(
-            "Retrieving image URL",
-            receipt_id=review_response.receipt_id,
-            image_url_in_tracked=review_response.receipt_id in app_context.image_urls,
+        # Get the image URL recorded when the receipt image was uploaded
+        receipt_image = await asyncio.to_thread(
+            app_context.image_registry.lookup,
+            sanitize_image_id(review_response.receipt_id),
+            user_id=review_response.user_id,
         )
-        image_url = app_context.image_urls.get(review_response.receipt_id)
-        if not image_url:
-            # If not tracked, construct the URL (may need user_id/session_id from context)
-            # For now, use a generic structure - in production, you'd want to track these
-            image_url = get_gcs_image_url(
+        if receipt_image:
+            image_url = receipt_image.url
+            logger.info(
+                "Image URL retrieved from image registry",
+                receipt_id=review_response.receipt_id,
+                image_url=image_url,
+                user_id=receipt_image.user_id,
+                session_id=receipt_image.session_id,
+            )
+        else:
+            # Unknown receipt (e.g. uploaded before the registry existed): construct
+            # the URL for the approving user and the default session
+            image_url = get_artifact_image_url(
                 app_name=APP_NAME,
-                user_id="default_user",  # In production, get from review context
-                session_id="default_session",  # In production, get from review context
-                image_hash_id=review_response.receipt_id,
+                user_id=review_response.user_id,
+                session_id="default_session",
+                image_hash_id=sanitize_image_id(review_response.receipt_id),
             )
             logger.warning(
-                "Image URL not found in tracked URLs, constructed",
+                "Image URL not found in image registry, constructed",
                 receipt_id=review_response.receipt_id,
                 constructed_url=image_url,
             )
-        else:
-            logger.info(
-                "Image URL retrieved from tracked URLs",
-                receipt_id=review_response.receipt_id,
-                image_url=image_url,
-            )
         
         # Prepare items for SQL insertion
         logger.info(
@@ -758,15 +1596,24 @@ async def review(
             receipt_id=review_response.receipt_id,
             items_count=len(items_for_sql),
         )
-        app_context.database.insert_approved_items(
+        await app_context.database.insert_approved_items(
             items=items_for_sql,
             store_name=review_response.store_name,
             date=review_response.date,
             image_url=image_url,
             payment_card=review_response.payment_card,
             card_last_four_digit=review_response.card_last_four_digit,
+            receipt_id=sanitize_image_id(review_response.receipt_id),
         )
         
+        # Receipt IDs are content hashes shared by every user who uploaded the image,
+        # so only the approving user's pending review is dropped
+        await asyncio.to_thread(
+            app_context.review_queue.remove,
+            sanitize_image_id(review_response.receipt_id),
+            user_id=review_response.user_id,
+        )
+
         logger.info(
             "Receipt review approved and stored",
             receipt_id=review_response.receipt_id,
@@ -781,7 +1628,7 @@ async def review(
             "Retrieving all items from SQL database",
             receipt_id=review_response.receipt_id,
         )
-        all_items = app_context.database.get_all_items()
+        all_items = await app_context.database.get_all_items()
         logger.info(
             "Retrieved all items from SQL database",
             receipt_id=review_response.receipt_id,
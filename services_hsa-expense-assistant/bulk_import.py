@@ -0,0 +1,381 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Bulk-import a directory of receipt images:
+
+    python bulk_import.py /path/to/receipts --user-id default_user
+
+Images are hashed and checked in a process pool, receipts already stored
+(or already handled by an earlier run) are skipped, and the rest are
+analyzed by the agent with bounded concurrency. Every receipt's review
+request lands in the pending-review queue. Progress is checkpointed to
+SQLite, so re-running the same command resumes an interrupted import.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from PIL import Image, UnidentifiedImageError
+
+import logger
+from database import Database
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+# Formats Pillow decodes without plugins (HEIC/HEIF would need pillow-heif)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+
+# Checkpoint statuses; imported and skipped files are not looked at again
+STATUS_HASHED = "hashed"
+STATUS_IMPORTED = "imported"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+PROGRESS_INTERVAL_SECONDS = 30.0
+
+
+class ImportFile(NamedTuple):
+    """A receipt image file and what the import knows about it."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    digest: str = ""
+    mime_type: str = ""
+
+
+def inspect_image(path: str) -> Tuple[str, str]:
+    """
+    Hash an image file and check that it decodes. Runs in a worker process.
+
+    Args:
+        path: Path of the image file
+
+    Returns:
+        Tuple[str, str]: The image hash ID and the image's MIME type
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    with Image.open(io.BytesIO(data)) as image:
+        image.verify()
+        mime_type = Image.MIME.get(image.format or "", "application/octet-stream")
+    return digest, mime_type
+
+
+class ImportCheckpoint:
+    """Per-file import progress stored in SQLite.
+
+    A file is identified by its path, size and modification time; a file
+    that changed since it was checkpointed is processed again.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Open (and if needed create) the checkpoint database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self._conn = sqlite3.connect(db_path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS import_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT,
+                mime_type TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_import_files_digest ON import_files (digest)")
+
+    def lookup(self, file: ImportFile) -> Optional[Tuple[str, str, str]]:
+        """
+        Get the checkpointed digest, MIME type and status of an unchanged file.
+
+        Returns:
+            Tuple[str, str, str] | None: The checkpoint, or None if the file is new or changed
+        """
+        return self._conn.execute(
+            "SELECT digest, mime_type, status FROM import_files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (file.path, file.size, file.mtime_ns),
+        ).fetchone()
+
+    def imported_digests(self) -> Set[str]:
+        """Return the digests of all files imported so far."""
+        return {
+            row[0]
+            for row in self._conn.execute(
+                "SELECT digest FROM import_files WHERE status = ?", (STATUS_IMPORTED,)
+            )
+        }
+
+    def record(self, file: ImportFile, status: str, error: Optional[str] = None) -> None:
+        """Record a file's progress."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO import_files"
+            " (path, size, mtime_ns, digest, mime_type, status, error, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (file.path, file.size, file.mtime_ns, file.digest, file.mime_type, status, error, time.time()),
+        )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+
+def find_images(root: str) -> List[ImportFile]:
+    """List the image files under a directory, in a stable order."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = os.path.abspath(os.path.join(dirpath, filename))
+            stat = os.stat(path)
+            files.append(ImportFile(path, stat.st_size, stat.st_mtime_ns))
+    return files
+
+
+def stored_receipt_ids(database: Database) -> Set[str]:
+    """Collect the receipt IDs (image hash IDs) of approved items in the SQL database."""
+    return set(database.get_receipt_ids())
+
+
+async def hash_files(
+    files: List[ImportFile], checkpoint: ImportCheckpoint, processes: int, counts: Dict[str, int]
+) -> List[ImportFile]:
+    """
+    Hash and verify new or changed files in a process pool.
+
+    Returns:
+        List[ImportFile]: Files still to be imported, with their digest and MIME type
+    """
+    pending: List[ImportFile] = []
+    to_hash: List[ImportFile] = []
+    for file in files:
+        checkpointed = checkpoint.lookup(file)
+        if checkpointed is None:
+            to_hash.append(file)
+            continue
+        digest, mime_type, status = checkpointed
+        if status in (STATUS_IMPORTED, STATUS_SKIPPED):
+            counts["already_done"] += 1
+        elif digest:
+            pending.append(file._replace(digest=digest, mime_type=mime_type))
+        else:
+            # Failed before it was hashed, e.g. a file that did not decode
+            to_hash.append(file)
+
+    async def hash_one(pool: ProcessPoolExecutor, file: ImportFile) -> None:
+        try:
+            digest, mime_type = await loop.run_in_executor(pool, inspect_image, file.path)
+        except UnidentifiedImageError:
+            checkpoint.record(file, STATUS_FAILED, "Not a readable image")
+            counts["failed"] += 1
+            return
+        except Exception as e:
+            checkpoint.record(file, STATUS_FAILED, f"Could not read image: {e}")
+            counts["failed"] += 1
+            return
+        file = file._replace(digest=digest, mime_type=mime_type)
+        checkpoint.record(file, STATUS_HASHED)
+        pending.append(file)
+
+    loop = asyncio.get_running_loop()
+    if to_hash:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            await asyncio.gather(*(hash_one(pool, file) for file in to_hash))
+    # Keep the import order stable across runs
+    pending.sort(key=lambda file: file.path)
+    logger.info("Images hashed", hashed_count=len(to_hash), pending_count=len(pending))
+    return pending
+
+
+async def import_receipts(
+    pending: List[ImportFile],
+    checkpoint: ImportCheckpoint,
+    user_id: str,
+    text: Optional[str],
+    concurrency: int,
+    check_firestore: bool,
+    counts: Dict[str, int],
+) -> None:
+    """Run the agent on each pending receipt, at most `concurrency` at a time.
+
+    `text` is the message sent with each receipt; None uses the /receipts/batch prompt.
+    """
+    # Imported here so image hashing forks its worker processes before any
+    # cloud client threads exist
+    import backend
+    from expense_manager_agent.tools import get_receipt_data_by_image_id
+    from schema import IngestedImage
+    from utils import get_artifact_image_url
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+    last_progress = started
+    finished = 0
+
+    async def import_one(file: ImportFile) -> None:
+        async with semaphore:
+            if check_firestore and await asyncio.to_thread(get_receipt_data_by_image_id, file.digest):
+                checkpoint.record(file, STATUS_SKIPPED, "Receipt already stored in Firestore")
+                counts["skipped_stored"] += 1
+                return
+            session_id = f"import-{file.digest}"
+            with open(file.path, "rb") as image_file:
+                image_bytes = await asyncio.to_thread(image_file.read)
+            image = IngestedImage(
+                image_hash_id=file.digest,
+                image_bytes=image_bytes,
+                mime_type=file.mime_type,
+                image_url=get_artifact_image_url(backend.APP_NAME, user_id, session_id, file.digest),
+            )
+            try:
+                chat_response = await backend.run_isolated_receipt_turn(
+                    image, user_id, session_id, text, backend.app_contexts
+                )
+                error = chat_response.error
+            except Exception as e:
+                error = str(e)
+            if error:
+                checkpoint.record(file, STATUS_FAILED, error)
+                counts["failed"] += 1
+            else:
+                checkpoint.record(file, STATUS_IMPORTED)
+                counts["imported"] += 1
+
+    text = text or backend.BATCH_RECEIPT_PROMPT
+    # The import runs the agent in-process; it must not also pick up the backend's queued jobs
+    async with backend.lifespan(backend.app, job_workers=0):
+        tasks = [asyncio.create_task(import_one(file)) for file in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                await next_done
+                finished += 1
+                now = time.monotonic()
+                if now - last_progress >= PROGRESS_INTERVAL_SECONDS or finished == len(tasks):
+                    last_progress = now
+                    rate = finished / max(now - started, 1e-9) * 60
+                    logger.info(
+                        "Import progress",
+                        finished=finished,
+                        remaining=len(tasks) - finished,
+                        receipts_per_minute=round(rate, 2),
+                        eta_minutes=round((len(tasks) - finished) / rate, 1) if rate else None,
+                        **counts,
+                    )
+        finally:
+            # If the import was interrupted, stop the receipts still running before the
+            # backend shuts down; they stay checkpointed as hashed and the next run retries them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def main(args: argparse.Namespace) -> None:
+    started = time.monotonic()
+    counts = {"already_done": 0, "skipped_stored": 0, "skipped_duplicate": 0, "imported": 0, "failed": 0}
+    checkpoint = ImportCheckpoint(args.checkpoint)
+    try:
+        files = find_images(args.directory)
+        logger.info("Receipt images found", directory=args.directory, files_count=len(files))
+        pending = await hash_files(files, checkpoint, args.processes, counts)
+
+        # Skip receipts already in the SQL database, imported from another path, or repeated here
+        database = Database()
+        try:
+            seen = stored_receipt_ids(database) | checkpoint.imported_digests()
+        finally:
+            database.close()
+        to_import = []
+        for file in pending:
+            if file.digest in seen:
+                checkpoint.record(file, STATUS_SKIPPED, "Receipt image already stored or imported")
+                counts["skipped_duplicate"] += 1
+                continue
+            seen.add(file.digest)
+            to_import.append(file)
+        if args.limit is not None:
+            to_import = to_import[: args.limit]
+
+        if args.dry_run:
+            logger.info("Dry run, no receipts imported", would_import=len(to_import), **counts)
+            return
+        if to_import:
+            await import_receipts(
+                to_import,
+                checkpoint,
+                user_id=args.user_id,
+                text=args.text,
+                concurrency=args.concurrency,
+                check_firestore=not args.no_firestore_check,
+                counts=counts,
+            )
+    finally:
+        checkpoint.close()
+
+    elapsed_minutes = (time.monotonic() - started) / 60
+    logger.info(
+        "Import finished",
+        elapsed_minutes=round(elapsed_minutes, 2),
+        receipts_per_minute=round(counts["imported"] / elapsed_minutes, 2) if elapsed_minutes else None,
+        **counts,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import a directory of receipt images.")
+    parser.add_argument("directory", help="Directory searched recursively for receipt images")
+    parser.add_argument("--user-id", default="default_user", help="User the receipts and reviews belong to")
+    parser.add_argument(
+        "--text",
+        default=None,
+        help="Message sent to the agent with each receipt; defaults to the /receipts/batch prompt",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=SETTINGS.RECEIPT_BATCH_CONCURRENCY,
+        help="Number of receipts analyzed at once",
+    )
+    parser.add_argument(
+        "--processes", type=int, default=os.cpu_count() or 1, help="Processes used to hash images"
+    )
+    parser.add_argument(
+        "--checkpoint", default="bulk_import.db", help="SQLite file tracking progress between runs"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Import at most this many receipts this run")
+    parser.add_argument("--dry-run", action="store_true", help="Hash and count receipts without importing")
+    parser.add_argument(
+        "--no-firestore-check",
+        action="store_true",
+        help="Do not look up each receipt in Firestore before importing it",
+    )
+    asyncio.run(main(parser.parse_args()))
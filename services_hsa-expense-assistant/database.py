@@ -14,15 +14,124 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import asyncio
+import queue
 import sqlite3
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from contextlib import contextmanager
 import logger
 from pathlib import Path
 
+# Connection tuning: a negative cache_size is in KiB, mmap_size is in bytes
+CACHE_SIZE_KIB = 16 * 1024
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+BUSY_TIMEOUT_MS = 5000
+
+
+def _create_approved_items(conn: sqlite3.Connection):
+    """Create the approved_items table"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS approved_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 1,
+            store_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            image_url TEXT NOT NULL,
+            payment_card TEXT DEFAULT '',
+            card_last_four_digit TEXT DEFAULT '',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _add_item_identity_index(conn: sqlite3.Connection):
+    """Reject duplicate approvals with a unique index on the item's identity"""
+    # Databases created before the index may hold duplicates; keep the first of each
+    cursor = conn.execute("""
+        DELETE FROM approved_items
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM approved_items
+            GROUP BY name, description, price, quantity, store_name, date, image_url
+        )
+    """)
+    if cursor.rowcount:
+        logger.info(f"Removed {cursor.rowcount} duplicate approved items")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_approved_items_identity
+        ON approved_items (name, description, price, quantity, store_name, date, image_url)
+    """)
+
+
+def _add_query_indexes(conn: sqlite3.Connection):
+    """Index the date-range and recency orderings so reads walk an index instead of sorting"""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approved_items_date_created
+        ON approved_items (date, created_at)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approved_items_created
+        ON approved_items (created_at)
+    """)
+
+
+def _add_receipt_id(conn: sqlite3.Connection):
+    """Record each approved item's receipt ID so stored receipts can be looked up by ID"""
+    # Items approved earlier keep an empty receipt ID: their image URL format depends on
+    # ARTIFACT_URL_TEMPLATE and the artifact backend, so the ID cannot be recovered reliably
+    conn.execute("ALTER TABLE approved_items ADD COLUMN receipt_id TEXT NOT NULL DEFAULT ''")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approved_items_receipt
+        ON approved_items (receipt_id)
+    """)
+
+
+# Schema migrations in order; PRAGMA user_version records how many have been applied.
+# Append new migrations, never edit or reorder applied ones.
+MIGRATIONS = [
+    _create_approved_items,
+    _add_item_identity_index,
+    _add_query_indexes,
+    _add_receipt_id,
+]
+
+# Read queries, walking idx_approved_items_created and idx_approved_items_date_created
+ITEMS_COLUMNS = """
+    id,
+    name,
+    description,
+    price,
+    quantity,
+    store_name,
+    date,
+    image_url,
+    payment_card,
+    card_last_four_digit,
+    created_at
+"""
+ALL_ITEMS_QUERY = f"""
+    SELECT {ITEMS_COLUMNS}
+    FROM approved_items
+    ORDER BY created_at DESC
+"""
+ITEMS_BY_DATE_RANGE_QUERY = f"""
+    SELECT {ITEMS_COLUMNS}
+    FROM approved_items
+    WHERE date >= ? AND date <= ?
+    ORDER BY date DESC, created_at DESC
+"""
+
 
 class Database:
-    """SQL database for storing approved receipt items."""
+    """SQL database for storing approved receipt items.
+    
+    Each thread reuses one long-lived connection, opened in WAL mode so
+    readers do not block the writer.
+    """
     
     def __init__(self, db_path: str = "receipts.db"):
         """
@@ -32,40 +141,61 @@ class Database:
             db_path: Path to the SQLite database file
         """
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
         self._init_database()
     
     def _init_database(self):
-        """Initialize the database schema if it doesn't exist."""
+        """Bring the database schema up to date by applying pending migrations."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS approved_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT DEFAULT '',
-                    price REAL NOT NULL,
-                    quantity INTEGER NOT NULL DEFAULT 1,
-                    store_name TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    image_url TEXT NOT NULL,
-                    payment_card TEXT DEFAULT '',
-                    card_last_four_digit TEXT DEFAULT '',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.commit()
-            logger.info("Database initialized successfully")
+            while True:
+                # Re-read the version under the write lock, in case another process migrated first
+                conn.execute("BEGIN IMMEDIATE")
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.rollback()
+                    break
+                migration = MIGRATIONS[version]
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.commit()
+                logger.info(f"Applied database migration {version + 1}: {migration.__doc__}")
+            logger.info("Database initialized successfully", schema_version=version)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a tuned connection for the calling thread."""
+        # Only this thread uses the connection; close() may run on another one
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
     
     @contextmanager
     def _get_connection(self):
-        """Get a database connection with proper cleanup."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
+        """Get the calling thread's database connection, rolling back uncommitted work on exit."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
         try:
             yield conn
         finally:
+            if conn.in_transaction:
+                conn.rollback()
+    
+    def close(self):
+        """Close the connections of all threads."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
             conn.close()
+        self._local = threading.local()
     
     def insert_approved_items(
         self,
@@ -75,7 +205,8 @@ class Database:
         image_url: str,
         payment_card: str = "",
         card_last_four_digit: str = "",
-    ) -> None:
+        receipt_id: str = "",
+    ) -> Tuple[int, int]:
         """
         Insert approved items into the database, skipping duplicates.
         
@@ -89,67 +220,65 @@ class Database:
             image_url: URL of the receipt image
             payment_card: Payment card type or name
             card_last_four_digit: Last four digits of the payment card
+            receipt_id: Image hash ID of the receipt
+        
+        Returns:
+            Tuple of the inserted and skipped duplicate item counts
         """
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            inserted_count = 0
-            skipped_count = 0
-            
-            for item in items:
-                # Check if this item already exists (duplicate check)
-                cursor.execute("""
-                    SELECT COUNT(*) FROM approved_items
-                    WHERE name = ? 
-                    AND description = ?
-                    AND price = ?
-                    AND quantity = ?
-                    AND store_name = ?
-                    AND date = ?
-                    AND image_url = ?
-                """, (
-                    item.get("name", ""),
-                    item.get("description", ""),
-                    item.get("price", 0.0),
-                    item.get("quantity", 1),
-                    store_name,
-                    date,
-                    image_url,
-                ))
-                
-                count = cursor.fetchone()[0]
-                
-                if count == 0:
-                    # Item doesn't exist, insert it
-                    cursor.execute("""
-                        INSERT INTO approved_items 
-                        (name, description, price, quantity, store_name, date, image_url, payment_card, card_last_four_digit)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        item.get("name", ""),
-                        item.get("description", ""),
-                        item.get("price", 0.0),
-                        item.get("quantity", 1),
-                        store_name,
-                        date,
-                        image_url,
-                        payment_card,
-                        card_last_four_digit,
-                    ))
-                    inserted_count += 1
-                else:
-                    # Item already exists, skip it
-                    skipped_count += 1
-                    logger.debug(
-                        f"Skipped duplicate item: {item.get('name', '')} "
-                        f"(price: {item.get('price', 0.0)}, quantity: {item.get('quantity', 1)}) "
-                        f"from {store_name} on {date}"
-                    )
-            
+            inserted_count, skipped_count = self._insert_items(
+                conn, items, store_name, date, image_url, payment_card, card_last_four_digit, receipt_id
+            )
             conn.commit()
-            logger.info(
-                f"Inserted {inserted_count} approved items into database, "
-                f"skipped {skipped_count} duplicates"
+        logger.info(
+            f"Inserted {inserted_count} approved items into database, "
+            f"skipped {skipped_count} duplicates"
+        )
+        return inserted_count, skipped_count
+    
+    def _insert_items(
+        self,
+        conn: sqlite3.Connection,
+        items: List[Dict[str, Any]],
+        store_name: str,
+        date: str,
+        image_url: str,
+        payment_card: str = "",
+        card_last_four_digit: str = "",
+        receipt_id: str = "",
+    ) -> Tuple[int, int]:
+        """
+        Insert approved items in the connection's open transaction, without committing.
+        
+        Returns:
+            Tuple of the inserted and skipped duplicate item counts
+        """
+        rows = [
+            (
+                item.get("name", ""),
+                item.get("description", ""),
+                item.get("price", 0.0),
+                item.get("quantity", 1),
+                store_name,
+                date,
+                image_url,
+                payment_card,
+                card_last_four_digit,
+                receipt_id,
             )
+            for item in items
+        ]
+        # The unique index skips duplicates without a lookup per item
+        changes_before = conn.total_changes
+        conn.executemany("""
+            INSERT INTO approved_items 
+            (name, description, price, quantity, store_name, date, image_url, payment_card, card_last_four_digit,
+             receipt_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        """, rows)
+        inserted_count = conn.total_changes - changes_before
+        return inserted_count, len(rows) - inserted_count
     
     def get_all_items(self) -> List[Dict[str, Any]]:
         """
@@ -160,25 +289,22 @@ class Database:
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    id,
-                    name,
-                    description,
-                    price,
-                    quantity,
-                    store_name,
-                    date,
-                    image_url,
-                    payment_card,
-                    card_last_four_digit,
-                    created_at
-                FROM approved_items
-                ORDER BY created_at DESC
-            """)
+            cursor.execute(ALL_ITEMS_QUERY)
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
     
+    def get_receipt_ids(self) -> List[str]:
+        """
+        Get the distinct receipt IDs (image hash IDs) of all approved items.
+        
+        Returns:
+            List of receipt IDs
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT receipt_id FROM approved_items WHERE receipt_id != ''")
+            return [row[0] for row in cursor.fetchall()]
+    
     def get_items_by_date_range(
         self, start_date: str, end_date: str
     ) -> List[Dict[str, Any]]:
@@ -194,24 +320,150 @@ class Database:
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    id,
-                    name,
-                    description,
-                    price,
-                    quantity,
-                    store_name,
-                    date,
-                    image_url,
-                    payment_card,
-                    card_last_four_digit,
-                    created_at
-                FROM approved_items
-                WHERE date >= ? AND date <= ?
-                ORDER BY date DESC, created_at DESC
-            """, (start_date, end_date))
+            cursor.execute(ITEMS_BY_DATE_RANGE_QUERY, (start_date, end_date))
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
+
+
+class AsyncDatabase:
+    """Awaitable facade over Database that keeps SQLite work off the event loop.
+    
+    Reads run on a small thread pool. Writes are queued to a single writer
+    thread, which commits every approval already waiting in the queue in one
+    transaction (group commit); if that transaction fails, the approvals are
+    retried one at a time so one bad approval does not fail the others.
+    """
+    
+    def __init__(self, database: Database, reader_threads: int = 4, max_group_commit: int = 64):
+        """
+        Start the reader pool and the writer thread.
+        
+        Args:
+            database: The database to wrap
+            reader_threads: Number of threads serving reads
+            max_group_commit: Maximum number of approvals written in one transaction
+        """
+        self.database = database
+        self.max_group_commit = max_group_commit
+        self._readers = ThreadPoolExecutor(max_workers=reader_threads, thread_name_prefix="database-reader")
+        # Queued writes: (loop, future, insert arguments); None stops the writer
+        self._writes: "queue.Queue[Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Future, tuple]]]" = (
+            queue.Queue()
+        )
+        self._writer = threading.Thread(target=self._write_loop, name="database-writer", daemon=True)
+        self._writer.start()
+        self.commits = 0
+        self.writes = 0
+    
+    async def _read(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, method, *args)
+    
+    async def insert_approved_items(
+        self,
+        items: List[Dict[str, Any]],
+        store_name: str,
+        date: str,
+        image_url: str,
+        payment_card: str = "",
+        card_last_four_digit: str = "",
+        receipt_id: str = "",
+    ) -> None:
+        """Insert approved items, skipping duplicates; see Database.insert_approved_items."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._writes.put(
+            (loop, future, (items, store_name, date, image_url, payment_card, card_last_four_digit, receipt_id))
+        )
+        await future
+    
+    async def get_all_items(self) -> List[Dict[str, Any]]:
+        """Get all approved items; see Database.get_all_items."""
+        return await self._read(self.database.get_all_items)
+    
+    async def get_receipt_ids(self) -> List[str]:
+        """Get the distinct receipt IDs of approved items; see Database.get_receipt_ids."""
+        return await self._read(self.database.get_receipt_ids)
+    
+    async def get_items_by_date_range(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """Get approved items within a date range; see Database.get_items_by_date_range."""
+        return await self._read(self.database.get_items_by_date_range, start_date, end_date)
     
+    def _write_loop(self):
+        """Commit queued writes in groups until stopped."""
+        stopping = False
+        while not stopping:
+            write = self._writes.get()
+            if write is None:
+                break
+            group = [write]
+            while len(group) < self.max_group_commit:
+                try:
+                    write = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if write is None:
+                    stopping = True
+                    break
+                group.append(write)
+            try:
+                self._commit(group)
+            except Exception as e:
+                if len(group) == 1:
+                    _notify(group[0], _set_future_exception, e)
+                    continue
+                for write in group:
+                    try:
+                        self._commit([write])
+                    except Exception as e:
+                        _notify(write, _set_future_exception, e)
+    
+    def _commit(self, group: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future, tuple]]):
+        """Write a group of approvals in one transaction and resolve their futures."""
+        with self.database._get_connection() as conn:
+            counts = [self.database._insert_items(conn, *args) for _, _, args in group]
+            conn.commit()
+        self.commits += 1
+        self.writes += len(group)
+        for write in group:
+            _notify(write, _set_future_result, None)
+        logger.info(
+            f"Inserted {sum(count[0] for count in counts)} approved items into database, "
+            f"skipped {sum(count[1] for count in counts)} duplicates, "
+            f"in one commit of {len(group)} approvals"
+        )
+    
+    def stats(self) -> Dict[str, int]:
+        """Return write queue depth and group commit counters."""
+        return {
+            "queued_writes": self._writes.qsize(),
+            "writes_total": self.writes,
+            "commits_total": self.commits,
+        }
+    
+    def close(self):
+        """Finish queued writes, stop the threads and close the connections."""
+        self._writes.put(None)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
+        self.database.close()
+
+
+def _notify(write: Tuple[asyncio.AbstractEventLoop, asyncio.Future, tuple], setter, value: Any):
+    """Resolve a queued write's future on its event loop from the writer thread."""
+    loop, future, _ = write
+    try:
+        loop.call_soon_threadsafe(setter, future, value)
+    except RuntimeError:
+        # The caller's event loop is closed; nobody is left to await the result,
+        # and the writer thread must keep serving the other writes
+        pass
+
+
+def _set_future_result(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
 
+def _set_future_exception(future: asyncio.Future, exception: BaseException):
+    if not future.done():
+        future.set_exception(exception)
@@ -9,7 +9,11 @@ from expense_manager_agent.tools import (
     request_receipt_review,
 )
 from google.adk.tools import google_search, AgentTool
-from expense_manager_agent.callbacks import modify_image_data_in_history, add_inline_citations_callback
+from expense_manager_agent.callbacks import (
+    add_inline_citations_callback,
+    compact_history,
+    modify_image_data_in_history,
+)
 import os
 from settings import get_settings
 from google.adk.planners import BuiltInPlanner
@@ -62,5 +66,5 @@ root_agent = Agent(
     #         thinking_budget=2048,
     #     )
     # ),
-    before_model_callback=modify_image_data_in_history,
+    before_model_callback=[modify_image_data_in_history, compact_history],
 )
\ No newline at end of file
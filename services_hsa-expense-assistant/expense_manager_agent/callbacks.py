@@ -1,58 +1,301 @@
 # expense_manager_agent/callbacks.py
 
+import asyncio
 import hashlib
+import json
+import re
 from google.genai import types
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.models.llm_request import LlmRequest
-from typing import Optional
+from typing import List, Optional
+from settings import get_settings
+from schema import ARTIFACT_URI_PREFIX
+import logger
 
-def modify_image_data_in_history(
+SETTINGS = get_settings()
+
+
+def get_artifact_reference_hash_id(part: types.Part) -> Optional[str]:
+    """Return the image hash ID if `part` is an artifact reference, else None."""
+    if part.file_data and part.file_data.file_uri and part.file_data.file_uri.startswith(ARTIFACT_URI_PREFIX):
+        return part.file_data.file_uri[len(ARTIFACT_URI_PREFIX):]
+    return None
+
+
+async def modify_image_data_in_history(
     callback_context: CallbackContext, llm_request: LlmRequest
 ) -> None:
     # The following code will modify the request sent to LLM
-    # We will only keep image data in the last 3 user messages using a reverse and counter approach
+    # We will only keep image data in the last IMAGE_HISTORY_TURNS user messages using a reverse and counter approach.
+    # Images are stored in the session history as artifact references, so their bytes
+    # are loaded from the artifact store here, only for the turns that keep them.
 
-    # Count how many user messages we've processed
+    # Pick the user messages that keep their images, newest first
+    kept_contents = []
     user_message_count = 0
-
-    # Process the reversed list
     for content in reversed(llm_request.contents):
         # Only count for user manual query, not function call
         if (content.role == "user") and (content.parts[0].function_response is None):
             user_message_count += 1
-            modified_content_parts = []
+            kept_contents.append((content, user_message_count <= SETTINGS.IMAGE_HISTORY_TURNS))
+
+    # Load every distinct referenced image concurrently, once per model call
+    hash_ids = list(dict.fromkeys(
+        image_hash_id
+        for content, keep_image_data in kept_contents
+        if keep_image_data
+        for image_hash_id in map(get_artifact_reference_hash_id, content.parts)
+        if image_hash_id is not None
+    ))
+    loaded = await asyncio.gather(
+        *(callback_context.load_artifact(filename=image_hash_id) for image_hash_id in hash_ids)
+    )
+    artifacts = dict(zip(hash_ids, loaded))
 
-            # Check any missing image ID placeholder for any image data
-            # Then remove image data from conversation history if more than 3 user messages
-            for idx, part in enumerate(content.parts):
-                if part.inline_data is None:
+    for content, keep_image_data in kept_contents:
+        modified_content_parts = []
+
+        # Check any missing image ID placeholder for any image data
+        # Then remove image data from conversation history if older than the kept user messages
+        for idx, part in enumerate(content.parts):
+            image_hash_id = get_artifact_reference_hash_id(part)
+            if part.inline_data is None and image_hash_id is None:
+                modified_content_parts.append(part)
+                continue
+
+            if keep_image_data:
+                if image_hash_id is None:
                     modified_content_parts.append(part)
-                    continue
-
-                if (
-                    (idx + 1 >= len(content.parts))
-                    or (content.parts[idx + 1].text is None)
-                    or (not content.parts[idx + 1].text.startswith("[IMAGE-ID "))
-                ):
-                    # Generate hash ID for the image and add a placeholder
-                    image_data = part.inline_data.data
-                    hasher = hashlib.sha256(image_data)
-                    image_hash_id = hasher.hexdigest()[:12]
-                    placeholder = f"[IMAGE-ID {image_hash_id}]"
-
-                    # Only keep image data in the last 3 user messages
-                    if user_message_count <= 3:
-                        modified_content_parts.append(part)
-
-                    modified_content_parts.append(types.Part(text=placeholder))
-
-                else:
-                    # Only keep image data in the last 3 user messages
-                    if user_message_count <= 3:
-                        modified_content_parts.append(part)
-
-            # This will modify the contents inside the llm_request
-            content.parts = modified_content_parts
+                elif artifacts[image_hash_id] is not None:
+                    # Rehydrate the reference; a missing artifact leaves only the placeholder
+                    modified_content_parts.append(artifacts[image_hash_id])
+
+            if (
+                (idx + 1 >= len(content.parts))
+                or (content.parts[idx + 1].text is None)
+                or (not content.parts[idx + 1].text.startswith("[IMAGE-ID "))
+            ):
+                # Generate hash ID for the image and add a placeholder
+                if image_hash_id is None:
+                    image_hash_id = hashlib.sha256(part.inline_data.data).hexdigest()[:12]
+                modified_content_parts.append(types.Part(text=f"[IMAGE-ID {image_hash_id}]"))
+
+        # This will modify the contents inside the llm_request
+        content.parts = modified_content_parts
+
+
+# Rough token estimates: ~4 characters per text token, and the fixed cost Gemini
+# charges for an image (larger images are tiled, so this is a lower bound)
+CHARS_PER_TOKEN = 4
+IMAGE_TOKEN_ESTIMATE = 258
+
+IMAGE_ID_PLACEHOLDER_PATTERN = re.compile(r"\[IMAGE-ID [^\]]+\]")
+
+# Maximum length of each user/assistant excerpt in the summary of dropped turns
+SUMMARY_EXCERPT_CHARS = 200
+
+
+def estimate_part_tokens(part: types.Part) -> int:
+    """Estimate the prompt tokens of a single content part without calling the API."""
+    if part.inline_data is not None or part.file_data is not None:
+        return IMAGE_TOKEN_ESTIMATE
+    size = len(part.text or "")
+    if part.function_call is not None:
+        size += len(json.dumps(part.function_call.args or {}, default=str)) + len(part.function_call.name or "")
+    if part.function_response is not None:
+        size += len(json.dumps(part.function_response.response or {}, default=str))
+    return size // CHARS_PER_TOKEN + 1
+
+
+def estimate_contents_tokens(contents: List[types.Content]) -> int:
+    """Estimate the prompt tokens of a conversation history."""
+    return sum(estimate_part_tokens(part) for content in contents for part in (content.parts or []))
+
+
+def is_user_query(content: types.Content) -> bool:
+    """Whether `content` is a message typed by the user, as opposed to a tool result."""
+    return (
+        content.role == "user"
+        and bool(content.parts)
+        and all(part.function_response is None for part in content.parts)
+    )
+
+
+def split_into_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    """Group a history into turns, each starting at a user query and including
+    the model's tool calls, tool results and replies that followed it."""
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if is_user_query(content) or not turns:
+            turns.append([content])
+        else:
+            turns[-1].append(content)
+    return turns
+
+
+def find_image_placeholders(contents: List[types.Content]) -> List[str]:
+    """Collect the distinct [IMAGE-ID ...] placeholders mentioned in `contents`, in order."""
+    placeholders: dict = {}
+    for content in contents:
+        for part in content.parts or []:
+            texts = [part.text or ""]
+            if part.function_call is not None:
+                texts.append(json.dumps(part.function_call.args or {}, default=str))
+            if part.function_response is not None:
+                texts.append(json.dumps(part.function_response.response or {}, default=str))
+            for text in texts:
+                for placeholder in IMAGE_ID_PLACEHOLDER_PATTERN.findall(text):
+                    placeholders[placeholder] = None
+    return list(placeholders)
+
+
+def compact_tool_responses(turn: List[types.Content]) -> int:
+    """
+    Replace the tool outputs of an old turn with a short stub, keeping the
+    function call/response pairing the model expects and any image placeholders.
+
+    Returns:
+        int: Number of tool responses compacted
+    """
+    compacted = 0
+    for content in turn:
+        for idx, part in enumerate(content.parts or []):
+            if part.function_response is None:
+                continue
+            stub = {
+                "compacted": "Output omitted from history to save context; call the tool again if needed."
+            }
+            placeholders = find_image_placeholders([types.Content(role=content.role, parts=[part])])
+            if placeholders:
+                stub["image_ids"] = placeholders
+            content.parts[idx] = types.Part(
+                function_response=types.FunctionResponse(
+                    id=part.function_response.id,
+                    name=part.function_response.name,
+                    response=stub,
+                )
+            )
+            compacted += 1
+    return compacted
+
+
+def excerpt(text: str) -> str:
+    """Shorten text to a one-line excerpt of at most SUMMARY_EXCERPT_CHARS characters."""
+    text = " ".join(text.split())
+    if len(text) <= SUMMARY_EXCERPT_CHARS:
+        return text
+    return text[: SUMMARY_EXCERPT_CHARS - 3] + "..."
+
+
+def summarize_turns(turns: List[List[types.Content]]) -> str:
+    """Build an extractive summary of dropped turns, keeping their image placeholders."""
+    lines = [f"[Summary of {len(turns)} earlier turn(s) removed from history to save context]"]
+    for turn in turns:
+        user_text = ""
+        if is_user_query(turn[0]):
+            user_text = " ".join(
+                part.text
+                for part in turn[0].parts
+                if part.text and not IMAGE_ID_PLACEHOLDER_PATTERN.fullmatch(part.text)
+            )
+        model_text = ""
+        for content in reversed(turn):
+            if content.role == "model":
+                model_text = " ".join(part.text for part in content.parts or [] if part.text and not part.thought)
+                if model_text:
+                    break
+        placeholders = find_image_placeholders(turn)
+        line = f"- User: {excerpt(user_text) or '(no text)'}"
+        if placeholders:
+            line += " " + " ".join(placeholders)
+        if model_text:
+            line += f" | Assistant: {excerpt(model_text)}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def compact_history_to_budget(
+    contents: List[types.Content], token_budget: int, keep_recent_turns: int
+) -> tuple[List[types.Content], dict]:
+    """
+    Shrink a conversation history to an estimated token budget.
+
+    The last `keep_recent_turns` turns are never touched. Older turns first
+    have their tool outputs replaced by stubs; if the history is still over
+    budget, the oldest turns are dropped and replaced by a one-line-per-turn
+    summary that keeps their [IMAGE-ID ...] placeholders, so the model can
+    still refer to (and look up) those receipts.
+
+    Args:
+        contents: The history, oldest first
+        token_budget: Target size in estimated tokens
+        keep_recent_turns: Number of most recent turns kept verbatim
+
+    Returns:
+        tuple[List[types.Content], dict]: The compacted history and compaction statistics
+    """
+    stats = {"compacted_tool_responses": 0, "dropped_turns": 0}
+    if estimate_contents_tokens(contents) <= token_budget:
+        return contents, stats
+
+    turns = split_into_turns(contents)
+    old_count = max(len(turns) - max(keep_recent_turns, 1), 0)
+    old_turns, recent_turns = turns[:old_count], turns[old_count:]
+
+    # Oldest first: stop as soon as the history fits
+    total = estimate_contents_tokens(contents)
+    for turn in old_turns:
+        if total <= token_budget:
+            break
+        before = estimate_contents_tokens(turn)
+        stats["compacted_tool_responses"] += compact_tool_responses(turn)
+        total -= before - estimate_contents_tokens(turn)
+
+    dropped: List[List[types.Content]] = []
+    while old_turns and total > token_budget:
+        turn = old_turns.pop(0)
+        dropped.append(turn)
+        total -= estimate_contents_tokens(turn)
+    stats["dropped_turns"] = len(dropped)
+
+    compacted = [content for turn in old_turns + recent_turns for content in turn]
+    if dropped:
+        summary = types.Part(text=summarize_turns(dropped))
+        first = compacted[0]
+        if is_user_query(first):
+            # Merge into the first kept user message so roles keep alternating
+            compacted[0] = types.Content(role=first.role, parts=[summary] + list(first.parts))
+        else:
+            compacted.insert(0, types.Content(role="user", parts=[summary]))
+    return compacted, stats
+
+
+async def compact_history(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> None:
+    # Keep the prompt within HISTORY_TOKEN_BUDGET (estimated) by compacting old turns.
+    # Runs after modify_image_data_in_history so image parts are already in their final form.
+    # llm_request.contents is a copy of the session history, so the session itself is untouched.
+    if SETTINGS.HISTORY_TOKEN_BUDGET <= 0 or not llm_request.contents:
+        return
+
+    tokens_before = estimate_contents_tokens(llm_request.contents)
+    llm_request.contents, stats = compact_history_to_budget(
+        llm_request.contents,
+        token_budget=SETTINGS.HISTORY_TOKEN_BUDGET,
+        keep_recent_turns=SETTINGS.HISTORY_KEEP_RECENT_TURNS,
+    )
+    tokens_after = estimate_contents_tokens(llm_request.contents)
+    logger.info(
+        "Prompt history size",
+        session_id=callback_context.session.id,
+        invocation_id=callback_context.invocation_id,
+        estimated_tokens_before=tokens_before,
+        estimated_tokens_after=tokens_after,
+        estimated_tokens_saved=tokens_before - tokens_after,
+        token_budget=SETTINGS.HISTORY_TOKEN_BUDGET,
+        **stats,
+    )
 
 
 # --- Core Citation Injection Function ---
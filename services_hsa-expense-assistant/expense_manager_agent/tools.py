@@ -9,7 +9,9 @@ from google.cloud.firestore_v1 import FieldFilter
 from google.cloud.firestore_v1.base_query import And
 from google.cloud.firestore_v1.base_vector_query import DistanceMeasure
 from settings import get_settings
+from schema import ReceiptReviewRequest
 from google import genai
+from google.adk.tools import ToolContext
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,6 +24,9 @@ COLLECTION = DB_CLIENT.collection(SETTINGS.DB_COLLECTION_NAME)
 GENAI_CLIENT = genai.Client(
     vertexai=True, location=SETTINGS.GCLOUD_LOCATION, project=SETTINGS.GCLOUD_PROJECT_ID
 )
+# Prefix of the session state keys the review tool writes validated review
+# requests to, one key per receipt so several reviews in a turn are all kept
+REVIEW_REQUEST_STATE_KEY_PREFIX = "review_request:"
 EMBEDDING_DIMENSION = 768
 EMBEDDING_FIELD_NAME = "embedding"
 INVALID_ITEMS_FORMAT_ERR = """
@@ -57,6 +62,7 @@ def request_receipt_review(
     unsure_hsa_items: List[Dict[str, Any]],
     payment_card: str,
     card_last_four_digit: str,
+    tool_context: ToolContext,
 ) -> str:
     """
     Request human review for receipt item categorization by HSA eligibility.
@@ -64,8 +70,8 @@ def request_receipt_review(
     **MANDATORY**: This tool MUST be called for EVERY receipt that needs to be stored.
     Human review is required for ALL receipt storage operations - there are NO exceptions.
     
-    After calling this tool, the agent MUST return the review data in JSON format
-    in the FINAL RESPONSE section for the backend to process.
+    The review data is handed to the backend through session state and shown
+    to the user automatically; the agent does not need to repeat it.
     
     The `store_receipt_data` tool should NEVER be called directly by the agent.
     It is only called by the system after human approval through the review endpoint.
@@ -92,10 +98,11 @@ def request_receipt_review(
             - quantity (int, optional): The quantity of the item. Defaults to 1 if not provided.
         payment_card (str, optional): The payment card type or name (e.g., "Visa", "Mastercard", "American Express"). If paid in cash or gift card this can be missing. Defaults to empty string.
         card_last_four_digit (str, optional): The last four digits of the payment card. If paid in cash or gift card this can be missing. Defaults to empty string.
+        tool_context (ToolContext): Injected by ADK; used to publish the review request.
 
     Returns:
-        str: A message indicating that review has been requested. The agent should then
-             return the review data in JSON format in the FINAL RESPONSE section.
+        str: A message indicating that review has been requested, or the errors to fix
+            before calling the tool again.
     """
     try:
         logger.info(f"Requesting review for image_id: {image_id}")
@@ -132,29 +139,6 @@ def request_receipt_review(
             if not date.strip():
                 raise ValueError("Date cannot be empty")
 
-        # Validate items format
-        for item_list, item_type in [
-            (hsa_eligible_items, "hsa_eligible"), 
-            (non_hsa_eligible_items, "non_hsa_eligible"),
-            (unsure_hsa_items, "unsure_hsa")
-        ]:
-            if not isinstance(item_list, list):
-                raise ValueError(f"Invalid {item_type} items format. Must be a list.")
-            
-            for item in item_list:
-                if (
-                    not isinstance(item, dict)
-                    or "name" not in item
-                    or "price" not in item
-                ):
-                    raise ValueError(
-                        f"Invalid {item_type} item format. Each item must have 'name' and 'price' keys."
-                    )
-                if "quantity" not in item:
-                    item["quantity"] = 1
-                if "description" not in item:
-                    item["description"] = ""  # Default to empty string if not provided
-
         # Validate payment card fields
         # if not isinstance(payment_card, str):
         #     raise ValueError("payment_card must be a string")
@@ -165,37 +149,33 @@ def request_receipt_review(
         # if card_last_four_digit and len(card_last_four_digit) != 4:
         #     raise ValueError("card_last_four_digit must be exactly 4 digits")
         
-        # Return a message with the JSON data embedded for easy extraction
-        # The agent should include this JSON in the FINAL RESPONSE section
-        import json as json_module
-        
-        review_data = {
-            "review_request": {
-                "receipt_id": image_id,
-                "store_name": store_name,
-                "date": date,
-                "total_cost": total_cost,
-                "hsa_eligible_items": hsa_eligible_items,
-                "non_hsa_eligible_items": non_hsa_eligible_items,
-                "unsure_hsa_items": unsure_hsa_items,
-                "payment_card": payment_card,
-                "card_last_four_digit": card_last_four_digit,
-            }
-        }
-        
-        json_str = json_module.dumps(review_data, indent=2)
-        
-        logger.info(f"Successfully created review request for receipt {image_id}")
-        return f"""Review requested for receipt {image_id}. 
-
-IMPORTANT: You MUST include the following JSON in your FINAL RESPONSE section:
+        # Validates the items too (name and price required, quantity defaults to 1)
+        review_request = ReceiptReviewRequest(
+            receipt_id=image_id,
+            store_name=store_name,
+            date=date,
+            total_cost=total_cost,
+            hsa_eligible_items=hsa_eligible_items,
+            non_hsa_eligible_items=non_hsa_eligible_items,
+            unsure_hsa_items=unsure_hsa_items,
+            payment_card=payment_card,
+            card_last_four_digit=card_last_four_digit,
+        )
 
-```json
-{json_str}
-```
+        # Publish the review through session state; the backend picks it up from
+        # the tool's state delta instead of parsing it out of the model's reply
+        tool_context.state[f"{REVIEW_REQUEST_STATE_KEY_PREFIX}{image_id}"] = review_request.model_dump()
 
-This JSON must be included exactly as shown above in a JSON code block."""
+        logger.info(f"Successfully created review request for receipt {image_id}")
+        return (
+            f"Review requested for receipt {image_id}. The review form has been sent to "
+            "the user automatically; do not repeat the review data in your response."
+        )
 
+    except ValueError as e:
+        # Includes pydantic's ValidationError; returned so the model can fix the call
+        logger.warning(f"Invalid review request for receipt {image_id}: {e}")
+        return f"Review request for receipt {image_id} was not sent, fix these errors and call the tool again: {e}"
     except Exception as e:
         raise Exception(f"Failed to request receipt review: {str(e)}")
 
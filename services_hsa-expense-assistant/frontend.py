@@ -6,7 +6,15 @@ from typing import List, Dict, Any
 from settings import get_settings
 from PIL import Image
 import io
-from schema import ImageData, ChatRequest, ChatResponse, ReceiptReviewRequest, ReceiptReviewResponse, ReviewItem
+from schema import (
+    ImageData,
+    ChatRequest,
+    ChatResponse,
+    PendingReviewsResponse,
+    ReceiptReviewRequest,
+    ReceiptReviewResponse,
+    ReviewItem,
+)
 
 
 SETTINGS = get_settings()
@@ -57,6 +65,22 @@ def decode_base64_to_image(base64_data: str) -> Image.Image:
     return image
 
 
+def fetch_image_from_backend(image_path: str) -> Image.Image:
+    """Fetch an image served by the backend /images endpoint as PIL Image.
+
+    Args:
+        image_path: Backend-relative image path from a response attachment.
+
+    Returns:
+        PIL Image object of the downloaded image.
+    """
+    image_url = SETTINGS.BACKEND_URL.replace("/chat", image_path)
+    response = requests.get(image_url)
+    response.raise_for_status()
+
+    return Image.open(io.BytesIO(response.content))
+
+
 def approve_review(
     approved_items_json: str | list | dict,
     receipt_id: str,
@@ -119,6 +143,7 @@ def approve_review(
             total_cost=total_cost,
             payment_card=payment_card,
             card_last_four_digit=card_last_four_digit,
+            user_id="default_user",
         )
         
         # Send to backend
@@ -146,8 +171,22 @@ def approve_review(
         return f"Error approving review: {str(e)}", []
 
 
-# Global variable to store latest review request (in production, use proper state management)
-_latest_review_request = None
+def fetch_latest_pending_review(user_id: str = "default_user") -> ReceiptReviewRequest | None:
+    """Fetch the most recently queued pending review of a user from the backend.
+
+    Args:
+        user_id: The ID of the user whose pending reviews to fetch.
+
+    Returns:
+        The newest pending review request, or None if nothing awaits review.
+    """
+    pending_url = SETTINGS.BACKEND_URL.replace("/chat", "/reviews/pending")
+    response = requests.get(pending_url, params={"user_id": user_id})
+    response.raise_for_status()
+
+    reviews = PendingReviewsResponse(**response.json()).reviews
+    return reviews[-1].review_request if reviews else None
+
 
 def get_response_from_llm_backend(
     message: Dict[str, Any],
@@ -199,55 +238,10 @@ def get_response_from_llm_backend(
         # Check if review is needed
         review_request = result.review_request
         
-        # Fallback: Try to extract review request from response text if backend didn't extract it
-        if not review_request and result.response:
-            import json as json_module
-            import re as re_module
-            # Look for JSON code block in response
-            json_match = re_module.search(r"```json\s*(.*?)\s*```", result.response, re_module.DOTALL)
-            if json_match:
-                try:
-                    json_str = json_match.group(1).strip()
-                    json_data = json_module.loads(json_str)
-                    if isinstance(json_data, dict) and "review_request" in json_data:
-                        review_data = json_data["review_request"]
-                        # Filter out category field when creating ReviewItem (category is not part of ReviewItem schema)
-                        hsa_eligible_items = [
-                            ReviewItem(**{k: v for k, v in item.items() if k != "category"}) 
-                            for item in review_data.get("hsa_eligible_items", [])
-                        ]
-                        non_hsa_eligible_items = [
-                            ReviewItem(**{k: v for k, v in item.items() if k != "category"}) 
-                            for item in review_data.get("non_hsa_eligible_items", [])
-                        ]
-                        unsure_hsa_items = [
-                            ReviewItem(**{k: v for k, v in item.items() if k != "category"}) 
-                            for item in review_data.get("unsure_hsa_items", [])
-                        ]
-                        review_request = ReceiptReviewRequest(
-                            receipt_id=review_data.get("receipt_id", ""),
-                            store_name=review_data.get("store_name", ""),
-                            date=review_data.get("date", ""),
-                            total_cost=review_data.get("total_cost", 0.0),
-                            payment_card=review_data.get("payment_card", ""),
-                            card_last_four_digit=review_data.get("card_last_four_digit", ""),
-                            hsa_eligible_items=hsa_eligible_items,
-                            non_hsa_eligible_items=non_hsa_eligible_items,
-                            unsure_hsa_items=unsure_hsa_items,
-                        )
-                        print(f"DEBUG: Extracted review request from response text (fallback)")
-                except Exception as e:
-                    print(f"DEBUG: Failed to extract review request from response text: {e}")
-        
         if review_request:
+            # The backend queues the review; the review panel loads it from there
             print(f"DEBUG: Review request received: receipt_id={review_request.receipt_id}, hsa_eligible={len(review_request.hsa_eligible_items)}, non_hsa_eligible={len(review_request.non_hsa_eligible_items)}, unsure_hsa={len(review_request.unsure_hsa_items)}")
             
-            # Store review request globally for the review panel
-            global _latest_review_request
-            _latest_review_request = review_request
-            print(f"DEBUG: Stored review request in global variable")
-        
-        if review_request:
             # Format review message
             review_text = f"""## 📋 Review Required: Receipt Item HSA Eligibility Categorization
 
@@ -285,8 +279,19 @@ def get_response_from_llm_backend(
 
         if result.attachments:
             for attachment in result.attachments:
-                image_data = attachment.serialized_image
-                chat_responses.append(gr.Image(decode_base64_to_image(image_data)))
+                if attachment.error:
+                    chat_responses.append(
+                        gr.ChatMessage(
+                            role="assistant",
+                            content=f"⚠️ Image {attachment.image_hash_id} is unavailable ({attachment.error})",
+                        )
+                    )
+                    continue
+                if attachment.url:
+                    chat_responses.append(gr.Image(fetch_image_from_backend(attachment.url)))
+                else:
+                    image_data = attachment.serialized_image
+                    chat_responses.append(gr.Image(decode_base64_to_image(image_data)))
 
         return chat_responses
     except requests.exceptions.RequestException as e:
@@ -364,11 +369,24 @@ You can edit the JSON below to modify items:
         
         # Function to load latest review request
         def load_latest_review():
-            """Load the latest review request from global state"""
-            global _latest_review_request
-            review_request = _latest_review_request
+            """Load the latest pending review request from the backend"""
+            try:
+                review_request = fetch_latest_pending_review()
+            except requests.exceptions.RequestException as e:
+                return (
+                    gr.update(),  # receipt_info
+                    gr.update(),  # all_items_json
+                    gr.update(),  # receipt_id_state
+                    gr.update(),  # store_name_state
+                    gr.update(),  # date_state
+                    gr.update(),  # total_cost_state
+                    gr.update(),  # payment_card_state
+                    gr.update(),  # card_last_four_digit_state
+                    gr.update(),  # review_request_state
+                    f"❌ Error loading pending reviews: {str(e)}",  # approval_status
+                )
             
-            print(f"DEBUG: load_latest_review called, _latest_review_request = {review_request}")
+            print(f"DEBUG: load_latest_review called, pending review = {review_request}")
             
             if review_request is None:
                 return (
@@ -540,6 +558,10 @@ You can edit the JSON below to modify items:
                         # Just create the clickable link
                         if image_url.startswith("http"):
                             image_link_html = f'<a href="{image_url}" target="_blank" class="image-link">🔗 View</a>'
+                        elif image_url.startswith("/"):
+                            # Backend-relative path (local artifact storage)
+                            backend_url = SETTINGS.BACKEND_URL.replace("/chat", image_url)
+                            image_link_html = f'<a href="{backend_url}" target="_blank" class="image-link">🔗 View</a>'
                         elif image_url.startswith("gs://"):
                             # Fallback: convert gs:// to HTTPS format if needed
                             https_url = image_url.replace("gs://", "https://storage.cloud.google.com/")
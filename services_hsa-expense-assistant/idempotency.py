@@ -0,0 +1,153 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import logger
+
+
+class IdempotencyKeyMismatch(Exception):
+    """Raised when an idempotency key is reused for a different request."""
+
+
+class _Entry:
+    """The shared outcome of the first request made with an idempotency key."""
+
+    __slots__ = ("fingerprint", "task", "expires_at")
+
+    def __init__(self, fingerprint: str, task: asyncio.Task):
+        self.fingerprint = fingerprint
+        self.task = task
+        # Set once the result is stored; in-flight entries never expire
+        self.expires_at: Optional[float] = None
+
+
+class IdempotencyStore:
+    """Bounded TTL store of responses by idempotency key.
+
+    The first request with a key starts its handler as a separate task, so
+    the run completes (and is stored) even if that client disconnects;
+    duplicates arriving while it is in flight await the same task instead of
+    starting another run, and later duplicates get the stored result until
+    it expires. Failed runs are not stored, so a retry after an error runs again. Completed entries are
+    kept in completion order and evicted oldest first, on expiry or once
+    more than `max_entries` are stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        """
+        Create an empty store.
+
+        Args:
+            max_entries: Maximum number of completed responses kept
+            ttl_seconds: How long a completed response is replayed
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._completed = 0
+        self.replays = 0
+        self.attached = 0
+
+    def _evict(self) -> None:
+        """Drop expired and surplus completed entries, stopping at the first one still kept."""
+        now = time.monotonic()
+        surplus = self._completed - self.max_entries
+        evicted = []
+        for key, entry in self._entries.items():
+            if entry.expires_at is None:
+                continue
+            if entry.expires_at > now and surplus <= 0:
+                break
+            evicted.append(key)
+            surplus -= 1
+        for key in evicted:
+            del self._entries[key]
+        self._completed -= len(evicted)
+
+    async def run(
+        self,
+        scope: str,
+        idempotency_key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda result: True,
+    ) -> Tuple[Any, bool]:
+        """
+        Run `handler` once per idempotency key.
+
+        Args:
+            scope: Namespace of the key, e.g. the endpoint and user
+            idempotency_key: The client-supplied Idempotency-Key
+            fingerprint: Digest of the request payload, to detect key reuse
+            handler: Produces the response
+            cacheable: Whether a result may be replayed; results it rejects
+                are returned to everyone waiting but not stored
+
+        Returns:
+            Tuple[Any, bool]: The response, and whether it was a replay
+
+        Raises:
+            IdempotencyKeyMismatch: If the key was used for a different payload
+        """
+        self._evict()
+        key = (scope, idempotency_key)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyMismatch(
+                    "Idempotency-Key was already used for a different request"
+                )
+            if entry.task.done():
+                self.replays += 1
+            else:
+                self.attached += 1
+            logger.info(
+                "Replaying idempotent request",
+                scope=scope,
+                idempotency_key=idempotency_key,
+                in_flight=not entry.task.done(),
+            )
+            # Shielded so a client that gives up does not cancel the shared run
+            return await asyncio.shield(entry.task), True
+
+        entry = _Entry(fingerprint, asyncio.ensure_future(handler()))
+        self._entries[key] = entry
+        entry.task.add_done_callback(lambda task: self._finish(key, entry, cacheable))
+        return await asyncio.shield(entry.task), False
+
+    def _finish(self, key: Tuple[str, str], entry: _Entry, cacheable: Callable[[Any], bool]) -> None:
+        """Store a finished run's result, or forget the key if it failed or is not cacheable."""
+        task = entry.task
+        if not task.cancelled() and task.exception() is None and cacheable(task.result()):
+            entry.expires_at = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(key)
+            self._completed += 1
+        elif self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Return stored entry counts and replay counters."""
+        return {
+            "entries": self._completed,
+            "in_flight": len(self._entries) - self._completed,
+            "max_entries": self.max_entries,
+            "replays": self.replays,
+            "attached_in_flight": self.attached,
+        }
@@ -0,0 +1,158 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+import logger
+
+
+class ReceiptImage(NamedTuple):
+    """Where the image of a receipt was uploaded and the URL it is served from."""
+
+    receipt_id: str
+    user_id: str
+    session_id: str
+    url: str
+
+
+class ImageRegistry:
+    """(user ID, receipt ID) -> image URL registry with an in-memory LRU in front of SQLite.
+
+    Every uploaded image is recorded with the user and session it belongs
+    to, so /review can resolve the right URL after a restart or on another
+    worker. Receipt IDs are content hashes, so users who upload the same
+    image each keep their own record. Only the `cache_size` most recently
+    used records are held in memory; the rest are read from SQLite by
+    primary key on demand.
+    """
+
+    def __init__(self, db_path: str, cache_size: int = 1024):
+        """
+        Open (and if needed create) the registry database.
+
+        Args:
+            db_path: Path to the SQLite database file
+            cache_size: Maximum number of records kept in memory
+        """
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], ReceiptImage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._create_table()
+        logger.info("Image registry initialized", db_path=db_path)
+
+    def _create_table(self) -> None:
+        """Create the registry table, re-keying one that held a single record per receipt."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            primary_key = [
+                row[1]
+                for row in sorted(self._conn.execute("PRAGMA table_info(receipt_images)"), key=lambda row: row[5])
+                if row[5]
+            ]
+            if primary_key == ["receipt_id"]:
+                self._conn.execute("ALTER TABLE receipt_images RENAME TO receipt_images_by_receipt")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS receipt_images (
+                    user_id TEXT NOT NULL,
+                    receipt_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, receipt_id)
+                )
+            """)
+            if primary_key == ["receipt_id"]:
+                self._conn.execute("""
+                    INSERT INTO receipt_images (user_id, receipt_id, session_id, url, updated_at)
+                    SELECT user_id, receipt_id, session_id, url, updated_at FROM receipt_images_by_receipt
+                """)
+                self._conn.execute("DROP TABLE receipt_images_by_receipt")
+                logger.info("Image registry re-keyed by user", db_path=self.db_path)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _cache_put(self, record: ReceiptImage) -> None:
+        key = (record.user_id, record.receipt_id)
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def record(self, receipt_id: str, user_id: str, session_id: str, url: str) -> None:
+        """
+        Record (or update) the image URL of a receipt uploaded by a user.
+
+        Args:
+            receipt_id: The receipt's image hash ID
+            user_id: The ID of the user who uploaded the image
+            session_id: The ID of the session the image was uploaded in
+            url: The URL the image is served from
+        """
+        record = ReceiptImage(receipt_id, user_id, session_id, url)
+        key = (user_id, receipt_id)
+        with self._lock:
+            if self._cache.get(key) == record:
+                self._cache.move_to_end(key)
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO receipt_images"
+                " (receipt_id, user_id, session_id, url, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (receipt_id, user_id, session_id, url, time.time()),
+            )
+            self._cache_put(record)
+
+    def lookup(self, receipt_id: str, user_id: str) -> Optional[ReceiptImage]:
+        """
+        Look up the image a user uploaded for a receipt.
+
+        Args:
+            receipt_id: The receipt's image hash ID
+            user_id: The ID of the user whose upload to look up
+
+        Returns:
+            ReceiptImage | None: The recorded image, or None if the user never uploaded the receipt
+        """
+        key = (user_id, receipt_id)
+        with self._lock:
+            record = self._cache.get(key)
+            if record is not None:
+                self._cache.move_to_end(key)
+                return record
+            row = self._conn.execute(
+                "SELECT receipt_id, user_id, session_id, url FROM receipt_images"
+                " WHERE user_id = ? AND receipt_id = ?",
+                (user_id, receipt_id),
+            ).fetchone()
+            if row is None:
+                return None
+            record = ReceiptImage(*row)
+            self._cache_put(record)
+            return record
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
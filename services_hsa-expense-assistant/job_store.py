@@ -0,0 +1,302 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import logger
+from schema import ChatRequest, ChatResponse, Job
+
+# Job statuses; succeeded and failed are final
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINAL_JOB_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobStore:
+    """SQLite-backed queue of background chat jobs.
+
+    Jobs are claimed straight from the table, so queued jobs survive a
+    restart and any backend process sharing the database can run them.
+    A running job's worker refreshes its heartbeat; a job whose heartbeat
+    is older than `lease_seconds` was interrupted (e.g. by a restart) and
+    is marked failed rather than re-run, since its turn may already be
+    partly recorded in the session. The request is dropped once a job
+    finishes, leaving only the result.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 60.0, poll_interval: float = 1.0):
+        """
+        Open (and if needed create) the job database.
+
+        Args:
+            db_path: Path to the SQLite database file
+            lease_seconds: Heartbeat age after which a running job counts as interrupted
+            poll_interval: How often waiters re-check the database for changes
+                made by other processes, in seconds
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # Waiters of this process (workers under "", status watchers under the job ID)
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                request TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                heartbeat_at REAL
+            )
+        """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_created
+            ON jobs (status, created_at)
+        """)
+        logger.info("Job store initialized", db_path=db_path)
+
+    # ----- Notification -----
+
+    def _notify(self, *channels: str) -> None:
+        """Wake this process's waiters on the given channels. Caller holds the lock."""
+        for channel in channels:
+            for loop, waiter in self._waiters.pop(channel, []):
+                loop.call_soon_threadsafe(_resolve_waiter, waiter)
+
+    async def _wait(self, channel: str, timeout: float) -> None:
+        """Wait for a notification on `channel`, at most `timeout` seconds."""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(channel, []).append((loop, waiter))
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(channel)
+                if waiters and (loop, waiter) in waiters:
+                    waiters.remove((loop, waiter))
+                    if not waiters:
+                        del self._waiters[channel]
+
+    # ----- Jobs -----
+
+    def create(self, request: ChatRequest) -> Job:
+        """
+        Queue a chat request as a new job.
+
+        Args:
+            request: The chat request to run
+
+        Returns:
+            Job: The queued job
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, user_id, session_id, status, request, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, request.user_id, request.session_id, JOB_QUEUED, request.model_dump_json(), now, now),
+            )
+            self._notify("")
+        return Job(
+            job_id=job_id,
+            user_id=request.user_id,
+            session_id=request.session_id,
+            status=JOB_QUEUED,
+            created_at=now,
+            updated_at=now,
+        )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Get a job's status and, once finished, its result.
+
+        Args:
+            job_id: The ID of the job
+
+        Returns:
+            Job | None: The job, or None if it does not exist
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, user_id, session_id, status, result, error, created_at, updated_at"
+                " FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, user_id, session_id, status, result, error, created_at, updated_at = row
+        return Job(
+            job_id=job_id,
+            user_id=user_id,
+            session_id=session_id,
+            status=status,
+            created_at=created_at,
+            updated_at=updated_at,
+            result=ChatResponse.model_validate_json(result) if result else None,
+            error=error,
+        )
+
+    def count_queued(self) -> int:
+        """Return the number of jobs waiting for a worker."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (JOB_QUEUED,)
+            ).fetchone()[0]
+
+    def claim(self) -> Optional[Tuple[str, ChatRequest]]:
+        """
+        Claim the oldest queued job for this worker.
+
+        Returns:
+            Tuple[str, ChatRequest] | None: The job ID and its request, or None if none is queued
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id, request FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (JOB_QUEUED,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                        (JOB_RUNNING, now, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if row is not None:
+                self._notify(row[0])
+        if row is None:
+            return None
+        return row[0], ChatRequest.model_validate_json(row[1])
+
+    def heartbeat(self, job_id: str) -> None:
+        """Record that a running job's worker is still alive."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = ?",
+                (time.time(), job_id, JOB_RUNNING),
+            )
+
+    def finish(self, job_id: str, result: Optional[ChatResponse], error: Optional[str] = None) -> None:
+        """
+        Record a job's outcome and drop its request.
+
+        Args:
+            job_id: The ID of the job
+            result: The chat response, if the run produced one
+            error: Why the job failed; a response carrying an error also fails the job
+        """
+        error = error or (result.error if result else None)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, request = NULL, updated_at = ?"
+                " WHERE job_id = ?",
+                (
+                    JOB_FAILED if error else JOB_SUCCEEDED,
+                    result.model_dump_json() if result else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+            self._notify(job_id)
+
+    def fail_interrupted(self) -> int:
+        """
+        Mark running jobs whose heartbeat expired as failed.
+
+        Returns:
+            int: Number of jobs marked failed
+        """
+        now = time.time()
+        with self._lock:
+            job_ids = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = ? AND heartbeat_at < ?",
+                    (JOB_RUNNING, now - self.lease_seconds),
+                )
+            ]
+            for job_id in job_ids:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, request = NULL, updated_at = ?"
+                    " WHERE job_id = ? AND status = ?",
+                    (JOB_FAILED, "Job was interrupted before it finished; please resubmit", now, job_id, JOB_RUNNING),
+                )
+            if job_ids:
+                self._notify(*job_ids)
+        if job_ids:
+            logger.warning("Interrupted jobs marked failed", job_ids=job_ids)
+        return len(job_ids)
+
+    async def wait_for_work(self) -> None:
+        """Wait until a job may be queued: a local submission, or the poll interval for other processes."""
+        await self._wait("", self.poll_interval)
+
+    async def wait_for_update(self, job_id: str, status: str, timeout: float) -> Optional[Job]:
+        """
+        Wait until a job leaves `status`, or the timeout expires.
+
+        Args:
+            job_id: The ID of the job
+            status: The status the caller already knows
+            timeout: Maximum time to wait, in seconds
+
+        Returns:
+            Job | None: The job's current state, or None if it does not exist
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            job = await asyncio.to_thread(self.get, job_id)
+            remaining = deadline - loop.time()
+            if job is None or job.status != status or remaining <= 0:
+                return job
+            await self._wait(job_id, min(remaining, self.poll_interval))
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _resolve_waiter(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
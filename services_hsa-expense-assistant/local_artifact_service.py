@@ -0,0 +1,405 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import quote, unquote
+
+from google.adk.artifacts.base_artifact_service import (
+    ArtifactVersion,
+    BaseArtifactService,
+)
+from google.genai import types
+from artifact_cache import atomic_write
+import logger
+
+# Scope directory for "user:" namespaced artifacts; "@" is always escaped in
+# encoded session IDs, so this can't collide with a session
+USER_SCOPE = "@user"
+
+
+class LocalArtifactService(BaseArtifactService):
+    """Artifact service storing versions on the local filesystem.
+
+    Drop-in replacement for `GcsArtifactService` on single-node and offline
+    deployments. Artifact bytes live in a content-addressed blob store and
+    each version is a small JSON ref pointing at a blob:
+
+        {root}/blobs/{sha256[:2]}/{sha256}
+        {root}/refs/{app_name}/{user_id}/{session_id | "@user"}/{filename}/{version}.json
+
+    Path components are percent-encoded, so user-controlled names can never
+    escape `root`. Blobs and refs are written to a temporary file first and
+    then renamed (blobs) or hard-linked (refs) into place, so readers never
+    observe partial files and two writers can't claim the same version.
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Initialize the service, creating the directory tree if needed.
+
+        Args:
+            root_dir: Directory holding the blob store and version refs
+        """
+        self.root = Path(root_dir).resolve()
+        self.blobs_dir = self.root / "blobs"
+        self.refs_dir = self.root / "refs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.refs_dir.mkdir(parents=True, exist_ok=True)
+        logger.info("Local artifact service ready", root_dir=str(self.root))
+
+    # ----- Disk layout -----
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / digest
+
+    def _scope_dir(self, app_name: str, user_id: str, scope: str) -> Path:
+        return self.refs_dir / _path_component(app_name) / _path_component(user_id) / scope
+
+    def _artifact_dir(
+        self, app_name: str, user_id: str, filename: str, session_id: Optional[str]
+    ) -> Path:
+        """Directory holding the version refs of one artifact (same scoping rules as GCS)."""
+        if filename.startswith("user:"):
+            scope = USER_SCOPE
+        elif session_id is None:
+            raise ValueError("Session ID must be provided for session-scoped artifacts.")
+        else:
+            scope = _path_component(session_id)
+        return self._scope_dir(app_name, user_id, scope) / _path_component(filename)
+
+    def _list_versions_sync(
+        self, app_name: str, user_id: str, session_id: Optional[str], filename: str
+    ) -> list[int]:
+        artifact_dir = self._artifact_dir(app_name, user_id, filename, session_id)
+        try:
+            names = os.listdir(artifact_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-5]) for name in names if name.endswith(".json") and name[:-5].isdigit())
+
+    def _read_ref(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: Optional[str],
+        filename: str,
+        version: Optional[int],
+    ) -> Optional[tuple[int, dict]]:
+        """Return (version, ref) for the requested or latest version, if any."""
+        if version is None:
+            versions = self._list_versions_sync(app_name, user_id, session_id, filename)
+            if not versions:
+                return None
+            version = versions[-1]
+        ref_path = self._artifact_dir(app_name, user_id, filename, session_id) / f"{version}.json"
+        try:
+            return version, json.loads(ref_path.read_text())
+        except FileNotFoundError:
+            return None
+
+    def _write_blob(self, data: bytes) -> str:
+        """Store `data` in the blob store (once per content) and return its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not blob_path.exists():
+            atomic_write(blob_path, data)
+        return digest
+
+    def _save_artifact_sync(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: Optional[str],
+        filename: str,
+        artifact: types.Part,
+        custom_metadata: Optional[dict[str, Any]],
+    ) -> int:
+        if artifact.inline_data:
+            data = artifact.inline_data.data
+            mime_type = artifact.inline_data.mime_type
+        elif artifact.text:
+            data = artifact.text.encode("utf-8")
+            mime_type = "text/plain"
+        elif artifact.file_data:
+            raise NotImplementedError(
+                "Saving artifact with file_data is not supported yet in LocalArtifactService."
+            )
+        else:
+            raise ValueError("Artifact must have either inline_data or text.")
+
+        ref = {
+            "digest": self._write_blob(data),
+            "mime_type": mime_type,
+            "size": len(data),
+            "create_time": time.time(),
+            "custom_metadata": {k: str(v) for k, v in (custom_metadata or {}).items()},
+        }
+        artifact_dir = self._artifact_dir(app_name, user_id, filename, session_id)
+        artifact_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=artifact_dir, prefix=".ref.", delete=False
+        ) as f:
+            json.dump(ref, f)
+
+        versions = self._list_versions_sync(app_name, user_id, session_id, filename)
+        version = versions[-1] + 1 if versions else 0
+        try:
+            # link() fails if the target exists, so concurrent savers each get their own version
+            while True:
+                try:
+                    os.link(f.name, artifact_dir / f"{version}.json")
+                    return version
+                except FileExistsError:
+                    version += 1
+        finally:
+            os.unlink(f.name)
+
+    def _load_artifact_sync(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: Optional[str],
+        filename: str,
+        version: Optional[int],
+    ) -> Optional[types.Part]:
+        found = self._read_ref(app_name, user_id, session_id, filename, version)
+        if found is None:
+            return None
+        _, ref = found
+        data = _read_mapped(self._blob_path(ref["digest"]))
+        if not data:
+            return None
+        return types.Part.from_bytes(data=data, mime_type=ref["mime_type"])
+
+    def _list_artifact_keys_sync(
+        self, app_name: str, user_id: str, session_id: Optional[str]
+    ) -> list[str]:
+        scopes = [USER_SCOPE]
+        if session_id:
+            scopes.append(_path_component(session_id))
+        filenames = set()
+        for scope in scopes:
+            scope_dir = self._scope_dir(app_name, user_id, scope)
+            if scope_dir.is_dir():
+                filenames.update(unquote(path.name) for path in scope_dir.iterdir())
+        return sorted(filenames)
+
+    def _delete_artifact_sync(
+        self, app_name: str, user_id: str, session_id: Optional[str], filename: str
+    ) -> None:
+        # Blobs may be shared across scopes and are left in place
+        artifact_dir = self._artifact_dir(app_name, user_id, filename, session_id)
+        for version in self._list_versions_sync(app_name, user_id, session_id, filename):
+            (artifact_dir / f"{version}.json").unlink(missing_ok=True)
+
+    def _to_artifact_version(self, version: int, ref: dict) -> ArtifactVersion:
+        return ArtifactVersion(
+            version=version,
+            canonical_uri=self._blob_path(ref["digest"]).as_uri(),
+            create_time=ref["create_time"],
+            mime_type=ref["mime_type"],
+            custom_metadata=ref.get("custom_metadata", {}),
+        )
+
+    def _get_artifact_version_sync(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: Optional[str],
+        filename: str,
+        version: Optional[int],
+    ) -> Optional[ArtifactVersion]:
+        found = self._read_ref(app_name, user_id, session_id, filename, version)
+        return self._to_artifact_version(*found) if found else None
+
+    def _list_artifact_versions_sync(
+        self, app_name: str, user_id: str, session_id: Optional[str], filename: str
+    ) -> list[ArtifactVersion]:
+        artifact_versions = []
+        for version in self._list_versions_sync(app_name, user_id, session_id, filename):
+            found = self._read_ref(app_name, user_id, session_id, filename, version)
+            if found:
+                artifact_versions.append(self._to_artifact_version(*found))
+        return artifact_versions
+
+    def get_artifact_path(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+        version: Optional[int] = None,
+    ) -> Optional[tuple[Path, str]]:
+        """
+        Resolve an artifact version to its blob file so it can be served directly.
+
+        Args:
+            app_name: The name of the application
+            user_id: The ID of the user
+            filename: The artifact filename
+            session_id: The ID of the session
+            version: The version to resolve; defaults to the latest
+
+        Returns:
+            tuple[Path, str] | None: (blob path, mime type), or None if the artifact does not exist
+        """
+        found = self._read_ref(app_name, user_id, session_id, filename, version)
+        if found is None:
+            return None
+        _, ref = found
+        blob_path = self._blob_path(ref["digest"])
+        if not blob_path.is_file():
+            return None
+        return blob_path, ref["mime_type"]
+
+    # ----- BaseArtifactService -----
+
+    async def save_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        artifact: types.Part,
+        session_id: Optional[str] = None,
+        custom_metadata: Optional[dict[str, Any]] = None,
+    ) -> int:
+        return await asyncio.to_thread(
+            self._save_artifact_sync,
+            app_name,
+            user_id,
+            session_id,
+            filename,
+            artifact,
+            custom_metadata,
+        )
+
+    async def load_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+        version: Optional[int] = None,
+    ) -> Optional[types.Part]:
+        return await asyncio.to_thread(
+            self._load_artifact_sync, app_name, user_id, session_id, filename, version
+        )
+
+    async def list_artifact_keys(
+        self, *, app_name: str, user_id: str, session_id: Optional[str] = None
+    ) -> list[str]:
+        return await asyncio.to_thread(
+            self._list_artifact_keys_sync, app_name, user_id, session_id
+        )
+
+    async def delete_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+    ) -> None:
+        await asyncio.to_thread(
+            self._delete_artifact_sync, app_name, user_id, session_id, filename
+        )
+
+    async def list_versions(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+    ) -> list[int]:
+        return await asyncio.to_thread(
+            self._list_versions_sync, app_name, user_id, session_id, filename
+        )
+
+    async def list_artifact_versions(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+    ) -> list[ArtifactVersion]:
+        return await asyncio.to_thread(
+            self._list_artifact_versions_sync, app_name, user_id, session_id, filename
+        )
+
+    async def get_artifact_version(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        filename: str,
+        session_id: Optional[str] = None,
+        version: Optional[int] = None,
+    ) -> Optional[ArtifactVersion]:
+        return await asyncio.to_thread(
+            self._get_artifact_version_sync, app_name, user_id, session_id, filename, version
+        )
+
+
+def _path_component(name: str) -> str:
+    """Percent-encode `name` into a single path component that can't be "", "." or ".."."""
+    encoded = quote(name, safe="")
+    if encoded.startswith("."):
+        encoded = "%2E" + encoded[1:]
+    return encoded or "%"
+
+
+def _read_mapped(path: Path) -> bytes:
+    """Read a blob through a read-only memory map; missing files read as empty."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+    except FileNotFoundError:
+        return b""
+
+
+def iter_file_range(path: Path, start: int, end: int, chunk_size: int = 256 * 1024):
+    """
+    Yield bytes `start..end` (inclusive) of a file through a memory map.
+
+    Args:
+        path: The file to read
+        start: First byte offset
+        end: Last byte offset (inclusive)
+        chunk_size: Maximum size of each yielded chunk
+
+    Yields:
+        bytes: Consecutive chunks of the requested range
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(start, end + 1, chunk_size):
+                yield mapped[offset:min(offset + chunk_size, end + 1)]
@@ -0,0 +1,262 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import logger
+from schema import PendingReview, ReceiptReviewRequest
+
+
+class ReviewQueue:
+    """Per-user queue of receipt reviews awaiting approval, stored in SQLite.
+
+    Reviews are keyed by (user_id, receipt_id), so a re-analysed receipt
+    replaces its earlier review instead of piling up. Every change bumps a
+    per-user version number, which clients use as an ETag to poll cheaply:
+    checking for changes is a single primary-key lookup.
+    """
+
+    def __init__(self, db_path: str, poll_interval: float = 1.0):
+        """
+        Open (and if needed create) the review queue database.
+
+        Args:
+            db_path: Path to the SQLite database file
+            poll_interval: How often waiters re-check the database for changes
+                made by other processes, in seconds
+        """
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # Long-poll waiters of this process by user_id, woken on local changes
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_reviews (
+                user_id TEXT NOT NULL,
+                receipt_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                review_request TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (user_id, receipt_id)
+            )
+        """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pending_reviews_receipt
+            ON pending_reviews (receipt_id)
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS review_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """)
+        logger.info("Review queue initialized", db_path=db_path)
+
+    def _bump_version(self, user_id: str) -> None:
+        self._conn.execute(
+            "INSERT INTO review_versions (user_id, version) VALUES (?, 1)"
+            " ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+            (user_id,),
+        )
+
+    def _notify(self, user_ids: List[str]) -> None:
+        """Wake this process's long-poll waiters of the given users. Caller holds the lock."""
+        for user_id in user_ids:
+            for loop, waiter in self._waiters.pop(user_id, []):
+                loop.call_soon_threadsafe(_resolve_waiter, waiter)
+
+    def add(self, user_id: str, session_id: str, review_request: ReceiptReviewRequest) -> bool:
+        """
+        Queue (or replace) the pending review of a receipt.
+
+        Args:
+            user_id: The ID of the user who has to review the receipt
+            session_id: The ID of the session the review was requested in
+            review_request: The review request
+
+        Returns:
+            bool: False if the identical review was already pending
+        """
+        review_json = review_request.model_dump_json()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT session_id, review_request FROM pending_reviews"
+                    " WHERE user_id = ? AND receipt_id = ?",
+                    (user_id, review_request.receipt_id),
+                ).fetchone()
+                if row == (session_id, review_json):
+                    self._conn.execute("COMMIT")
+                    return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pending_reviews"
+                    " (user_id, receipt_id, session_id, review_request, created_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (user_id, review_request.receipt_id, session_id, review_json, time.time()),
+                )
+                self._bump_version(user_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._notify([user_id])
+        return True
+
+    def remove(self, receipt_id: str, user_id: Optional[str] = None) -> int:
+        """
+        Drop the pending review of a receipt.
+
+        Args:
+            receipt_id: The receipt's image hash ID
+            user_id: Only drop this user's review; None drops it for every user
+
+        Returns:
+            int: Number of reviews removed
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if user_id is None:
+                    user_ids = [
+                        row[0]
+                        for row in self._conn.execute(
+                            "SELECT user_id FROM pending_reviews WHERE receipt_id = ?",
+                            (receipt_id,),
+                        )
+                    ]
+                else:
+                    user_ids = [user_id]
+                removed = 0
+                for owner in user_ids:
+                    cursor = self._conn.execute(
+                        "DELETE FROM pending_reviews WHERE user_id = ? AND receipt_id = ?",
+                        (owner, receipt_id),
+                    )
+                    if cursor.rowcount:
+                        removed += cursor.rowcount
+                        self._bump_version(owner)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._notify(user_ids)
+        return removed
+
+    def version(self, user_id: str) -> int:
+        """
+        Get the current version of a user's queue.
+
+        Args:
+            user_id: The ID of the user
+
+        Returns:
+            int: The version, 0 if the user never had a pending review
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM review_versions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def list_pending(self, user_id: str) -> Tuple[int, List[PendingReview]]:
+        """
+        List a user's pending reviews, oldest first.
+
+        Args:
+            user_id: The ID of the user
+
+        Returns:
+            Tuple[int, List[PendingReview]]: The queue version and its reviews, read consistently
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute(
+                    "SELECT version FROM review_versions WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                rows = self._conn.execute(
+                    "SELECT receipt_id, session_id, review_request, created_at"
+                    " FROM pending_reviews WHERE user_id = ? ORDER BY created_at",
+                    (user_id,),
+                ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        reviews = [
+            PendingReview(
+                receipt_id=receipt_id,
+                session_id=session_id,
+                created_at=created_at,
+                review_request=ReceiptReviewRequest.model_validate_json(review_json),
+            )
+            for receipt_id, session_id, review_json, created_at in rows
+        ]
+        return (row[0] if row else 0), reviews
+
+    async def wait_for_change(self, user_id: str, version: int, timeout: float) -> int:
+        """
+        Wait until a user's queue moves past `version`, or the timeout expires.
+
+        Changes made by this process wake the waiter immediately; changes made
+        by other processes sharing the database are seen within `poll_interval`.
+
+        Args:
+            user_id: The ID of the user
+            version: The version the client already has
+            timeout: Maximum time to wait, in seconds
+
+        Returns:
+            int: The current version (equal to `version` on timeout)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            waiter = loop.create_future()
+            with self._lock:
+                self._waiters.setdefault(user_id, []).append((loop, waiter))
+            try:
+                current = await asyncio.to_thread(self.version, user_id)
+                remaining = deadline - loop.time()
+                if current != version or remaining <= 0:
+                    return current
+                try:
+                    await asyncio.wait_for(waiter, min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                with self._lock:
+                    waiters = self._waiters.get(user_id)
+                    if waiters and (loop, waiter) in waiters:
+                        waiters.remove((loop, waiter))
+                        if not waiters:
+                            del self._waiters[user_id]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _resolve_waiter(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
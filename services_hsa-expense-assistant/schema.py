@@ -17,6 +17,10 @@ limitations under the License.
 from pydantic import BaseModel
 from typing import List, Optional
 
+# URI scheme of image references stored in the session history in place of
+# inline image bytes; the rest of the URI is the artifact filename (image hash ID)
+ARTIFACT_URI_PREFIX = "artifact://"
+
 
 class ImageData(BaseModel):
     """Model for image data with hash identifier.
@@ -24,10 +28,34 @@ class ImageData(BaseModel):
     Attributes:
         serialized_image: Optional Base64 encoded string of the image content.
         mime_type: MIME type of the image.
+        image_hash_id: Optional hash ID of the image (set on response attachments).
+        url: Optional backend path serving the image (set on response attachments,
+            which carry this reference instead of the base64 content).
+        error: Optional reason the image is unavailable; the attachment is then a
+            placeholder without URL or image content.
     """
 
     serialized_image: str
     mime_type: str
+    image_hash_id: str = ""
+    url: str = ""
+    error: Optional[str] = None
+
+
+class IngestedImage(BaseModel):
+    """Model for an uploaded image that has been decoded and hashed once.
+
+    Attributes:
+        image_hash_id: Short SHA-256 digest of the image bytes, used as artifact filename.
+        image_bytes: The decoded image content.
+        mime_type: MIME type of the image.
+        image_url: URL of the image artifact in storage.
+    """
+
+    image_hash_id: str
+    image_bytes: bytes
+    mime_type: str
+    image_url: str
 
 
 class ChatRequest(BaseModel):
@@ -99,6 +127,7 @@ class ReceiptReviewResponse(BaseModel):
         total_cost: The total amount spent (from original review request).
         payment_card: The payment card type or name (from original review request).
         card_last_four_digit: The last four digits of the payment card (from original review request).
+        user_id: The ID of the user approving the receipt.
     """
     receipt_id: str
     approved_hsa_eligible_items: List[ReviewItem]
@@ -109,6 +138,51 @@ class ReceiptReviewResponse(BaseModel):
     total_cost: float
     payment_card: str
     card_last_four_digit: str
+    user_id: str = "default_user"
+
+
+class PendingReview(BaseModel):
+    """Model for a receipt review waiting for the user's approval.
+
+    Attributes:
+        receipt_id: The image ID of the receipt.
+        session_id: The ID of the session the review was requested in.
+        created_at: When the review was queued, as a Unix timestamp.
+        review_request: The review request.
+    """
+
+    receipt_id: str
+    session_id: str
+    created_at: float
+    review_request: ReceiptReviewRequest
+
+
+class PendingReviewsResponse(BaseModel):
+    """Model for the pending reviews of a user.
+
+    Attributes:
+        version: Version of the user's review queue, also sent as the ETag.
+        reviews: The pending reviews, oldest first.
+    """
+
+    version: int
+    reviews: List[PendingReview] = []
+
+
+class ParsedAgentResponse(BaseModel):
+    """Model for the sections of an agent's markdown response.
+
+    Attributes:
+        response: The FINAL RESPONSE section with structured JSON blocks removed.
+        thinking_process: The THINKING PROCESS section, if any.
+        attachment_ids: Image hash IDs listed in the attachments JSON block.
+        review_request: Review request parsed from the review JSON, if any.
+    """
+
+    response: str
+    thinking_process: str = ""
+    attachment_ids: List[str] = []
+    review_request: Optional[ReceiptReviewRequest] = None
 
 
 class ChatResponse(BaseModel):
@@ -119,7 +193,9 @@ class ChatResponse(BaseModel):
         thinking_process: Optional thinking process of the model.
         attachments: List of image data to be displayed to the user.
         error: Optional error message if something went wrong.
-        review_request: Optional review request if human review is needed.
+        review_request: Optional review request if human review is needed; the
+            first of `review_requests`, for clients showing a single review form.
+        review_requests: Every review request of the turn, one per receipt.
     """
 
     response: str
@@ -127,3 +203,50 @@ class ChatResponse(BaseModel):
     attachments: List[ImageData] = []
     error: Optional[str] = None
     review_request: Optional[ReceiptReviewRequest] = None
+    review_requests: List[ReceiptReviewRequest] = []
+
+
+class Job(BaseModel):
+    """Model for a background chat job.
+
+    Attributes:
+        job_id: The ID of the job.
+        user_id: User identifier of the chat request.
+        session_id: Session identifier of the chat request.
+        status: One of "queued", "running", "succeeded" or "failed".
+        created_at: When the job was submitted, as a Unix timestamp.
+        updated_at: When the job's status last changed, as a Unix timestamp.
+        result: The chat response, once the job has finished.
+        error: Why the job failed, if it did.
+    """
+
+    job_id: str
+    user_id: str
+    session_id: str
+    status: str
+    created_at: float
+    updated_at: float
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
+class BatchReceiptResult(BaseModel):
+    """Model for the outcome of one receipt in a batch upload.
+
+    Attributes:
+        index: Position of the receipt's file in the upload.
+        filename: Name of the uploaded file.
+        session_id: The short-lived session the receipt was analyzed in.
+        image_hash_id: Hash ID of the receipt image.
+        response: The agent's response text.
+        review_request: Review request for the receipt, if the agent produced one.
+        error: Optional error message if the receipt could not be processed.
+    """
+
+    index: int
+    filename: str = ""
+    session_id: str
+    image_hash_id: str = ""
+    response: str = ""
+    review_request: Optional[ReceiptReviewRequest] = None
+    error: Optional[str] = None
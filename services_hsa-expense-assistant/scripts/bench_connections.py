@@ -0,0 +1,134 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Concurrent read/write throughput of Database with a new default
+(rollback-journal) connection per call versus its reused per-thread WAL
+connections. Run from services_hsa-expense-assistant:
+
+    python scripts/bench_connections.py --readers 4 --writers 2 --seconds 10
+
+Reader threads query one day's items (about 100 rows) while writer threads insert
+approvals, both for `--seconds`; calls that fail (e.g. "database is
+locked") are counted as errors.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Database  # noqa: E402
+
+
+class PerCallDatabase(Database):
+    """Database as it was before connection reuse: a fresh default connection per call."""
+
+    @contextmanager
+    def _get_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def day(index: int) -> str:
+    """A date in 2024, cycling through its first 28 days of each month."""
+    return f"2024-{index // 28 % 12 + 1:02d}-{index % 28 + 1:02d}"
+
+
+def preload(database: Database, rows: int) -> None:
+    """Store `rows` items, 100 per receipt, one receipt date after another."""
+    for start in range(0, rows, 100):
+        items = [{"name": f"item-{index}", "price": 1.0} for index in range(start, min(start + 100, rows))]
+        database.insert_approved_items(items, "store", day(start // 100), f"url-{start}")
+
+
+def run(database: Database, args: argparse.Namespace) -> dict:
+    """Run readers and writers against `database` for the configured time."""
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def worker(name: str, operation) -> None:
+        done = errors = 0
+        sequence = 0
+        while time.monotonic() < deadline:
+            try:
+                operation(sequence)
+                done += 1
+            except sqlite3.Error:
+                errors += 1
+            sequence += 1
+        with lock:
+            counts[name] += done
+            counts["errors"] += errors
+
+    def read(sequence: int) -> None:
+        date = day(sequence % (args.rows // 100))
+        database.get_items_by_date_range(date, date)
+
+    def write(sequence: int) -> None:
+        database.insert_approved_items(
+            [{"name": f"new-{threading.get_ident()}-{sequence}-{index}", "price": 2.0} for index in range(5)],
+            "new-store",
+            "2025-01-01",
+            f"new-url-{threading.get_ident()}-{sequence}",
+        )
+
+    threads = [threading.Thread(target=worker, args=("reads", read)) for _ in range(args.readers)]
+    threads += [threading.Thread(target=worker, args=("writes", write)) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main(args: argparse.Namespace) -> None:
+    logging.getLogger("logger").setLevel(logging.WARNING)
+    print(f"{args.rows} stored rows, {args.readers} readers, {args.writers} writers, {args.seconds}s each")
+    print(f"{'connections':<34}{'reads/s':>10}{'writes/s':>10}{'errors':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, make_database in (
+            ("new default connection per call", PerCallDatabase),
+            ("reused per-thread WAL connections", Database),
+        ):
+            database = make_database(os.path.join(tmp_dir, f"{make_database.__name__}.db"))
+            preload(database, args.rows)
+            counts = run(database, args)
+            print(
+                f"{name:<34}{counts['reads'] / args.seconds:>10.0f}"
+                f"{counts['writes'] / args.seconds:>10.0f}{counts['errors']:>8}"
+            )
+            database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Database connection handling under concurrency.")
+    parser.add_argument("--rows", type=int, default=12_000, help="Items stored before the run")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    main(parser.parse_args())
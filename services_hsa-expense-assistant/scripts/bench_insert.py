@@ -0,0 +1,154 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Approval insert cost with a large approved_items table: the former
+row-by-row duplicate check (a SELECT COUNT(*) over the unindexed identity
+columns, then an INSERT, per item) versus Database.insert_approved_items
+(one executemany of INSERT ... ON CONFLICT DO NOTHING against the unique
+identity index). Run from services_hsa-expense-assistant:
+
+    python scripts/bench_insert.py --rows 100000 --receipts 200
+
+Both databases are preloaded with `--rows` items, then `--receipts` stored
+receipts are approved again with `--items` items each, every other item
+duplicating a stored row. Both methods must report the same inserted and skipped counts.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Database  # noqa: E402
+
+LEGACY_SCHEMA = """
+    CREATE TABLE approved_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT DEFAULT '',
+        price REAL NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 1,
+        store_name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        image_url TEXT NOT NULL,
+        payment_card TEXT DEFAULT '',
+        card_last_four_digit TEXT DEFAULT '',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+INSERT_SQL = """
+    INSERT INTO approved_items
+    (name, description, price, quantity, store_name, date, image_url, payment_card, card_last_four_digit)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def stored_row(index: int) -> tuple:
+    """The index-th preloaded item; each stored receipt holds 5 items."""
+    receipt = index // 5
+    return (f"item-{index}", "", 1.0 + index % 5, 1, f"store-{receipt % 100}", "2024-01-01", f"url-{receipt}", "", "")
+
+
+def approvals(args: argparse.Namespace) -> list:
+    """Re-approvals of stored receipts, as (items, store_name, date, image_url).
+
+    Every other item is one of the receipt's stored items (a duplicate); the rest are new.
+    """
+    receipts = []
+    for receipt in range(args.receipts):
+        stored = [stored_row(receipt * 5 + offset) for offset in range(5)]
+        items = []
+        for position in range(args.items):
+            if position % 2:
+                name, _, price, *_ = stored[(position // 2) % 5]
+                items.append({"name": name, "price": price})
+            else:
+                items.append({"name": f"new-{receipt}-{position}", "price": 2.5})
+        _, _, _, _, store_name, date, image_url, _, _ = stored[0]
+        receipts.append((items, store_name, date, image_url))
+    return receipts
+
+
+def legacy_insert(conn: sqlite3.Connection, items: list, store_name: str, date: str, image_url: str) -> tuple:
+    """The former insert_approved_items: a duplicate check and an insert per item."""
+    inserted = skipped = 0
+    for item in items:
+        row = (item.get("name", ""), item.get("description", ""), item.get("price", 0.0), item.get("quantity", 1),
+               store_name, date, image_url)
+        count = conn.execute(
+            "SELECT COUNT(*) FROM approved_items WHERE name = ? AND description = ? AND price = ?"
+            " AND quantity = ? AND store_name = ? AND date = ? AND image_url = ?",
+            row,
+        ).fetchone()[0]
+        if count == 0:
+            conn.execute(INSERT_SQL, (*row, "", ""))
+            inserted += 1
+        else:
+            skipped += 1
+    conn.commit()
+    return inserted, skipped
+
+
+def main(args: argparse.Namespace) -> None:
+    logging.getLogger("logger").setLevel(logging.WARNING)
+    receipts = approvals(args)
+    items_total = sum(len(items) for items, *_ in receipts)
+    preload = [stored_row(index) for index in range(args.rows)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_conn = sqlite3.connect(os.path.join(tmp_dir, "legacy.db"))
+        legacy_conn.execute(LEGACY_SCHEMA)
+        legacy_conn.executemany(INSERT_SQL, preload)
+        legacy_conn.commit()
+        start = time.perf_counter()
+        legacy_counts = [legacy_insert(legacy_conn, *receipt) for receipt in receipts]
+        legacy_seconds = time.perf_counter() - start
+        legacy_conn.close()
+
+        database = Database(os.path.join(tmp_dir, "receipts.db"))
+        with database._get_connection() as conn:
+            conn.executemany(INSERT_SQL, preload)
+            conn.commit()
+        start = time.perf_counter()
+        counts = [database.insert_approved_items(*receipt) for receipt in receipts]
+        seconds = time.perf_counter() - start
+        database.close()
+
+    legacy_inserted, legacy_skipped = map(sum, zip(*legacy_counts))
+    inserted, skipped = map(sum, zip(*counts))
+    expected_skipped = args.receipts * (args.items // 2)
+    print(f"{args.rows} stored rows, {len(receipts)} approvals, {items_total} items")
+    print(f"{'method':<34}{'seconds':>10}{'items/s':>12}{'inserted':>10}{'skipped':>10}")
+    print(f"{'row-by-row COUNT(*) + INSERT':<34}{legacy_seconds:>10.3f}{items_total / legacy_seconds:>12.0f}"
+          f"{legacy_inserted:>10}{legacy_skipped:>10}")
+    print(f"{'executemany ON CONFLICT DO NOTHING':<34}{seconds:>10.3f}{items_total / seconds:>12.0f}"
+          f"{inserted:>10}{skipped:>10}")
+    print(f"speedup: {legacy_seconds / seconds:.1f}x")
+    assert (inserted, skipped) == (legacy_inserted, legacy_skipped), "methods disagree on duplicates"
+    assert skipped == expected_skipped, f"expected {expected_skipped} skipped duplicates, got {skipped}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark duplicate-safe approval inserts.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Items stored before the approvals")
+    parser.add_argument("--receipts", type=int, default=200, help="Number of approvals, at most rows / 5")
+    parser.add_argument("--items", type=int, default=10, help="Items per approval; every other one is a duplicate")
+    main(parser.parse_args())
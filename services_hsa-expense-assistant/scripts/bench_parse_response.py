@@ -0,0 +1,69 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Worst-case timing of parse_agent_response on adversarial agent output.
+Run from services_hsa-expense-assistant:
+
+    python scripts/bench_parse_response.py --sizes 100000 1000000
+
+Each input repeats one pattern up to the given size; time per size should
+grow linearly (the ratio column stays near the size ratio).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import parse_agent_response  # noqa: E402
+
+ADVERSARIAL_UNITS = {
+    "backtick flood": "`",
+    "empty fences": "```",
+    "unterminated json fences": "```json\n{",
+    "heading flood": "# FINAL RESPONSE\n",
+    "raw review_request openers": '{"review_request": {',
+    "image id markers": "[IMAGE-ID x] ",
+}
+
+
+def time_parse(text: str, repeats: int) -> float:
+    """Return the best of `repeats` parse times, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse_agent_response(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{'input':<28}{'bytes':>10}{'seconds':>10}{'ratio':>8}")
+    for name, unit in ADVERSARIAL_UNITS.items():
+        previous = None
+        for size in args.sizes:
+            seconds = time_parse(unit * (size // len(unit)), args.repeats)
+            ratio = f"{seconds / previous:.1f}x" if previous else ""
+            print(f"{name:<28}{size:>10}{seconds:>10.3f}{ratio:>8}")
+            previous = seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parse_agent_response on adversarial input.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
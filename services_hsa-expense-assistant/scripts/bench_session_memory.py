@@ -0,0 +1,106 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Memory held by InMemorySessionService versus SqliteSessionService after
+the same workload. Run from services_hsa-expense-assistant:
+
+    python scripts/bench_session_memory.py --sessions 2000 --events 20
+
+Every session gets `--events` events with a text part of `--event-bytes`
+bytes, then each one is read back. Python heap usage is measured with
+tracemalloc; the SQLite database's size on disk is reported separately.
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from google.adk.events import Event, EventActions  # noqa: E402
+from google.adk.sessions import BaseSessionService, InMemorySessionService  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from sqlite_session_service import SqliteSessionService  # noqa: E402
+
+
+async def run_workload(service: BaseSessionService, args: argparse.Namespace) -> None:
+    """Create the sessions, append their events and read each one back."""
+    text = "x" * args.event_bytes
+    for index in range(args.sessions):
+        session = await service.create_session(app_name="bench", user_id="user", session_id=f"s{index}")
+        for turn in range(args.events):
+            await service.append_event(
+                session,
+                Event(
+                    author="user" if turn % 2 == 0 else "model",
+                    content=types.Content(role="user", parts=[types.Part(text=text)]),
+                    actions=EventActions(state_delta={"turn": turn}),
+                ),
+            )
+    for index in range(args.sessions):
+        await service.get_session(app_name="bench", user_id="user", session_id=f"s{index}")
+
+
+def measure(name: str, make_service, args: argparse.Namespace) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    service = make_service()
+    asyncio.run(run_workload(service, args))
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<28}{current / 2**20:>12.1f}{peak / 2**20:>12.1f}"
+        f"{time.perf_counter() - start:>10.1f}"
+    )
+    # Keep the service alive until after the measurement
+    del service
+
+
+def main(args: argparse.Namespace) -> None:
+    print(
+        f"{args.sessions} sessions x {args.events} events of {args.event_bytes} bytes,"
+        f" sqlite cache of {args.cache_sessions} sessions"
+    )
+    print(f"{'service':<28}{'held MiB':>12}{'peak MiB':>12}{'seconds':>10}")
+    measure("InMemorySessionService", InMemorySessionService, args)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "sessions.db")
+        measure(
+            "SqliteSessionService",
+            lambda: SqliteSessionService(db_path, cache_max_sessions=args.cache_sessions),
+            args,
+        )
+        disk_bytes = sum(
+            os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir)
+        )
+        print(f"SQLite database on disk: {disk_bytes / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare session service memory usage.")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--event-bytes", type=int, default=512)
+    parser.add_argument("--cache-sessions", type=int, default=256)
+    main(parser.parse_args())
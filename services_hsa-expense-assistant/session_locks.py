@@ -0,0 +1,138 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Tuple
+
+import logger
+
+
+class _SessionLock:
+    """Lock of one session and the number of turns queued on it."""
+
+    __slots__ = ("lock", "waiting", "__weakref__")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+
+
+class SessionLockRegistry:
+    """Serializes agent turns per session while running different sessions in parallel.
+
+    Each (user_id, session_id) gets its own asyncio.Lock, held in a
+    WeakValueDictionary: the lock lives only as long as some turn holds or
+    waits for it, so idle sessions cost nothing. An optional semaphore caps
+    the number of agent runs across all sessions; a turn takes its session
+    lock first, so turns queued behind their own session never occupy a slot.
+    """
+
+    def __init__(self, max_concurrent_runs: int = 0):
+        """
+        Create an empty registry.
+
+        Args:
+            max_concurrent_runs: Maximum number of turns running at once across
+                all sessions; 0 means unlimited
+        """
+        self.max_concurrent_runs = max_concurrent_runs
+        self._locks: "weakref.WeakValueDictionary[Tuple[str, str], _SessionLock]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._run_slots = asyncio.Semaphore(max_concurrent_runs) if max_concurrent_runs > 0 else None
+        self._queued_turns = 0
+        self._waiting_for_slot = 0
+        self._running_turns = 0
+        self._turns_total = 0
+        self._contended_total = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    @asynccontextmanager
+    async def hold(self, user_id: str, session_id: str) -> AsyncIterator[None]:
+        """
+        Wait for the session's turn (and a free run slot), and hold it for the block.
+
+        Args:
+            user_id: The ID of the user
+            session_id: The ID of the session
+        """
+        key = (user_id, session_id)
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = _SessionLock()
+            self._locks[key] = entry
+
+        start = time.monotonic()
+        if entry.lock.locked():
+            self._contended_total += 1
+        entry.waiting += 1
+        self._queued_turns += 1
+        try:
+            await entry.lock.acquire()
+        finally:
+            entry.waiting -= 1
+            self._queued_turns -= 1
+
+        try:
+            if self._run_slots is not None:
+                self._waiting_for_slot += 1
+                try:
+                    await self._run_slots.acquire()
+                finally:
+                    self._waiting_for_slot -= 1
+            try:
+                wait_seconds = time.monotonic() - start
+                self._turns_total += 1
+                self._wait_seconds_total += wait_seconds
+                self._wait_seconds_max = max(self._wait_seconds_max, wait_seconds)
+                if wait_seconds >= 0.1:
+                    logger.info(
+                        "Agent turn waited before running",
+                        user_id=user_id,
+                        session_id=session_id,
+                        wait_seconds=round(wait_seconds, 3),
+                        queued_behind=entry.waiting,
+                    )
+                self._running_turns += 1
+                try:
+                    yield
+                finally:
+                    self._running_turns -= 1
+            finally:
+                if self._run_slots is not None:
+                    self._run_slots.release()
+        finally:
+            entry.lock.release()
+
+    def stats(self) -> Dict[str, float | int]:
+        """Return current queue depths and cumulative wait statistics."""
+        entries = list(self._locks.values())
+        return {
+            "tracked_sessions": len(entries),
+            "queued_turns": self._queued_turns,
+            "max_session_queue_depth": max((entry.waiting for entry in entries), default=0),
+            "waiting_for_run_slot": self._waiting_for_slot,
+            "running_turns": self._running_turns,
+            "max_concurrent_runs": self.max_concurrent_runs,
+            "turns_total": self._turns_total,
+            "contended_turns_total": self._contended_total,
+            "wait_seconds_total": round(self._wait_seconds_total, 3),
+            "wait_seconds_max": round(self._wait_seconds_max, 3),
+        }
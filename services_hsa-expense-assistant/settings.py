@@ -21,7 +21,7 @@ from pydantic_settings import (
     YamlConfigSettingsSource,
     PydanticBaseSettingsSource,
 )
-from typing import Type, Tuple
+from typing import Literal, Type, Tuple
 
 
 class Settings(BaseSettings):
@@ -36,6 +36,48 @@ class Settings(BaseSettings):
         BACKEND_URL: URL for the backend service API endpoint.
         STORAGE_BUCKET_NAME: Name of the Google Cloud Storage bucket for storing receipts.
         DB_COLLECTION_NAME: Name of the Firestore collection for storing receipts.
+        ARTIFACT_UPLOAD_CONCURRENCY: Maximum number of image artifacts uploaded at once per request.
+        ATTACHMENT_DOWNLOAD_CONCURRENCY: Maximum number of attachment images resolved at once per response.
+        ATTACHMENT_DOWNLOAD_TIMEOUT_SECONDS: Deadline for resolving a single attachment image.
+        ARTIFACT_CACHE_DIR: Directory of the local artifact disk cache; empty disables the cache.
+        ARTIFACT_CACHE_MAX_BYTES: Maximum total size of the local artifact disk cache.
+        ARTIFACT_BACKEND: Artifact storage backend, "gcs" or "local".
+        LOCAL_ARTIFACT_DIR: Root directory of the local artifact store when ARTIFACT_BACKEND is "local".
+        ARTIFACT_URL_TEMPLATE: Format string for stored image URLs with {app_name}, {user_id},
+            {session_id} and {image_hash_id} fields; empty uses the backend's default URL.
+        SESSION_BACKEND: Session storage backend, "memory" or "sqlite".
+        SESSION_DB_PATH: Path of the SQLite session database when SESSION_BACKEND is "sqlite".
+        SESSION_CACHE_MAX_SESSIONS: Maximum number of sessions kept in the SQLite backend's hot cache.
+        SESSION_TTL_SECONDS: Idle time after which a SQLite-stored session is deleted; 0 disables expiry.
+        SESSION_MAX_EVENTS: Maximum number of events kept per SQLite-stored session; 0 keeps all.
+        IMAGE_HISTORY_TURNS: Number of most recent user messages whose images are sent to the model.
+        HISTORY_TOKEN_BUDGET: Estimated token budget of the conversation history sent to the model;
+            older turns are compacted to fit. 0 disables compaction.
+        HISTORY_KEEP_RECENT_TURNS: Number of most recent turns always sent to the model verbatim.
+        IMAGE_REGISTRY_DB_PATH: Path of the SQLite database recording each receipt's image URL.
+        IMAGE_REGISTRY_CACHE_SIZE: Maximum number of receipt image records kept in memory.
+        REVIEW_QUEUE_DB_PATH: Path of the SQLite database holding pending receipt reviews.
+        REVIEW_POLL_MAX_WAIT_SECONDS: Longest time GET /reviews/pending may wait for a change.
+        REVIEW_POLL_INTERVAL_SECONDS: How often long-polls re-check for changes made by other workers.
+        MAX_CONCURRENT_AGENT_RUNS: Maximum number of agent turns running at once per worker;
+            further turns wait for a slot. 0 means unlimited.
+        MAX_IN_FLIGHT_REQUESTS: Maximum number of chat requests admitted at once per worker; 0 means unlimited.
+        ADMISSION_QUEUE_SIZE: Maximum number of chat requests waiting for admission; more are rejected with 429.
+        ADMISSION_QUEUE_TIMEOUT_SECONDS: Longest time a chat request waits for admission before a 429.
+        ADMISSION_MAX_DECODED_BYTES: Budget of decoded image bytes held by admitted requests per worker;
+            0 means unlimited. A single request above it is rejected with 413.
+        IDEMPOTENCY_MAX_ENTRIES: Maximum number of responses kept for Idempotency-Key replays.
+        IDEMPOTENCY_TTL_SECONDS: How long a response is replayed for a repeated Idempotency-Key.
+        JOB_DB_PATH: Path of the SQLite database holding background chat jobs.
+        JOB_WORKERS: Number of background job workers per backend process.
+        JOB_MAX_QUEUED: Maximum number of queued jobs; further submissions are rejected with 429.
+        JOB_LEASE_SECONDS: Heartbeat age after which a running job is considered interrupted and failed.
+        JOB_POLL_INTERVAL_SECONDS: How often workers and waiters re-check for jobs changed by other processes.
+        JOB_POLL_MAX_WAIT_SECONDS: Longest time GET /jobs/{job_id} may wait for a status change.
+        RECEIPT_BATCH_CONCURRENCY: Number of receipts of one /receipts/batch upload analyzed at once.
+        RECEIPT_BATCH_MAX_FILES: Maximum number of files in one /receipts/batch upload.
+        DATABASE_READER_THREADS: Number of threads serving SQL database reads off the event loop.
+        DATABASE_MAX_GROUP_COMMIT: Maximum number of queued approvals written in one SQL transaction.
     """
 
     GCLOUD_LOCATION: str
@@ -43,6 +85,44 @@ class Settings(BaseSettings):
     STORAGE_BUCKET_NAME: str
     BACKEND_URL: str = "http://localhost:8081/chat"
     DB_COLLECTION_NAME: str = "personal-expense-assistant-receipts"
+    ARTIFACT_UPLOAD_CONCURRENCY: int = 4
+    ATTACHMENT_DOWNLOAD_CONCURRENCY: int = 4
+    ATTACHMENT_DOWNLOAD_TIMEOUT_SECONDS: float = 10.0
+    ARTIFACT_CACHE_DIR: str = ""
+    ARTIFACT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    ARTIFACT_BACKEND: Literal["gcs", "local"] = "gcs"
+    LOCAL_ARTIFACT_DIR: str = "artifacts"
+    ARTIFACT_URL_TEMPLATE: str = ""
+    SESSION_BACKEND: Literal["memory", "sqlite"] = "memory"
+    SESSION_DB_PATH: str = "sessions.db"
+    SESSION_CACHE_MAX_SESSIONS: int = 256
+    SESSION_TTL_SECONDS: float = 7 * 24 * 3600
+    SESSION_MAX_EVENTS: int = 200
+    IMAGE_HISTORY_TURNS: int = 3
+    HISTORY_TOKEN_BUDGET: int = 32000
+    HISTORY_KEEP_RECENT_TURNS: int = 4
+    IMAGE_REGISTRY_DB_PATH: str = "image_registry.db"
+    IMAGE_REGISTRY_CACHE_SIZE: int = 1024
+    REVIEW_QUEUE_DB_PATH: str = "review_queue.db"
+    REVIEW_POLL_MAX_WAIT_SECONDS: float = 30.0
+    REVIEW_POLL_INTERVAL_SECONDS: float = 1.0
+    MAX_CONCURRENT_AGENT_RUNS: int = 16
+    MAX_IN_FLIGHT_REQUESTS: int = 32
+    ADMISSION_QUEUE_SIZE: int = 64
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    ADMISSION_MAX_DECODED_BYTES: int = 256 * 1024 * 1024
+    IDEMPOTENCY_MAX_ENTRIES: int = 1024
+    IDEMPOTENCY_TTL_SECONDS: float = 3600.0
+    JOB_DB_PATH: str = "jobs.db"
+    JOB_WORKERS: int = 4
+    JOB_MAX_QUEUED: int = 256
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_POLL_MAX_WAIT_SECONDS: float = 30.0
+    RECEIPT_BATCH_CONCURRENCY: int = 4
+    RECEIPT_BATCH_MAX_FILES: int = 50
+    DATABASE_READER_THREADS: int = 4
+    DATABASE_MAX_GROUP_COMMIT: int = 64
 
     model_config = SettingsConfigDict(
         yaml_file="settings.yaml", yaml_file_encoding="utf-8"
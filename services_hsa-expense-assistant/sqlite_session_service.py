@@ -0,0 +1,503 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+import logger
+
+# (app_name, user_id, session_id)
+SessionKey = Tuple[str, str, str]
+
+# Expired sessions are swept at most this often
+SWEEP_INTERVAL_SECONDS = 60.0
+
+
+class _CachedSession:
+    """Hot-cache record: the stored session (session-scoped state only) and its event row IDs."""
+
+    def __init__(self, session: Session, row_ids: list[int]):
+        self.session = session
+        self.row_ids = row_ids
+
+
+class SqliteSessionService(BaseSessionService):
+    """SQLite-backed session service with an LRU hot cache.
+
+    Sessions, events and app/user state survive restarts and can be shared
+    by several workers on one host (the database runs in WAL mode). Recently
+    used sessions are kept in an in-process LRU cache that is revalidated
+    against the stored `last_update_time` on every read, so a write from
+    another worker is never masked by a stale copy.
+
+    Memory and disk stay bounded: at most `cache_max_sessions` sessions are
+    held in memory, sessions idle for longer than `ttl_seconds` are deleted,
+    and each session keeps only its most recent `max_events` events.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        cache_max_sessions: int = 256,
+        ttl_seconds: float = 0,
+        max_events: int = 0,
+    ):
+        """
+        Open (and if needed create) the session database.
+
+        Args:
+            db_path: Path to the SQLite database file
+            cache_max_sessions: Maximum number of sessions kept in the hot cache
+            ttl_seconds: Idle time after which a session is deleted; 0 disables expiry
+            max_events: Maximum number of events kept per session; 0 keeps all
+        """
+        self.db_path = db_path
+        self.cache_max_sessions = cache_max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[SessionKey, _CachedSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._init_database()
+
+    def _init_database(self) -> None:
+        """Initialize the database schema if it doesn't exist."""
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                app_name TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                last_update_time REAL NOT NULL,
+                PRIMARY KEY (app_name, user_id, session_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_update_time
+                ON sessions (last_update_time);
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                app_name TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                event TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_session
+                ON events (app_name, user_id, session_id, id);
+            CREATE TABLE IF NOT EXISTS app_states (
+                app_name TEXT PRIMARY KEY,
+                state TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS user_states (
+                app_name TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                PRIMARY KEY (app_name, user_id)
+            );
+        """)
+        logger.info("Session database initialized", db_path=self.db_path)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hot cache counters and usage."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached_sessions": len(self._cache),
+            "cache_max_sessions": self.cache_max_sessions,
+        }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    # ----- Cache -----
+
+    def _cache_put(self, key: SessionKey, entry: _CachedSession) -> None:
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_max_sessions:
+            self._cache.popitem(last=False)
+
+    def _load(self, key: SessionKey) -> Optional[_CachedSession]:
+        """Return the stored session, from the cache if it is still current."""
+        row = self._conn.execute(
+            "SELECT state, last_update_time FROM sessions"
+            " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            self._cache.pop(key, None)
+            return None
+
+        state, last_update_time = row
+        if self.ttl_seconds and last_update_time < time.time() - self.ttl_seconds:
+            self._delete(key)
+            return None
+
+        entry = self._cache.get(key)
+        if entry is not None and entry.session.last_update_time == last_update_time:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        rows = self._conn.execute(
+            "SELECT id, event FROM events"
+            " WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY id",
+            key,
+        ).fetchall()
+        entry = _CachedSession(
+            Session(
+                app_name=key[0],
+                user_id=key[1],
+                id=key[2],
+                state=json.loads(state),
+                events=[Event.model_validate_json(event) for _, event in rows],
+                last_update_time=last_update_time,
+            ),
+            [row_id for row_id, _ in rows],
+        )
+        self._cache_put(key, entry)
+        return entry
+
+    # ----- Shared state -----
+
+    def _load_shared_state(self, app_name: str, user_id: str) -> tuple[dict, dict]:
+        row = self._conn.execute(
+            "SELECT state FROM app_states WHERE app_name = ?", (app_name,)
+        ).fetchone()
+        app_state = json.loads(row[0]) if row else {}
+        row = self._conn.execute(
+            "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?",
+            (app_name, user_id),
+        ).fetchone()
+        user_state = json.loads(row[0]) if row else {}
+        return app_state, user_state
+
+    def _update_shared_state(
+        self, app_name: str, user_id: str, app_delta: dict, user_delta: dict
+    ) -> None:
+        if not app_delta and not user_delta:
+            return
+        app_state, user_state = self._load_shared_state(app_name, user_id)
+        if app_delta:
+            app_state.update(app_delta)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO app_states (app_name, state) VALUES (?, ?)",
+                (app_name, json.dumps(app_state)),
+            )
+        if user_delta:
+            user_state.update(user_delta)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_states (app_name, user_id, state) VALUES (?, ?, ?)",
+                (app_name, user_id, json.dumps(user_state)),
+            )
+
+    def _merged_copy(self, session: Session, include_events: bool = True) -> Session:
+        """Copy a stored session for the caller, with app and user state merged in."""
+        copied = session.model_copy(deep=True)
+        if not include_events:
+            copied.events = []
+        app_state, user_state = self._load_shared_state(session.app_name, session.user_id)
+        for key, value in app_state.items():
+            copied.state[State.APP_PREFIX + key] = value
+        for key, value in user_state.items():
+            copied.state[State.USER_PREFIX + key] = value
+        return copied
+
+    # ----- Expiry -----
+
+    def _delete(self, key: SessionKey) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._cache.pop(key, None)
+
+    def _maybe_sweep(self) -> None:
+        """Delete sessions idle for longer than the TTL (at most once per sweep interval)."""
+        now = time.time()
+        if not self.ttl_seconds or now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        expired = self._conn.execute(
+            "SELECT app_name, user_id, session_id FROM sessions WHERE last_update_time < ?",
+            (now - self.ttl_seconds,),
+        ).fetchall()
+        for key in expired:
+            self._delete(tuple(key))
+        if expired:
+            logger.info("Expired idle sessions", expired_count=len(expired))
+
+    def _trim_events(self, key: SessionKey, entry: _CachedSession) -> None:
+        """Drop the oldest events beyond `max_events`.
+
+        The cut is moved forward to the next user message so the kept history
+        never starts with an orphaned function call or response.
+        """
+        events = entry.session.events
+        if not self.max_events or len(events) <= self.max_events:
+            return
+        cut = len(events) - self.max_events
+        while cut < len(events) and not (
+            events[cut].author == "user" and not events[cut].get_function_responses()
+        ):
+            cut += 1
+        if cut >= len(events):
+            return
+        self._conn.execute(
+            "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? AND id < ?",
+            (*key, entry.row_ids[cut]),
+        )
+        del events[:cut]
+        del entry.row_ids[:cut]
+
+    # ----- Sync implementations (run in a worker thread) -----
+
+    def _create_session_sync(
+        self,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]],
+        session_id: Optional[str],
+    ) -> Session:
+        with self._lock:
+            self._maybe_sweep()
+            session_id = (
+                session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+            )
+            key = (app_name, user_id, session_id)
+            if self._load(key) is not None:
+                raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+
+            app_delta, user_delta, session_state = {}, {}, {}
+            for k, v in (state or {}).items():
+                if k.startswith(State.APP_PREFIX):
+                    app_delta[k.removeprefix(State.APP_PREFIX)] = v
+                elif k.startswith(State.USER_PREFIX):
+                    user_delta[k.removeprefix(State.USER_PREFIX)] = v
+                elif not k.startswith(State.TEMP_PREFIX):
+                    session_state[k] = v
+
+            session = Session(
+                app_name=app_name,
+                user_id=user_id,
+                id=session_id,
+                state=session_state,
+                last_update_time=time.time(),
+            )
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._update_shared_state(app_name, user_id, app_delta, user_delta)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions"
+                    " (app_name, user_id, session_id, state, last_update_time)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (*key, json.dumps(session_state), session.last_update_time),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache_put(key, _CachedSession(session, []))
+            return self._merged_copy(session)
+
+    def _get_session_sync(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig],
+    ) -> Optional[Session]:
+        with self._lock:
+            entry = self._load((app_name, user_id, session_id))
+            if entry is None:
+                return None
+            copied = self._merged_copy(entry.session)
+
+        if config:
+            if config.num_recent_events:
+                copied.events = copied.events[-config.num_recent_events:]
+            if config.after_timestamp:
+                copied.events = [
+                    event for event in copied.events if event.timestamp >= config.after_timestamp
+                ]
+        return copied
+
+    def _list_sessions_sync(
+        self, app_name: str, user_id: Optional[str]
+    ) -> ListSessionsResponse:
+        with self._lock:
+            query = "SELECT user_id, session_id, state, last_update_time FROM sessions WHERE app_name = ?"
+            params: tuple = (app_name,)
+            if user_id is not None:
+                query += " AND user_id = ?"
+                params += (user_id,)
+            if self.ttl_seconds:
+                query += " AND last_update_time >= ?"
+                params += (time.time() - self.ttl_seconds,)
+            sessions = [
+                self._merged_copy(
+                    Session(
+                        app_name=app_name,
+                        user_id=row_user_id,
+                        id=row_session_id,
+                        state=json.loads(state),
+                        last_update_time=last_update_time,
+                    ),
+                    include_events=False,
+                )
+                for row_user_id, row_session_id, state, last_update_time in self._conn.execute(
+                    query, params
+                ).fetchall()
+            ]
+        return ListSessionsResponse(sessions=sessions)
+
+    def _delete_session_sync(self, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock:
+            self._delete((app_name, user_id, session_id))
+
+    def _append_event_sync(self, session: Session, event: Event) -> None:
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            entry = self._load(key)
+            if entry is None:
+                logger.warning("Failed to append event: session not found", session_id=session.id)
+                return
+
+            app_delta, user_delta, session_delta = {}, {}, {}
+            for k, v in (event.actions.state_delta if event.actions else {}).items():
+                if k.startswith(State.APP_PREFIX):
+                    app_delta[k.removeprefix(State.APP_PREFIX)] = v
+                elif k.startswith(State.USER_PREFIX):
+                    user_delta[k.removeprefix(State.USER_PREFIX)] = v
+                elif not k.startswith(State.TEMP_PREFIX):
+                    session_delta[k] = v
+            new_state = {**entry.session.state, **session_delta}
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Like DatabaseSessionService, reject appends from a copy older than the stored
+                # session, so two writers cannot silently overwrite each other's state
+                row = self._conn.execute(
+                    "SELECT last_update_time FROM sessions"
+                    " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                    key,
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Session {session.id} was deleted while appending an event")
+                stored_update_time = row[0]
+                if stored_update_time > session.last_update_time:
+                    raise ValueError(
+                        f"The last_update_time provided in the session object {session.last_update_time}"
+                        f" is earlier than the stored update time {stored_update_time}."
+                        " Please check if it is a stale session."
+                    )
+                self._update_shared_state(session.app_name, session.user_id, app_delta, user_delta)
+                cursor = self._conn.execute(
+                    "INSERT INTO events (app_name, user_id, session_id, event) VALUES (?, ?, ?, ?)",
+                    (*key, event.model_dump_json(exclude_none=True)),
+                )
+                self._conn.execute(
+                    "UPDATE sessions SET state = ?, last_update_time = ?"
+                    " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                    (json.dumps(new_state), event.timestamp, *key),
+                )
+                entry.session.events.append(event.model_copy(deep=True))
+                entry.row_ids.append(cursor.lastrowid)
+                self._trim_events(key, entry)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                self._cache.pop(key, None)
+                raise
+            entry.session.state = new_state
+            entry.session.last_update_time = event.timestamp
+
+    # ----- BaseSessionService -----
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        return await asyncio.to_thread(
+            self._create_session_sync, app_name, user_id, state, session_id
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        return await asyncio.to_thread(
+            self._get_session_sync, app_name, user_id, session_id, config
+        )
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        return await asyncio.to_thread(self._list_sessions_sync, app_name, user_id)
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        await asyncio.to_thread(self._delete_session_sync, app_name, user_id, session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        event = self._trim_temp_delta_state(event)
+        # Persist first, so a stale session is rejected before the caller's copy changes
+        await asyncio.to_thread(self._append_event_sync, session, event)
+        # Update the caller's session object (state and events)
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        return event
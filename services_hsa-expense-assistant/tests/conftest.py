@@ -0,0 +1,31 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+from pathlib import Path
+from unittest import mock
+
+import google.cloud.firestore
+import google.cloud.storage
+import google.genai
+
+# Settings are read from settings.yaml in the working directory
+os.chdir(Path(__file__).resolve().parent.parent)
+
+# The agent modules create cloud clients at import time; tests never talk to them
+mock.patch.object(google.cloud.firestore, "Client").start()
+mock.patch.object(google.cloud.storage, "Client").start()
+mock.patch.object(google.genai, "Client").start()
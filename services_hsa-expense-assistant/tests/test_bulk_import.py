@@ -0,0 +1,144 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import asyncio
+import sqlite3
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.genai import types
+from PIL import Image
+
+import backend
+import bulk_import
+from database import Database
+from expense_manager_agent.tools import REVIEW_REQUEST_STATE_KEY_PREFIX
+
+COLORS = ["red", "green", "blue", "white", "black", "yellow"]
+
+
+@pytest.fixture
+def receipts_dir(tmp_path, monkeypatch):
+    """A directory of distinct receipt images, with backend state kept under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backend.SETTINGS, "ARTIFACT_BACKEND", "local")
+    directory = tmp_path / "receipts"
+    directory.mkdir()
+    for index, color in enumerate(COLORS):
+        Image.new("RGB", (8, 8), color).save(directory / f"receipt-{index}.png")
+    return directory
+
+
+@pytest.fixture
+def agent_runs(monkeypatch):
+    """Replace the agent with one that emits a review request; returns the session IDs it ran."""
+    runs = []
+
+    async def fake_run_async(self, user_id, session_id, new_message, **kwargs):
+        runs.append(session_id)
+        await asyncio.sleep(0.05)
+        image_hash_id = session_id.removeprefix("import-")
+        review_request = {
+            "receipt_id": image_hash_id,
+            "store_name": "Pharmacy",
+            "date": "2024-01-01",
+            "total_cost": 1.0,
+            "payment_card": "Visa",
+            "card_last_four_digit": "1234",
+            "hsa_eligible_items": [{"name": "Bandages", "price": 1.0}],
+            "non_hsa_eligible_items": [],
+            "unsure_hsa_items": [],
+        }
+        yield Event(
+            author="agent",
+            actions=EventActions(state_delta={f"{REVIEW_REQUEST_STATE_KEY_PREFIX}{image_hash_id}": review_request}),
+        )
+        yield Event(
+            author="agent",
+            content=types.Content(role="model", parts=[types.Part(text="# FINAL RESPONSE\nDone")]),
+        )
+
+    monkeypatch.setattr(backend.Runner, "run_async", fake_run_async)
+    return runs
+
+
+def import_args(directory) -> argparse.Namespace:
+    return argparse.Namespace(
+        directory=str(directory),
+        user_id="importer",
+        text=None,
+        concurrency=2,
+        processes=2,
+        checkpoint="bulk_import.db",
+        limit=None,
+        dry_run=False,
+        no_firestore_check=True,
+    )
+
+
+def checkpoint_statuses() -> dict:
+    with sqlite3.connect("bulk_import.db") as conn:
+        return dict(conn.execute("SELECT path, status FROM import_files").fetchall())
+
+
+def test_interrupted_import_resumes_from_checkpoint(receipts_dir, agent_runs):
+    async def interrupted_import():
+        task = asyncio.create_task(bulk_import.main(import_args(receipts_dir)))
+        while len(agent_runs) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(interrupted_import())
+    statuses = checkpoint_statuses()
+    imported_first = {path for path, status in statuses.items() if status == bulk_import.STATUS_IMPORTED}
+    assert len(statuses) == len(COLORS)
+    assert 0 < len(imported_first) < len(COLORS)
+    assert set(statuses.values()) <= {bulk_import.STATUS_IMPORTED, bulk_import.STATUS_HASHED}
+
+    first_runs = len(agent_runs)
+    asyncio.run(bulk_import.main(import_args(receipts_dir)))
+    resumed_runs = agent_runs[first_runs:]
+    assert set(checkpoint_statuses().values()) == {bulk_import.STATUS_IMPORTED}
+    # Only receipts not finished before the interruption ran again
+    assert len(resumed_runs) == len(COLORS) - len(imported_first)
+
+    # A further run finds nothing left to do
+    asyncio.run(bulk_import.main(import_args(receipts_dir)))
+    assert len(agent_runs) == first_runs + len(resumed_runs)
+
+
+def test_only_receipts_stored_under_their_id_are_skipped(receipts_dir, agent_runs):
+    stored_digest = bulk_import.inspect_image(str(receipts_dir / "receipt-0.png"))[0]
+    other_digest = bulk_import.inspect_image(str(receipts_dir / "receipt-1.png"))[0]
+    database = Database()
+    database.insert_approved_items(
+        [{"name": "Bandages", "price": 1.0}], "Pharmacy", "2024-01-01", "url-0", receipt_id=stored_digest
+    )
+    # A URL merely containing another receipt's hash does not mark that receipt stored
+    database.insert_approved_items(
+        [{"name": "Gauze", "price": 2.0}], "Pharmacy", "2024-01-01", f"https://example.com/batch-{other_digest}/x"
+    )
+    database.close()
+
+    asyncio.run(bulk_import.main(import_args(receipts_dir)))
+
+    statuses = checkpoint_statuses()
+    assert statuses[str(receipts_dir / "receipt-0.png")] == bulk_import.STATUS_SKIPPED
+    assert statuses[str(receipts_dir / "receipt-1.png")] == bulk_import.STATUS_IMPORTED
+    assert len(agent_runs) == len(COLORS) - 1
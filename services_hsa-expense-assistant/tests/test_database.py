@@ -0,0 +1,143 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from database import ALL_ITEMS_QUERY, ITEMS_BY_DATE_RANGE_QUERY, MIGRATIONS, AsyncDatabase, Database
+
+
+def user_version(db_path) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_migrations_bring_a_fresh_database_to_the_latest_version(tmp_path):
+    db_path = tmp_path / "receipts.db"
+    sqlite3.connect(db_path).close()
+    assert user_version(db_path) == 0
+
+    database = Database(str(db_path))
+    assert user_version(db_path) == len(MIGRATIONS) == 4
+
+    # Re-opening applies nothing and keeps the data
+    database.insert_approved_items([{"name": "Bandages", "price": 4.5}], "Pharmacy", "2024-01-01", "url")
+    database.close()
+    database = Database(str(db_path))
+    assert user_version(db_path) == 4
+    assert len(database.get_all_items()) == 1
+    database.close()
+
+
+@pytest.mark.parametrize(
+    "query, params, index",
+    [
+        (ALL_ITEMS_QUERY, (), "idx_approved_items_created"),
+        (ITEMS_BY_DATE_RANGE_QUERY, ("2024-01-01", "2024-06-30"), "idx_approved_items_date_created"),
+    ],
+)
+def test_read_queries_walk_their_index_without_sorting(tmp_path, query, params, index):
+    database = Database(str(tmp_path / "receipts.db"))
+    for month in range(1, 13):
+        database.insert_approved_items(
+            [{"name": f"item-{n}", "price": 1.0} for n in range(20)], "Pharmacy", f"2024-{month:02d}-01", f"url-{month}"
+        )
+    with database._get_connection() as conn:
+        plan = " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+    database.close()
+
+    assert f"USING INDEX {index}" in plan
+    assert "USE TEMP B-TREE" not in plan
+
+
+@pytest.fixture
+def blocked_writer(tmp_path):
+    """An AsyncDatabase whose writer thread waits for `release` before its first insert,
+    so writes queued meanwhile are committed together."""
+    async_database = AsyncDatabase(Database(str(tmp_path / "receipts.db")))
+    release = threading.Event()
+    insert_items = async_database.database._insert_items
+
+    def wait_then_insert(*args):
+        release.wait(timeout=10)
+        return insert_items(*args)
+
+    async_database.database._insert_items = wait_then_insert
+    yield async_database, release
+    release.set()
+    async_database.close()
+
+
+def approval(receipt: int, name="Bandages"):
+    return [{"name": name, "price": 4.5}], "Pharmacy", "2024-01-01", f"url-{receipt}"
+
+
+def test_queued_writes_share_one_commit(blocked_writer):
+    async_database, release = blocked_writer
+
+    async def approve_all():
+        tasks = [asyncio.create_task(async_database.insert_approved_items(*approval(n))) for n in range(10)]
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(*tasks)
+        return await async_database.get_all_items()
+
+    items = asyncio.run(approve_all())
+
+    assert len(items) == 10
+    stats = async_database.stats()
+    assert stats["writes_total"] == 10
+    assert stats["commits_total"] <= 2
+
+
+def test_failing_write_does_not_fail_its_group(blocked_writer):
+    async_database, release = blocked_writer
+
+    async def approve_all():
+        tasks = [asyncio.create_task(async_database.insert_approved_items(*approval(n))) for n in range(5)]
+        # NOT NULL violation on name
+        tasks.append(asyncio.create_task(async_database.insert_approved_items(*approval(5, name=None))))
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return results, await async_database.get_all_items()
+
+    results, items = asyncio.run(approve_all())
+
+    assert results[:5] == [None] * 5
+    assert isinstance(results[5], sqlite3.IntegrityError)
+    assert sorted(item["image_url"] for item in items) == [f"url-{n}" for n in range(5)]
+
+
+def test_writer_survives_a_closed_caller_loop(blocked_writer):
+    async_database, release = blocked_writer
+
+    async def approve_and_abandon():
+        asyncio.ensure_future(async_database.insert_approved_items(*approval(0)))
+        await asyncio.sleep(0.05)
+
+    # The loop is closed while its write is still blocked in the writer thread
+    asyncio.run(approve_and_abandon())
+    release.set()
+
+    async def approve():
+        await asyncio.wait_for(async_database.insert_approved_items(*approval(1)), timeout=5)
+        return await async_database.get_all_items()
+
+    assert len(asyncio.run(approve())) == 2
@@ -0,0 +1,58 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sqlite3
+
+from image_registry import ImageRegistry, ReceiptImage
+
+
+def test_users_uploading_the_same_image_keep_their_own_record(tmp_path):
+    registry = ImageRegistry(str(tmp_path / "image_registry.db"), cache_size=1)
+    registry.record("abcdef012345", "alice", "alice-session", "url-alice")
+    registry.record("abcdef012345", "bob", "bob-session", "url-bob")
+
+    # cache_size=1 makes the first lookup read from SQLite
+    assert registry.lookup("abcdef012345", "alice").url == "url-alice"
+    assert registry.lookup("abcdef012345", "bob").url == "url-bob"
+    assert registry.lookup("abcdef012345", "carol") is None
+    registry.close()
+
+
+def test_registry_keyed_by_receipt_only_is_migrated(tmp_path):
+    db_path = str(tmp_path / "image_registry.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE receipt_images (
+                receipt_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("INSERT INTO receipt_images VALUES ('abcdef012345', 'alice', 'alice-session', 'url-alice', 0)")
+    conn.close()
+
+    registry = ImageRegistry(db_path)
+    registry.record("abcdef012345", "bob", "bob-session", "url-bob")
+    registry.close()
+    registry = ImageRegistry(db_path)
+
+    assert registry.lookup("abcdef012345", "alice") == ReceiptImage(
+        "abcdef012345", "alice", "alice-session", "url-alice"
+    )
+    assert registry.lookup("abcdef012345", "bob").url == "url-bob"
+    registry.close()
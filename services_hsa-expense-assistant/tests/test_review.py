@@ -0,0 +1,149 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from google.adk.events import Event
+from google.genai import types
+
+import backend
+from expense_manager_agent.tools import request_receipt_review
+from schema import ReceiptReviewRequest
+
+RECEIPT_ID = "abcdef012345"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A test client whose backend state is kept under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backend.SETTINGS, "ARTIFACT_BACKEND", "local")
+    monkeypatch.setattr(backend.SETTINGS, "JOB_WORKERS", 0)
+    with TestClient(backend.app) as client:
+        yield client
+
+
+def review_request() -> ReceiptReviewRequest:
+    return ReceiptReviewRequest(
+        receipt_id=RECEIPT_ID,
+        store_name="Pharmacy",
+        date="2024-01-01",
+        hsa_eligible_items=[{"name": "Bandages", "price": 4.5}],
+        non_hsa_eligible_items=[],
+        unsure_hsa_items=[],
+        payment_card="Visa",
+        card_last_four_digit="1234",
+        total_cost=4.5,
+    )
+
+
+def approval(user_id: str) -> dict:
+    return {
+        "receipt_id": RECEIPT_ID,
+        "approved_hsa_eligible_items": [{"name": "Bandages", "price": 4.5}],
+        "store_name": "Pharmacy",
+        "date": "2024-01-01",
+        "total_cost": 4.5,
+        "payment_card": "Visa",
+        "card_last_four_digit": "1234",
+        "user_id": user_id,
+    }
+
+
+def pending_receipt_ids(user_id: str) -> list:
+    _, pending = backend.app_contexts.review_queue.list_pending(user_id)
+    return [review.receipt_id for review in pending]
+
+
+def test_approval_only_drops_the_approving_users_review(client):
+    # Both users uploaded the same image, so they share the content-hash receipt ID
+    review_queue = backend.app_contexts.review_queue
+    review_queue.add("alice", "alice-session", review_request())
+    review_queue.add("bob", "bob-session", review_request())
+
+    response = client.post("/review", json=approval("alice"))
+
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()["items"]] == ["Bandages"]
+    assert pending_receipt_ids("alice") == []
+    assert pending_receipt_ids("bob") == [RECEIPT_ID]
+
+
+def test_idempotency_keys_are_scoped_per_user(client):
+    headers = {"Idempotency-Key": "approve-1"}
+
+    alice = client.post("/review", json=approval("alice"), headers=headers)
+    bob = client.post("/review", json=approval("bob"), headers=headers)
+
+    assert alice.status_code == bob.status_code == 200
+    assert "Idempotent-Replayed" not in bob.headers
+    # Each user's approval is stored, under the user's own image URL
+    assert len(bob.json()["items"]) == 2
+
+
+def call_review_tool(receipt_id: str, **overrides) -> tuple:
+    """Call the review tool as the agent would; returns its reply and the published state."""
+    tool_context = SimpleNamespace(state={})
+    args = {
+        "image_id": receipt_id,
+        "store_name": "Pharmacy",
+        "date": "2024-01-01",
+        "total_cost": 4.5,
+        "hsa_eligible_items": [{"name": "Bandages", "price": 4.5}],
+        "non_hsa_eligible_items": [],
+        "unsure_hsa_items": [],
+        "payment_card": "Visa",
+        "card_last_four_digit": "1234",
+        **overrides,
+    }
+    return request_receipt_review(**args, tool_context=tool_context), tool_context.state
+
+
+def test_invalid_review_is_returned_to_the_model(client):
+    reply, state = call_review_tool(RECEIPT_ID, hsa_eligible_items=[{"name": "Bandages"}])
+
+    assert "was not sent" in reply
+    assert "price" in reply
+    assert state == {}
+
+
+def test_every_review_of_a_turn_is_returned_and_queued(client, monkeypatch):
+    async def fake_run_async(self, user_id, session_id, new_message, **kwargs):
+        for receipt_id in (RECEIPT_ID, "0123456789ab"):
+            reply, state = call_review_tool(receipt_id)
+            # The tool's state delta arrives with its function response, which is not final
+            function_response = types.FunctionResponse(name="request_receipt_review", response={"result": reply})
+            yield Event(
+                author="agent",
+                content=types.Content(role="user", parts=[types.Part(function_response=function_response)]),
+                actions={"state_delta": state},
+            )
+        yield Event(
+            author="agent",
+            content=types.Content(role="model", parts=[types.Part(text="# FINAL RESPONSE\nDone")]),
+        )
+
+    monkeypatch.setattr(backend.Runner, "run_async", fake_run_async)
+
+    response = client.post("/chat", json={"text": "Two receipts", "user_id": "alice"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [review["receipt_id"] for review in body["review_requests"]] == [RECEIPT_ID, "0123456789ab"]
+    assert body["review_request"]["receipt_id"] == RECEIPT_ID
+    assert sorted(pending_receipt_ids("alice")) == sorted([RECEIPT_ID, "0123456789ab"])
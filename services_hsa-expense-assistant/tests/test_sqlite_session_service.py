@@ -0,0 +1,52 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+
+import pytest
+from google.adk.events import Event, EventActions
+
+from sqlite_session_service import SqliteSessionService
+
+
+def make_event(key: str, value: str) -> Event:
+    return Event(author="user", actions=EventActions(state_delta={key: value}))
+
+
+def test_append_event_rejects_stale_session(tmp_path):
+    async def scenario():
+        service = SqliteSessionService(str(tmp_path / "sessions.db"))
+        created = await service.create_session(app_name="app", user_id="u", session_id="s")
+        first = await service.get_session(app_name="app", user_id="u", session_id="s")
+        second = await service.get_session(app_name="app", user_id="u", session_id="s")
+
+        await service.append_event(first, make_event("writer", "first"))
+        with pytest.raises(ValueError, match="stale session"):
+            await service.append_event(second, make_event("writer", "second"))
+
+        # The rejected append changed neither the stored session nor the caller's copy
+        stored = await service.get_session(app_name="app", user_id="u", session_id="s")
+        assert stored.state["writer"] == "first"
+        assert len(stored.events) == 1
+        assert "writer" not in second.state and not second.events
+
+        # A fresh copy can append again, and so can the writer that kept its copy current
+        await service.append_event(stored, make_event("writer", "third"))
+        await service.append_event(stored, make_event("writer", "fourth"))
+        assert created.id == "s"
+        service.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+"""
+Copyright 2025 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import time
+
+import pytest
+
+from utils import match_section_heading, parse_agent_response
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("# FINAL RESPONSE", "FINAL RESPONSE"),
+        ("### final response  \n", "FINAL RESPONSE"),
+        ("## Thinking Process", "THINKING PROCESS"),
+        ("### Final response summary", None),
+        ("FINAL RESPONSE", None),
+    ],
+)
+def test_match_section_heading_is_exact(line, expected):
+    assert match_section_heading(line) == expected
+
+
+def test_prose_heading_starting_with_section_name_is_kept():
+    parsed = parse_agent_response(
+        "# THINKING PROCESS\nthinking\n# FINAL RESPONSE\n### Final response summary\nAll done"
+    )
+    assert parsed.thinking_process == "thinking"
+    assert parsed.response == "### Final response summary\nAll done"
+
+
+@pytest.mark.parametrize(
+    "unit",
+    ["`", "```", "```json\n{", "# FINAL RESPONSE\n", '{"review_request": {', "[IMAGE-ID x] "],
+)
+def test_parse_time_grows_linearly_on_adversarial_input(unit):
+    def parse_seconds(size: int) -> float:
+        text = unit * (size // len(unit))
+        start = time.perf_counter()
+        parse_agent_response(text)
+        return time.perf_counter() - start
+
+    small = max(parse_seconds(25_000), 1e-4)
+    large = parse_seconds(250_000)
+    # 10x the input may take 10x the time; quadratic parsing would take ~100x
+    assert large < small * 30
@@ -14,23 +14,36 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from google.cloud import storage
 from settings import get_settings
+import asyncio
 import base64
 import re
-from schema import ChatRequest, ImageData
+from schema import (
+    ARTIFACT_URI_PREFIX,
+    ChatRequest,
+    ImageData,
+    IngestedImage,
+    ParsedAgentResponse,
+    ReceiptReviewRequest,
+    ReviewItem,
+)
 from google.genai import types
 import hashlib
+import io
 import json
-from google.adk.artifacts import GcsArtifactService
+from urllib.parse import quote, urlencode
+from typing import Awaitable, TypeVar
+from google.adk.artifacts import BaseArtifactService
+from fastapi import UploadFile
 import logger
 
 
 SETTINGS = get_settings()
 
-GCS_BUCKET_CLIENT = storage.Client(project=SETTINGS.GCLOUD_PROJECT_ID).get_bucket(
-    SETTINGS.STORAGE_BUCKET_NAME
-)
+T = TypeVar("T")
+
+# Read size used when hashing multipart uploads incrementally
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 def get_gcs_image_url(
@@ -61,69 +74,189 @@ def get_gcs_image_url(
     return https_url
 
 
-async def store_uploaded_image_as_artifact(
-    artifact_service: GcsArtifactService,
+def get_artifact_image_url(
     app_name: str,
     user_id: str,
     session_id: str,
-    image_data: ImageData,
-) -> tuple[str, bytes, str]:
+    image_hash_id: str,
+) -> str:
     """
-    Store an uploaded image as an artifact in Google Cloud Storage.
+    Get the URL recorded for a stored image, according to the configured backend.
+
+    `ARTIFACT_URL_TEMPLATE` takes precedence when set. Otherwise GCS-backed
+    deployments use the public bucket URL and local deployments use the
+    backend's own /images path.
 
     Args:
-        artifact_service: The artifact service to use for storing artifacts
         app_name: The name of the application
         user_id: The ID of the user
         session_id: The ID of the session
-        image_data: The image data to store
+        image_hash_id: The hash ID of the image
+
+    Returns:
+        str: The URL for the image
+    """
+    if SETTINGS.ARTIFACT_URL_TEMPLATE:
+        return SETTINGS.ARTIFACT_URL_TEMPLATE.format(
+            app_name=app_name,
+            user_id=quote(user_id, safe=""),
+            session_id=quote(session_id, safe=""),
+            image_hash_id=image_hash_id,
+        )
+    if SETTINGS.ARTIFACT_BACKEND == "local":
+        return get_image_reference_url(image_hash_id, user_id, session_id)
+    return get_gcs_image_url(app_name, user_id, session_id, image_hash_id)
+
+
+async def gather_with_concurrency(
+    limit: int, coroutines: list[Awaitable[T]]
+) -> list[T]:
+    """
+    Await coroutines concurrently with at most `limit` of them running at once.
+
+    Args:
+        limit: Maximum number of coroutines awaited at the same time
+        coroutines: The coroutines to run
 
     Returns:
-        tuple[str, bytes, str]: A tuple containing the image hash ID, image bytes, and GCS URL
+        list: The results, in the same order as `coroutines`
     """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run_with_limit(coroutine: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run_with_limit(c) for c in coroutines))
+
+
+def compute_image_hash_id(image_bytes: bytes) -> str:
+    """Compute the short SHA-256 based identifier used for image artifacts."""
+    return hashlib.sha256(image_bytes).hexdigest()[:12]
+
+
+def ingest_uploaded_images(
+    request: ChatRequest,
+    app_name: str,
+) -> list[IngestedImage]:
+    """
+    Decode and hash every uploaded image of a request exactly once.
+
+    The resulting records are shared by URL tracking, artifact upload and
+    ADK content construction so the base64 payload is never decoded twice.
+
+    Args:
+        request: The chat request object containing the uploaded files
+        app_name: The name of the application
+
+    Returns:
+        list[IngestedImage]: One record per uploaded file, in upload order
+    """
+    images = []
+    for image_data in request.files:
+        image_byte = base64.b64decode(image_data.serialized_image)
+        image_hash_id = compute_image_hash_id(image_byte)
+        images.append(
+            IngestedImage(
+                image_hash_id=image_hash_id,
+                image_bytes=image_byte,
+                mime_type=image_data.mime_type,
+                image_url=get_artifact_image_url(
+                    app_name, request.user_id, request.session_id, image_hash_id
+                ),
+            )
+        )
+    return images
+
+
+async def ingest_uploaded_file(
+    upload: UploadFile,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+) -> IngestedImage:
+    """
+    Read a multipart file upload in chunks, hashing it incrementally.
+
+    The multipart parser has already spooled the part to a temporary file;
+    this reads it back in `UPLOAD_CHUNK_SIZE` pieces so the hash is computed
+    while the bytes are collected, without any base64 round trip.
+
+    Args:
+        upload: The uploaded file part
+        app_name: The name of the application
+        user_id: The ID of the user
+        session_id: The ID of the session
+
+    Returns:
+        IngestedImage: The decoded image record for the upload
+    """
+    hasher = hashlib.sha256()
+    image_byte = bytearray()
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        hasher.update(chunk)
+        image_byte += chunk
+    await upload.close()
 
-    # Decode the base64 image data and use it to generate a hash id
-    image_byte = base64.b64decode(image_data.serialized_image)
-    hasher = hashlib.sha256(image_byte)
     image_hash_id = hasher.hexdigest()[:12]
+    return IngestedImage(
+        image_hash_id=image_hash_id,
+        image_bytes=bytes(image_byte),
+        mime_type=upload.content_type or "application/octet-stream",
+        image_url=get_artifact_image_url(app_name, user_id, session_id, image_hash_id),
+    )
 
+
+async def store_uploaded_image_as_artifact(
+    artifact_service: BaseArtifactService,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    image: IngestedImage,
+) -> None:
+    """
+    Store an uploaded image as an artifact in Google Cloud Storage.
+
+    Args:
+        artifact_service: The artifact service to use for storing artifacts
+        app_name: The name of the application
+        user_id: The ID of the user
+        session_id: The ID of the session
+        image: The ingested image to store
+    """
     artifact_versions = await artifact_service.list_versions(
         app_name=app_name,
         user_id=user_id,
         session_id=session_id,
-        filename=image_hash_id,
+        filename=image.image_hash_id,
     )
     if artifact_versions:
-        logger.info(f"Image {image_hash_id} already exists in GCS, skipping upload")
-        image_url = get_gcs_image_url(app_name, user_id, session_id, image_hash_id)
-        return image_hash_id, image_byte, image_url
+        logger.info(f"Image {image.image_hash_id} already exists in artifact storage, skipping upload")
+        return
 
     await artifact_service.save_artifact(
         app_name=app_name,
         user_id=user_id,
         session_id=session_id,
-        filename=image_hash_id,
+        filename=image.image_hash_id,
         artifact=types.Part(
-            inline_data=types.Blob(mime_type=image_data.mime_type, data=image_byte)
+            inline_data=types.Blob(mime_type=image.mime_type, data=image.image_bytes)
         ),
     )
     
-    image_url = get_gcs_image_url(app_name, user_id, session_id, image_hash_id)
-    logger.info(f"Stored image {image_hash_id} with URL: {image_url}")
-
-    return image_hash_id, image_byte, image_url
+    logger.info(f"Stored image {image.image_hash_id} with URL: {image.image_url}")
 
 
 async def download_image_from_gcs(
-    artifact_service: GcsArtifactService,
+    artifact_service: BaseArtifactService,
     app_name: str,
     user_id: str,
     session_id: str,
     image_hash: str,
-) -> tuple[str, str] | None:
+) -> tuple[bytes, str] | None:
     """
     Downloads an image artifact from Google Cloud Storage and
-    returns it as base64 encoded string with its MIME type.
+    returns its raw bytes with its MIME type.
     Uses local caching to avoid redundant downloads.
 
     Args:
@@ -134,7 +267,7 @@ async def download_image_from_gcs(
         image_hash: The hash identifier of the image to download
 
     Returns:
-        tuple[str, str] | None: A tuple containing (base64_encoded_data, mime_type), or None if download fails
+        tuple[bytes, str] | None: A tuple containing (image_bytes, mime_type), or None if download fails
     """
     try:
         artifact = await artifact_service.load_artifact(
@@ -144,7 +277,7 @@ async def download_image_from_gcs(
             filename=image_hash,
         )
         if not artifact:
-            logger.info(f"Image {image_hash} does not exist in GCS Artifact Service")
+            logger.info(f"Image {image_hash} does not exist in the artifact service")
             return None
 
         # Get the blob and mime type
@@ -153,14 +286,151 @@ async def download_image_from_gcs(
 
         logger.info(f"Downloaded image {image_hash} with type {mime_type}")
 
-        return base64.b64encode(image_data).decode("utf-8"), mime_type
+        return image_data, mime_type
     except Exception as e:
-        logger.error(f"Error downloading image from GCS: {e}")
+        logger.error(f"Error downloading image from artifact service: {e}")
         return None
 
 
+def get_image_reference_url(image_hash_id: str, user_id: str, session_id: str) -> str:
+    """
+    Get the backend path that serves an image artifact (see the /images endpoint).
+
+    Args:
+        image_hash_id: The hash ID of the image
+        user_id: The ID of the user owning the artifact
+        session_id: The ID of the session owning the artifact
+
+    Returns:
+        str: Path relative to the backend root, e.g. /images/<hash>?user_id=...&session_id=...
+    """
+    query = urlencode({"user_id": user_id, "session_id": session_id})
+    return f"/images/{quote(image_hash_id)}?{query}"
+
+
+async def resolve_attachments(
+    artifact_service: BaseArtifactService,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    image_hashes: list[str],
+) -> list[ImageData]:
+    """
+    Turn attachment image IDs into lightweight references served by /images.
+
+    Each image's existence is checked concurrently, under its own deadline.
+    Images that time out or do not exist are returned as placeholders with
+    `error` set, so one slow or missing image never stalls the whole response.
+
+    Args:
+        artifact_service: The artifact service holding the images
+        app_name: The name of the application
+        user_id: The ID of the user
+        session_id: The ID of the session
+        image_hashes: The hash identifiers of the attached images
+
+    Returns:
+        list[ImageData]: One entry per requested image, in the requested order
+    """
+
+    async def resolve(image_hash: str) -> ImageData:
+        placeholder = ImageData(serialized_image="", mime_type="", image_hash_id=image_hash)
+        try:
+            versions = await asyncio.wait_for(
+                artifact_service.list_versions(
+                    app_name=app_name,
+                    user_id=user_id,
+                    session_id=session_id,
+                    filename=image_hash,
+                ),
+                timeout=SETTINGS.ATTACHMENT_DOWNLOAD_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Attachment image lookup timed out",
+                image_hash_id=image_hash,
+                timeout_seconds=SETTINGS.ATTACHMENT_DOWNLOAD_TIMEOUT_SECONDS,
+            )
+            placeholder.error = "timeout"
+            return placeholder
+        except Exception as e:
+            logger.error(f"Error looking up attachment image {image_hash}: {e}")
+            versions = []
+
+        if not versions:
+            placeholder.error = "not_found"
+            return placeholder
+
+        placeholder.url = get_image_reference_url(image_hash, user_id, session_id)
+        return placeholder
+
+    return await gather_with_concurrency(
+        SETTINGS.ATTACHMENT_DOWNLOAD_CONCURRENCY,
+        [resolve(image_hash) for image_hash in image_hashes],
+    )
+
+
+def parse_byte_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single-range HTTP Range header against a resource of `size` bytes.
+
+    Args:
+        range_header: The Range header value, e.g. "bytes=0-1023" or "bytes=-500"
+        size: The full size of the resource in bytes
+
+    Returns:
+        tuple[int, int] | None: Inclusive (start, end) offsets, or None if the
+        header is not a single byte range and should be ignored
+
+    Raises:
+        ValueError: If the range cannot be satisfied for this resource
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def make_thumbnail(image_bytes: bytes, max_size: int) -> tuple[bytes, str]:
+    """
+    Downscale an image so that its longest side is at most `max_size` pixels.
+
+    Args:
+        image_bytes: The original image content
+        max_size: Maximum width/height of the thumbnail in pixels
+
+    Returns:
+        tuple[bytes, str]: The thumbnail content and its MIME type
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.thumbnail((max_size, max_size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=85)
+    return output.getvalue(), "image/jpeg"
+
+
 async def format_user_request_to_adk_content_and_store_artifacts(
-    request: ChatRequest, app_name: str, artifact_service: GcsArtifactService
+    request: ChatRequest,
+    app_name: str,
+    artifact_service: BaseArtifactService,
+    images: list[IngestedImage],
 ) -> types.Content:
     """Format a user request into ADK Content format.
 
@@ -168,6 +438,7 @@ async def format_user_request_to_adk_content_and_store_artifacts(
         request: The chat request object containing text and optional files
         app_name: The name of the application
         artifact_service: The artifact service to use for storing artifacts
+        images: The request's uploaded images, already decoded by `ingest_uploaded_images`
 
     Returns:
         types.Content: The formatted content for ADK
@@ -177,54 +448,87 @@ async def format_user_request_to_adk_content_and_store_artifacts(
         app_name=app_name,
         user_id=request.user_id,
         session_id=request.session_id,
-        files_count=len(request.files) if request.files else 0,
+        files_count=len(images),
         has_text=bool(request.text),
     )
     
-    # Create a list to hold parts
-    parts = []
-
-    # Handle image files if present
-    for idx, data in enumerate(request.files):
+    async def store_image(idx: int, image: IngestedImage) -> bool:
         logger.info(
             "Processing image file for ADK format",
             image_index=idx + 1,
-            total_images=len(request.files),
-            mime_type=data.mime_type,
-            base64_length=len(data.serialized_image),
+            total_images=len(images),
+            mime_type=image.mime_type,
+            image_size_bytes=len(image.image_bytes),
             app_name=app_name,
             user_id=request.user_id,
             session_id=request.session_id,
         )
-        # Process the image and add string placeholder
+        try:
+            await store_uploaded_image_as_artifact(
+                artifact_service=artifact_service,
+                app_name=app_name,
+                user_id=request.user_id,
+                session_id=request.session_id,
+                image=image,
+            )
+        except Exception as e:
+            # A failed upload must not sink the other images or the request:
+            # the image is then sent inline instead of as an artifact reference
+            logger.error(
+                "Failed to store image artifact",
+                image_index=idx + 1,
+                image_hash_id=image.image_hash_id,
+                error_message=str(e),
+                app_name=app_name,
+                user_id=request.user_id,
+                session_id=request.session_id,
+            )
+            return False
+        return True
 
-        image_hash_id, image_byte, image_url = await store_uploaded_image_as_artifact(
-            artifact_service=artifact_service,
-            app_name=app_name,
-            user_id=request.user_id,
-            session_id=request.session_id,
-            image_data=data,
-        )
-        
+    # Upload image artifacts concurrently; results keep the original image order
+    stored = await gather_with_concurrency(
+        SETTINGS.ARTIFACT_UPLOAD_CONCURRENCY,
+        [store_image(idx, image) for idx, image in enumerate(images)],
+    )
+
+    # Create a list to hold parts
+    parts = []
+
+    # Handle image files if present
+    for idx, image in enumerate(images):
         logger.info(
-            "Image artifact stored and added to ADK content",
+            "Image artifact stored and added to ADK content"
+            if stored[idx]
+            else "Image added to ADK content without stored artifact",
             image_index=idx + 1,
-            image_hash_id=image_hash_id,
-            image_url=image_url,
+            image_hash_id=image.image_hash_id,
+            image_url=image.image_url,
             app_name=app_name,
             user_id=request.user_id,
             session_id=request.session_id,
         )
 
-        # Add inline data part
-        parts.append(
-            types.Part(
-                inline_data=types.Blob(mime_type=data.mime_type, data=image_byte)
+        if stored[idx]:
+            # The session history only keeps a reference; the agent's before-model
+            # callback loads the bytes from the artifact store for recent turns
+            parts.append(
+                types.Part(
+                    file_data=types.FileData(
+                        file_uri=f"{ARTIFACT_URI_PREFIX}{image.image_hash_id}",
+                        mime_type=image.mime_type,
+                    )
+                )
+            )
+        else:
+            parts.append(
+                types.Part(
+                    inline_data=types.Blob(mime_type=image.mime_type, data=image.image_bytes)
+                )
             )
-        )
 
         # Add image placeholder identifier
-        placeholder = f"[IMAGE-ID {image_hash_id}]"
+        placeholder = f"[IMAGE-ID {image.image_hash_id}]"
         parts.append(types.Part(text=placeholder))
         logger.debug(
             "Image placeholder added to ADK content",
@@ -260,109 +564,208 @@ def sanitize_image_id(image_id: str) -> str:
     return image_id.strip()
 
 
-def extract_attachment_ids_and_sanitize_response(
-    response_text: str,
-) -> tuple[str, list[str]]:
-    """Extract image hash IDs from JSON code block in the FINAL RESPONSE section.
+# Markdown section headings the agent is prompted to emit (any heading level)
+RESPONSE_SECTION_HEADINGS = ("THINKING PROCESS", "FINAL RESPONSE", "ATTACHMENTS")
+
+IMAGE_ID_PATTERN = re.compile(r"\[IMAGE-ID\s+([^\]]+)\]")
+
+REVIEW_REQUEST_REQUIRED_FIELDS = (
+    "receipt_id",
+    "store_name",
+    "date",
+    "total_cost",
+    "payment_card",
+    "card_last_four_digit",
+)
+
+
+def split_code_fences(text: str) -> list[tuple[str, str, str]]:
+    """Split markdown text into prose and fenced code segments in one scan.
 
     Args:
-        response_text: The response text from the LLM in markdown format.
+        text: The markdown text.
 
     Returns:
-        tuple[str, list[str]]: A tuple containing the sanitized response text and list of image hash IDs.
+        list[tuple[str, str, str]]: (kind, info, content) segments in order, where
+        kind is "text" or "code", info is the code block's language tag and
+        content is the prose or code body. An unterminated fence is kept as text.
     """
-    # JSON code block pattern, looking for ```json { ... } ```
-    json_block_pattern = r"```json\s*({[^`]*?})\s*```"
-    json_match = re.search(json_block_pattern, response_text, re.DOTALL)
-
-    all_attachments_hash_ids = []
-    sanitized_text = response_text
-
-    if json_match:
-        json_str = json_match.group(1).strip()
-        try:
-            # Try to parse the JSON
-            json_data = json.loads(json_str)
-
-            # Extract attachment IDs if they exist in the expected format
-            if isinstance(json_data, dict) and "attachments" in json_data:
-                attachments = json_data["attachments"]
-                if isinstance(attachments, list):
-                    # Extract image IDs from each attachment string
-                    for attachment_id in attachments:
-                        all_attachments_hash_ids.append(
-                            sanitize_image_id(attachment_id)
-                        )
+    segments = []
+    pos = 0
+    while pos < len(text):
+        open_idx = text.find("```", pos)
+        close_idx = text.find("```", open_idx + 3) if open_idx != -1 else -1
+        if close_idx == -1:
+            segments.append(("text", "", text[pos:]))
+            break
+        if open_idx > pos:
+            segments.append(("text", "", text[pos:open_idx]))
+        body = text[open_idx + 3:close_idx]
+        # A language tag is a single word directly after the opening fence
+        first_line, newline, rest = body.partition("\n")
+        info = first_line.strip()
+        if newline and info and " " not in info and not info.startswith("{"):
+            body = rest
+        else:
+            info = ""
+        segments.append(("code", info.lower(), body))
+        pos = close_idx + 3
+    return segments
+
+
+def match_section_heading(line: str) -> str | None:
+    """Return the section name if `line` is one of the response section headings."""
+    stripped = line.strip()
+    if not stripped.startswith("#"):
+        return None
+    title = stripped.lstrip("#").strip().upper()
+    # Exact match, so prose headings such as "Final response summary" stay in the text
+    return title if title in RESPONSE_SECTION_HEADINGS else None
 
-            # Remove the JSON block from the response
-            sanitized_text = response_text.replace(json_match.group(0), "")
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract image IDs directly using regex
-            id_pattern = r"\[IMAGE-ID\s+([^\]]+)\]"
-            hash_id_matches = re.findall(id_pattern, json_str)
-            all_attachments_hash_ids = [
-                sanitize_image_id(match.strip())
-                for match in hash_id_matches
-                if match.strip()
-            ]
 
-            # Remove the JSON block from the response
-            sanitized_text = response_text.replace(json_match.group(0), "")
+def build_review_request(review_data: dict) -> ReceiptReviewRequest | None:
+    """Validate the agent's review JSON and convert it into a ReceiptReviewRequest.
 
-    # Clean up the sanitized text
-    sanitized_text = sanitized_text.strip()
+    Args:
+        review_data: The object under the "review_request" key.
 
-    return sanitized_text, all_attachments_hash_ids
+    Returns:
+        ReceiptReviewRequest | None: The review request, or None if it is invalid.
+    """
+    if not isinstance(review_data, dict):
+        return None
+    if not all(key in review_data for key in REVIEW_REQUEST_REQUIRED_FIELDS):
+        logger.warning(
+            "Review request missing required fields",
+            review_data_keys=list(review_data.keys()),
+            required_fields=list(REVIEW_REQUEST_REQUIRED_FIELDS),
+        )
+        return None
+    try:
+        return ReceiptReviewRequest(
+            receipt_id=sanitize_image_id(str(review_data.get("receipt_id", ""))),
+            store_name=review_data.get("store_name", ""),
+            date=review_data.get("date", ""),
+            total_cost=review_data.get("total_cost", 0.0),
+            payment_card=review_data.get("payment_card", ""),
+            card_last_four_digit=review_data.get("card_last_four_digit", ""),
+            hsa_eligible_items=[
+                ReviewItem(**item) for item in review_data.get("hsa_eligible_items", [])
+            ],
+            non_hsa_eligible_items=[
+                ReviewItem(**item) for item in review_data.get("non_hsa_eligible_items", [])
+            ],
+            unsure_hsa_items=[
+                ReviewItem(**item) for item in review_data.get("unsure_hsa_items", [])
+            ],
+        )
+    except Exception as e:
+        logger.error(f"Error creating review request: {e}")
+        return None
 
 
-def extract_thinking_process(response_text: str) -> tuple[str, str]:
-    """Extract thinking process from response text and sanitize the response.
+def parse_agent_response(response_text: str) -> ParsedAgentResponse:
+    """Split an agent response into its sections and structured blocks in a single pass.
 
-    The response expected should e like this
+    The response is expected to look like this
 
     # THINKING PROCESS
     <thinking process>
 
     # FINAL RESPONSE
     <final response>
+    ```json
+    {"attachments": [...]} or {"review_request": {...}}
+    ```
+
+    Code fences are located with linear `str.find` scans and prose is split
+    into lines only once, so the cost stays proportional to the response
+    size even for long or malformed outputs. JSON blocks carrying
+    attachments or a review request are removed from the text wherever they
+    appear; other code blocks are kept. A bare `{"review_request": ...}`
+    object outside a code block is recognized as well.
 
     Args:
         response_text: The response text from the LLM in markdown format.
 
     Returns:
-        tuple[str, str]: A tuple containing the sanitized response text and extracted thinking process.
+        ParsedAgentResponse: The final response, thinking process, attachment IDs and review request.
     """
-    # Match until FINAL RESPONSE heading or end
-    thinking_pattern = r"#\s*THINKING PROCESS[\s\S]*?(?=#\s*FINAL RESPONSE|\Z)"
-    thinking_match = re.search(thinking_pattern, response_text, re.MULTILINE)
-
-    thinking_process = ""
-
-    if thinking_match:
-        # Extract the content without the heading
-        thinking_content = thinking_match.group(0)
-        # Remove the heading and get just the content
-        thinking_process = re.sub(
-            r"^#\s*THINKING PROCESS\s*", "", thinking_content, flags=re.MULTILINE
-        ).strip()
-
-        # Remove the THINKING PROCESS section from the response
-        sanitized_text = response_text.replace(thinking_content, "")
+    sections: dict[str | None, list[str]] = {None: []}
+    section = None
+    attachment_ids = None
+    review_request = None
+    decoder = json.JSONDecoder()
+
+    for kind, info, content in split_code_fences(response_text):
+        if kind == "code":
+            consumed = False
+            if info in ("json", ""):
+                try:
+                    json_data = json.loads(content)
+                except ValueError:
+                    json_data = None
+                    if info == "json" and attachment_ids is None:
+                        # Malformed attachments block: fall back to the IMAGE-ID markers
+                        matches = [m.strip() for m in IMAGE_ID_PATTERN.findall(content)]
+                        if matches:
+                            attachment_ids = [sanitize_image_id(m) for m in matches if m]
+                            consumed = True
+                if isinstance(json_data, dict):
+                    if "attachments" in json_data and attachment_ids is None:
+                        attachments = json_data["attachments"]
+                        attachment_ids = (
+                            [sanitize_image_id(a) for a in attachments if isinstance(a, str)]
+                            if isinstance(attachments, list)
+                            else []
+                        )
+                        consumed = True
+                    if "review_request" in json_data:
+                        if review_request is None:
+                            review_request = build_review_request(json_data["review_request"])
+                        consumed = True
+            if not consumed:
+                sections.setdefault(section, []).append(f"```{info}\n{content}```")
+            continue
+
+        if review_request is None:
+            raw_start = content.find('{"review_request"')
+            if raw_start != -1:
+                try:
+                    json_data, raw_end = decoder.raw_decode(content, raw_start)
+                    review_request = build_review_request(json_data["review_request"])
+                    content = content[:raw_start] + content[raw_end:]
+                except ValueError:
+                    pass
+
+        for line in content.splitlines(keepends=True):
+            heading = match_section_heading(line)
+            if heading is not None:
+                section = heading
+                continue
+            sections.setdefault(section, []).append(line)
+
+    thinking_process = "".join(sections.get("THINKING PROCESS", [])).strip()
+    if "FINAL RESPONSE" in sections:
+        response = "".join(sections["FINAL RESPONSE"])
     else:
-        sanitized_text = response_text
-
-    # Extract just the FINAL RESPONSE section as the sanitized text if it exists
-    final_response_pattern = r"#\s*FINAL RESPONSE[\s\S]*?(?=#\s*ATTACHMENTS|\Z)"  # Match until ATTACHMENTS heading or end
-    final_response_match = re.search(
-        final_response_pattern, sanitized_text, re.MULTILINE
+        response = "".join(sections[None])
+    return ParsedAgentResponse(
+        response=response.strip(),
+        thinking_process=thinking_process,
+        attachment_ids=attachment_ids or [],
+        review_request=review_request,
     )
 
-    if final_response_match:
-        # Extract the content without the heading
-        final_response_content = final_response_match.group(0)
-        # Remove the heading and get just the content
-        sanitized_text = re.sub(
-            r"^#\s*FINAL RESPONSE\s*", "", final_response_content, flags=re.MULTILINE
-        ).strip()
 
-    return sanitized_text, thinking_process
+def format_sse_event(event_type: str, data: dict) -> str:
+    """Format a payload as a Server-Sent Events message.
+
+    Args:
+        event_type: The SSE event name (e.g. "delta", "tool_call", "final").
+        data: JSON-serializable payload for the event.
+
+    Returns:
+        str: The SSE message, terminated by a blank line.
+    """
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"